@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CustomUser,Customer,LoanType,Loan,LoanDue,DailyCollection,Attendance,Notification,LoanSchedule
+from .models import CustomUser,Customer,LoanType,Loan,LoanDue,DailyCollection,Attendance,Notification,LoanSchedule,ArchivedLoanSchedule,ArchivedLoanDue
 # Register your models here.
 
 admin.site.register(CustomUser)
@@ -12,4 +12,6 @@ admin.site.register(Attendance)
 admin.site.register(Notification)
 admin.site.register(LoanSchedule)
 
- 
\ No newline at end of file
+ 
+admin.site.register(ArchivedLoanSchedule)
+admin.site.register(ArchivedLoanDue)
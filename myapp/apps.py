@@ -4,11 +4,6 @@ from django.apps import AppConfig
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
-from django.apps import AppConfig
-
-class LoansConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'loans'
 
     def ready(self):
-        import loans.signals
+        from . import signals  # noqa: F401
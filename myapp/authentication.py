@@ -0,0 +1,167 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """
+    Bounded LRU of token key -> (user, token) with a TTL, shared by all
+    threads of the process. When AUTH_TOKEN_SHARED_CACHE names a Django
+    cache alias, entries are also written there so other workers on the
+    same host can skip the database too.
+
+    Invalidation must reach every worker. With a shared cache, each user
+    has a generation counter there: invalidation bumps it, and an
+    in-process hit is only served while its generation is still current.
+    Without one, in-process entries live at most AUTH_TOKEN_LOCAL_TTL
+    seconds, which bounds how long another worker can accept a revoked
+    token.
+    """
+
+    def __init__(self, max_size=None, ttl=None, shared_alias=None, local_ttl=None):
+        self.max_size = max_size or getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000)
+        self.ttl = ttl or getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300)
+        self.local_ttl = local_ttl or getattr(settings, 'AUTH_TOKEN_LOCAL_TTL', 5)
+        self.shared_alias = shared_alias or getattr(settings, 'AUTH_TOKEN_SHARED_CACHE', None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    @staticmethod
+    def shared_key(key):
+        # Never put the raw token into the shared cache's key space.
+        return 'auth-token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def generation_key(user_id):
+        return f'auth-user-generation:{user_id}'
+
+    def _generation(self, user_id):
+        return self.shared.get(self.generation_key(user_id), 0)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] <= now:
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+
+        if entry is not None:
+            expires, value, generation = entry
+            if self.shared is None or generation == self._generation(value[0].pk):
+                return value
+            with self._lock:
+                self._entries.pop(key, None)
+
+        if self.shared is not None:
+            value = self.shared.get(self.shared_key(key))
+            if value is not None:
+                self._store(key, value, now)
+                return value
+        return None
+
+    def set(self, key, value):
+        self._store(key, value, time.monotonic())
+        if self.shared is not None:
+            self.shared.set(self.shared_key(key), value, self.ttl)
+
+    def _store(self, key, value, now):
+        if self.shared is None:
+            expires, generation = now + min(self.ttl, self.local_ttl), None
+        else:
+            expires, generation = now + self.ttl, self._generation(value[0].pk)
+        with self._lock:
+            self._entries[key] = (expires, value, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _bump_generation(self, user_id):
+        if self.shared is None:
+            return
+        key = self.generation_key(user_id)
+        try:
+            self.shared.incr(key)
+        except ValueError:
+            self.shared.set(key, 1, None)
+
+    def invalidate(self, key, user_id=None):
+        """Drop one token; pass its user_id so other workers drop it as well."""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self.shared_key(key))
+        if user_id is not None:
+            self._bump_generation(user_id)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = [key for key, (_, (user, _token), _gen) in self._entries.items() if user.pk == user_id]
+        keys.extend(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+        for key in set(keys):
+            self.invalidate(key)
+        self._bump_generation(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that serves repeat requests from token_cache, so
+    an authenticated request usually issues no query for its token or user.
+    Entries are dropped when the token is deleted (logout) or the user is
+    saved (password, role or active flag changes); see myapp/signals.py.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, (user, token))
+            return user, token
+        user, token = cached
+        # Each request gets its own copy; views may modify request.user.
+        return copy.copy(user), token
+
+
+async def aauthenticate(request):
+    """
+    Token authentication for plain async Django views, which DRF's
+    authentication classes cannot serve. Returns the user, or None when
+    the Authorization header is missing or the token is invalid.
+    """
+    parts = get_authorization_header(request).split()
+    if len(parts) != 2 or parts[0].lower() != b'token':
+        return None
+    try:
+        key = parts[1].decode()
+    except UnicodeError:
+        return None
+
+    cached = token_cache.get(key)
+    if cached is not None:
+        return copy.copy(cached[0])
+    token = await Token.objects.select_related('user').filter(key=key).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    token_cache.set(key, (token.user, token))
+    return copy.copy(token.user)
@@ -0,0 +1,81 @@
+"""
+Read replica routing.
+
+Reads go to the 'replica' database only inside ``replica_reads()``, which
+opted-in views enter for safe (GET/HEAD/OPTIONS) requests; everything else,
+including all writes, uses 'default'. After a client's successful write,
+ReplicaStickinessMiddleware pins that client to the primary for
+REPLICA_STICKY_SECONDS so it reads its own writes despite replication lag.
+"""
+import functools
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _use_replica.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def pin_key(request):
+    """Cache key of the client's read-your-writes pin, by credentials."""
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    return 'replica-pin:' + hashlib.sha256(credentials.encode('utf-8')).hexdigest()
+
+
+def may_read_replica(request):
+    return request.method in SAFE_METHODS and not getattr(request, 'pinned_to_primary', False)
+
+
+class ReplicaReadMixin:
+    """
+    Serves this view's safe requests from the replica. ``replica_actions``
+    limits it to some viewset actions; None means every safe request.
+    """
+    replica_actions = None
+
+    def dispatch(self, request, *args, **kwargs):
+        action = (getattr(self, 'action_map', None) or {}).get(request.method.lower())
+        enabled = may_read_replica(request) and (self.replica_actions is None or action in self.replica_actions)
+        with replica_reads(enabled):
+            return super().dispatch(request, *args, **kwargs)
+
+
+def replica_view(view):
+    """Function-view counterpart of ReplicaReadMixin."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(may_read_replica(request)):
+            return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,35 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.utils.archive import ARCHIVE_CHUNK_SIZE, archive_closed_loans
+
+
+class Command(BaseCommand):
+    help = ("Move the schedules and dues of loans closed or defaulted for more than --days "
+            "into the archive tables. Safe to stop and re-run; each chunk is its own transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Archive loans closed more than this many days ago.")
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE, help="Loans per transaction.")
+        parser.add_argument('--max-chunks', type=int, help="Stop after this many chunks.")
+        parser.add_argument('--dry-run', action='store_true', help="Count what would be archived without moving it.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError("--days must not be negative.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+
+        started = perf_counter()
+        totals = archive_closed_loans(
+            options['days'], chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks'], dry_run=options['dry_run'],
+        )
+        elapsed = perf_counter() - started
+
+        verb = "Would archive" if options['dry_run'] else "Archived"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['loans']} loans ({totals['schedules']} schedules, "
+            f"{totals['dues']} dues) in {elapsed:.2f}s."
+        ))
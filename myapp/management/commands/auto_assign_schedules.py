@@ -0,0 +1,37 @@
+from datetime import date
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp.utils.assignment_planner import auto_assign
+
+
+class Command(BaseCommand):
+    help = "Distribute unassigned pending installments across active collection agents."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="YYYY-MM-DD, defaults to today.")
+        parser.add_argument('--to', dest='date_to', help="YYYY-MM-DD, defaults to --from.")
+        parser.add_argument('--dry-run', action='store_true', help="Print the plan without saving it.")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else timezone.localdate()
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else date_from
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if date_from > date_to:
+            raise CommandError("--from must not be after --to.")
+
+        started = perf_counter()
+        plan = auto_assign(date_from, date_to, dry_run=options['dry_run'])
+        elapsed = perf_counter() - started
+
+        for agent_id, agent in sorted(plan.items()):
+            self.stdout.write(f"agent {agent_id}: {agent['installments']} installments, {agent['amount']}")
+        verb = "Planned" if options['dry_run'] else "Assigned"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {sum(a['installments'] for a in plan.values())} installments "
+            f"across {len(plan)} agents in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+from time import perf_counter
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+
+from myapp.utils.amortization import amortize, FLAT, REDUCING
+
+
+def _loop_flat(principal, rate, n, start, mode):
+    """The per-installment loop the kernel replaced (flat interest)."""
+    total_interest = principal * rate
+    installment_total = round((principal + total_interest) / n, 2)
+    principal_per_installment = round(principal / n, 2)
+    interest_per_installment = round(total_interest / n, 2)
+    remaining_principal = principal
+    current_date = start
+    rows = []
+    for i in range(1, n + 1):
+        rows.append((i, current_date, principal_per_installment, interest_per_installment,
+                     installment_total, round(remaining_principal - principal_per_installment, 2)))
+        remaining_principal -= principal_per_installment
+        current_date = _step(current_date, mode)
+    return rows
+
+
+def _loop_reducing(principal, rate, n, start, mode):
+    """The per-installment loop the kernel replaced (reducing balance)."""
+    r = rate / 12
+    emi = principal * r * pow(1 + r, n) / (pow(1 + r, n) - 1)
+    remaining_principal = principal
+    current_date = start
+    rows = []
+    for i in range(1, n + 1):
+        interest_amount = remaining_principal * r
+        principal_amount = emi - interest_amount
+        remaining_principal -= principal_amount
+        rows.append((i, current_date, round(principal_amount, 2), round(interest_amount, 2),
+                     round(emi, 2), round(remaining_principal, 2)))
+        current_date = _step(current_date, mode)
+    return rows
+
+
+def _step(current_date, mode):
+    if mode == 'daily':
+        return current_date + timedelta(days=1)
+    if mode == 'weekly':
+        return current_date + timedelta(weeks=1)
+    return current_date + relativedelta(months=1)
+
+
+class Command(BaseCommand):
+    help = "Benchmark the vectorized amortization kernel against the per-installment loops."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[12, 365, 3650])
+        parser.add_argument('--loans', type=int, default=1000,
+                            help="Number of loans for the batched run.")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--mode', choices=['daily', 'weekly', 'monthly'], default='monthly')
+
+    def _best(self, fn, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            started = perf_counter()
+            fn()
+            best = min(best, perf_counter() - started)
+        return best
+
+    def handle(self, *args, **options):
+        start, mode, repeat = date(2024, 1, 31), options['mode'], options['repeat']
+        principal, rate = 100000.0, 0.12
+        loops = {FLAT: _loop_flat, REDUCING: _loop_reducing}
+
+        self.stdout.write(f"{'method':<9} {'n':>6} {'loop ms':>10} {'kernel ms':>10} {'speedup':>8}")
+        for method, loop in loops.items():
+            for n in options['sizes']:
+                loop_s = self._best(lambda: loop(principal, rate, n, start, mode), repeat)
+                kernel_s = self._best(
+                    lambda: amortize([principal], [rate * 100], [n], [start], [mode], method=method), repeat)
+                self.stdout.write(
+                    f"{method:<9} {n:>6} {loop_s * 1e3:>10.3f} {kernel_s * 1e3:>10.3f} {loop_s / kernel_s:>7.1f}x")
+
+        loans = options['loans']
+        for n in options['sizes']:
+            loop_s = self._best(lambda: [_loop_flat(principal, rate, n, start, mode) for _ in range(loans)], 1)
+            kernel_s = self._best(lambda: amortize(
+                [principal] * loans, [rate * 100] * loans, [n] * loans, [start] * loans, [mode] * loans), 1)
+            self.stdout.write(
+                f"batch of {loans} flat loans, n={n}: loop {loop_s * 1e3:.1f} ms, "
+                f"kernel {kernel_s * 1e3:.1f} ms ({loop_s / kernel_s:.1f}x)")
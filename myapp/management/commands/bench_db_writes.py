@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+from time import perf_counter
+
+import dj_database_url
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+# journal_mode is stored in the database file, so the default profile
+# switches it back explicitly.
+SQLITE_PROFILES = {
+    'sqlite-default': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'sqlite-tuned': {**settings.SQLITE_PRAGMAS, **settings.SQLITE_WAL_PRAGMAS},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent write throughput of each database profile on scratch tables. "
+        "Every transaction inserts one payment row and bumps a shared per-agent total, "
+        "like collecting a payment. PostgreSQL is included with --postgres-url or DATABASE_URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--transactions', type=int, default=200, help="Per thread.")
+        parser.add_argument('--agents', type=int, default=4, help="Number of shared total rows (hot rows).")
+        parser.add_argument('--postgres-url', default=os.environ.get('DATABASE_URL'))
+
+    def handle(self, *args, **options):
+        profiles = []
+        with tempfile.TemporaryDirectory() as directory:
+            for name, pragmas in SQLITE_PROFILES.items():
+                profiles.append((name, {
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': os.path.join(directory, f'{name}.sqlite3'),
+                    'OPTIONS': {'timeout': 5},
+                    'PRAGMAS': pragmas,
+                }))
+            if options['postgres_url']:
+                if not options['postgres_url'].startswith('postgres'):
+                    raise CommandError("--postgres-url must be a postgres:// URL.")
+                profiles.append(('postgres', dj_database_url.parse(
+                    options['postgres_url'], conn_max_age=600, conn_health_checks=True)))
+
+            self.stdout.write(f"{'profile':<16}{'tx/s':>10}{'ok':>8}{'locked':>8}{'seconds':>10}")
+            for name, database in profiles:
+                result = self.run_profile(name, database, options)
+                self.stdout.write(
+                    f"{name:<16}{result['tps']:>10.0f}{result['ok']:>8}{result['locked']:>8}{result['seconds']:>10.2f}"
+                )
+
+    def run_profile(self, alias, database, options):
+        connections.databases[alias] = {
+            **connections['default'].settings_dict, 'OPTIONS': {}, 'PRAGMAS': {}, **database,
+        }
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('DROP TABLE IF EXISTS bench_payments')
+                cursor.execute('DROP TABLE IF EXISTS bench_totals')
+                cursor.execute('CREATE TABLE bench_payments (id BIGINT PRIMARY KEY, agent_id INTEGER NOT NULL, '
+                               'amount NUMERIC(12, 2) NOT NULL)')
+                cursor.execute('CREATE TABLE bench_totals (agent_id INTEGER PRIMARY KEY, total NUMERIC(14, 2) NOT NULL)')
+                for agent_id in range(options['agents']):
+                    cursor.execute('INSERT INTO bench_totals (agent_id, total) VALUES (%s, 0)', [agent_id])
+
+            counts = {'ok': 0, 'locked': 0}
+            lock = threading.Lock()
+
+            def worker(number):
+                ok = locked = 0
+                for i in range(options['transactions']):
+                    payment_id = number * options['transactions'] + i
+                    agent_id = payment_id % options['agents']
+                    try:
+                        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                            cursor.execute('INSERT INTO bench_payments (id, agent_id, amount) VALUES (%s, %s, %s)',
+                                           [payment_id, agent_id, '110.00'])
+                            cursor.execute('UPDATE bench_totals SET total = total + %s WHERE agent_id = %s',
+                                           ['110.00', agent_id])
+                        ok += 1
+                    except OperationalError:
+                        locked += 1
+                connections[alias].close()
+                with lock:
+                    counts['ok'] += ok
+                    counts['locked'] += locked
+
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(options['threads'])]
+            started = perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = perf_counter() - started
+
+            with connections[alias].cursor() as cursor:
+                cursor.execute('DROP TABLE bench_payments')
+                cursor.execute('DROP TABLE bench_totals')
+            return {**counts, 'seconds': seconds, 'tps': counts['ok'] / seconds}
+        finally:
+            connections[alias].close()
+            del connections.databases[alias]
@@ -0,0 +1,92 @@
+import http.client
+import threading
+from argparse import RawDescriptionHelpFormatter
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+ENDPOINTS = [
+    ('schedules by loan', 'loan-schedules/{loan}/'),
+    ('loan details', 'loans/{loan}/details/'),
+    ('notifications', 'notifications/?page_size=100'),
+    ('agents', 'agents/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent-request throughput of the read endpoints on running servers, e.g.\n"
+        "  gunicorn LoanAppBackend.wsgi -w 2 --threads 8 -b 127.0.0.1:8000\n"
+        "  uvicorn LoanAppBackend.asgi:application --workers 2 --port 8001\n"
+        "  manage.py bench_read_endpoints --token KEY --loan 1 \\\n"
+        "      --target wsgi=http://127.0.0.1:8000/api/auth/ \\\n"
+        "      --target asgi=http://127.0.0.1:8001/api/auth/async/"
+    )
+
+    def create_parser(self, *args, **kwargs):
+        parser = super().create_parser(*args, **kwargs)
+        parser.formatter_class = RawDescriptionHelpFormatter
+        return parser
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True,
+                            help="label=base URL the endpoint paths are appended to; repeatable.")
+        parser.add_argument('--token', required=True, help="API token sent as 'Authorization: Token <key>'.")
+        parser.add_argument('--loan', type=int, required=True, help="Loan id for the per-loan endpoints.")
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per endpoint and target.")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            label, sep, base = target.partition('=')
+            if not sep or not base.startswith('http'):
+                raise CommandError(f"--target must look like label=http://host:port/prefix/, got {target!r}")
+            targets.append((label, base if base.endswith('/') else base + '/'))
+
+        headers = {'Authorization': f"Token {options['token']}", 'Connection': 'keep-alive'}
+        self.stdout.write(f"{'endpoint':<20}{'target':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for name, path in ENDPOINTS:
+            for label, base in targets:
+                url = urlsplit(base + path.format(loan=options['loan']))
+                result = self.run(url, headers, options['concurrency'], options['requests'])
+                self.stdout.write(
+                    f"{name:<20}{label:<10}{result['rps']:>10.0f}{result['p50']:>10.1f}"
+                    f"{result['p95']:>10.1f}{result['errors']:>8}"
+                )
+
+    def run(self, url, headers, concurrency, total):
+        local = threading.local()
+        target = url.path + (f'?{url.query}' if url.query else '')
+
+        def request(_):
+            if not hasattr(local, 'connection'):
+                local.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+            started = perf_counter()
+            try:
+                local.connection.request('GET', target, headers=headers)
+                response = local.connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                local.connection.close()
+                del local.connection
+                ok = False
+            return perf_counter() - started, ok
+
+        started = perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(request, range(total)))
+        elapsed = perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, ok in results if ok)
+        cuts = quantiles(latencies, n=20) if len(latencies) > 1 else [0.0] * 19
+        return {
+            'rps': total / elapsed,
+            'p50': cuts[9],
+            'p95': cuts[18],
+            'errors': sum(1 for _, ok in results if not ok),
+        }
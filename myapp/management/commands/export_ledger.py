@@ -0,0 +1,50 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.models import Loan
+from myapp.utils.ledger_export import (
+    EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_TABLES, export_chunks, export_queryset, export_rows
+)
+
+
+class Command(BaseCommand):
+    help = "Export loan_dues or loan_schedule to a CSV or Parquet file with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=list(EXPORT_TABLES))
+        parser.add_argument('output', help="Path of the file to write.")
+        parser.add_argument('--format', dest='file_format', choices=EXPORT_FORMATS,
+                            help="Defaults to the output file extension.")
+        parser.add_argument('--from', dest='date_from', help="Due date from, YYYY-MM-DD.")
+        parser.add_argument('--to', dest='date_to', help="Due date to, YYYY-MM-DD.")
+        parser.add_argument('--loan-status', choices=[choice for choice, _ in Loan.LOAN_STATUS_CHOICES])
+        parser.add_argument('--loan-type', type=int, help="Loan type id.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help="Rows per read and per Parquet row group.")
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or options['output'].rsplit('.', 1)[-1].lower()
+        if file_format not in EXPORT_FORMATS:
+            raise CommandError(f"Cannot infer format from {options['output']}; pass --format.")
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        filters = {
+            'date_from': date_from, 'date_to': date_to,
+            'loan_status': options['loan_status'], 'loan_type': options['loan_type'],
+        }
+        rows = export_rows(options['table'], export_queryset(options['table'], **filters), **filters)
+        written = 0
+        try:
+            with open(options['output'], 'wb') as out:
+                for data in export_chunks(options['table'], file_format, rows, options['chunk_size']):
+                    out.write(data)
+                    written += len(data)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}."))
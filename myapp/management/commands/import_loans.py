@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.utils.amortization import FLAT, REDUCING
+from myapp.utils.loan_import import import_loans, IMPORT_FORMATS
+
+
+class Command(BaseCommand):
+    help = "Stream-import loans (with schedules and dues) from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=IMPORT_FORMATS,
+                            help="Defaults to the file extension.")
+        parser.add_argument('--created-by', type=int, required=True, help="Admin user id recorded on the loans.")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--method', choices=[FLAT, REDUCING], default=FLAT)
+        parser.add_argument('--report', help="Write the per-row error report to this JSONL file.")
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f"Cannot infer format from {options['path']}; pass --format.")
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = import_loans(
+                    stream, file_format,
+                    created_by=options['created_by'],
+                    chunk_size=options['chunk_size'],
+                    method=options['method'],
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        if options['report']:
+            with open(options['report'], 'w') as out:
+                for error in report['errors']:
+                    out.write(json.dumps(error) + '\n')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} of {report['rows']} rows, {len(report['errors'])} errors."
+        ))
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp.utils.daily_collection import rebuild_daily_collections
+
+
+class Command(BaseCommand):
+    help = "Recompute DailyCollection totals for a date range from paid LoanDue rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="YYYY-MM-DD, defaults to today.")
+        parser.add_argument('--to', dest='date_to', help="YYYY-MM-DD, defaults to --from.")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date.fromisoformat(options['date_from']) if options['date_from'] else timezone.localdate()
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else date_from
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if date_from > date_to:
+            raise CommandError("--from must not be after --to.")
+
+        written = rebuild_daily_collections(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} daily collection rows for {date_from} to {date_to}."
+        ))
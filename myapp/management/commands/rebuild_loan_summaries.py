@@ -0,0 +1,34 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from myapp.models import Loan
+from myapp.utils.loan_summary import refresh_summaries
+
+REBUILD_CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute LoanSummary rows from dues and schedules, creating missing ones. "
+        "Run after writes that bypass the ORM's save(): queryset updates, raw SQL, "
+        "or loans created before summaries existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loan', type=int, action='append', dest='loans',
+                            help="Only this loan id; may be repeated.")
+
+    def handle(self, *args, **options):
+        loans = Loan.objects.filter(archived_at__isnull=True)
+        if options['loans']:
+            loans = loans.filter(pk__in=options['loans'])
+        loans = loans.order_by('pk').iterator(chunk_size=REBUILD_CHUNK_SIZE)
+        rebuilt = 0
+        while True:
+            chunk = list(islice(loans, REBUILD_CHUNK_SIZE))
+            if not chunk:
+                break
+            refresh_summaries(chunk)
+            rebuilt += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} loan summaries."))
@@ -0,0 +1,220 @@
+import hashlib
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .db_router import pin_key, replica_configured
+from .models import IdempotencyKey
+
+MUTATING_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+def idempotency_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def idempotency_lock_timeout():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+
+def _update(digest, part):
+    digest.update(part if isinstance(part, bytes) else part.encode('utf-8'))
+    digest.update(b'\0')
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        _update(digest, part)
+    return digest.hexdigest()
+
+
+def request_fingerprint(request):
+    """
+    sha256 of method, path and body. Multipart uploads are hashed from
+    their form fields and files, read in chunks: request.body would load
+    the whole upload and refuse anything over DATA_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    digest = hashlib.sha256()
+    _update(digest, request.method)
+    _update(digest, request.get_full_path())
+    if request.content_type != 'multipart/form-data':
+        _update(digest, request.body)
+        return digest.hexdigest()
+
+    for name, values in sorted(request.POST.lists()):
+        _update(digest, name)
+        for value in values:
+            _update(digest, value)
+    for name, uploads in sorted(request.FILES.lists()):
+        for upload in uploads:
+            _update(digest, name)
+            _update(digest, upload.name or '')
+            for chunk in upload.chunks():
+                digest.update(chunk)
+            digest.update(b'\0')
+            # The view reads the file again from the start.
+            upload.seek(0)
+    return digest.hexdigest()
+
+
+class IdempotencyKeyMiddleware:
+    """
+    Replays the stored response when a mutating request is retried with the
+    same Idempotency-Key header, instead of running the view again.
+
+    Keys are scoped to the caller's credentials (Authorization header or
+    session cookie) and bound to a fingerprint of method, path and body
+    (form fields and uploaded files for multipart requests). Requests
+    without credentials are not deduplicated.
+    A key that is still being processed answers 409 (until
+    IDEMPOTENCY_LOCK_TIMEOUT, after which a retry takes it over), a key
+    reused for a different request answers 422. Server errors are not
+    stored, so the client may retry them. Expired keys are removed by the
+    purge_idempotency_keys command.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.applies(request):
+            return self.get_response(request)
+        return self.handle(request, self.get_response)
+
+    async def __acall__(self, request):
+        # Async (read) views pass straight through; keyed requests go to the
+        # synchronous DRF views anyway, so they are handled in a thread.
+        if not self.applies(request):
+            return await self.get_response(request)
+        return await sync_to_async(self.handle)(request, async_to_sync(self.get_response))
+
+    @staticmethod
+    def credentials(request):
+        return request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+
+    def applies(self, request):
+        # Anonymous callers have nothing to scope their keys by, so two of
+        # them could read each other's responses; their requests run as usual.
+        return (request.method in MUTATING_METHODS and bool(request.headers.get('Idempotency-Key'))
+                and bool(self.credentials(request)))
+
+    def handle(self, request, get_response):
+        key = request.headers['Idempotency-Key']
+        if len(key) > 255:
+            return JsonResponse({"detail": "Idempotency-Key must be at most 255 characters."}, status=400)
+
+        scope = _sha256(self.credentials(request))
+        fingerprint = request_fingerprint(request)
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(scope=scope, key=key, fingerprint=fingerprint)
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+            now = timezone.now()
+            if record is None or record.created_at < now - idempotency_ttl():
+                # Expired but not yet purged: start over under the same key.
+                IdempotencyKey.objects.filter(scope=scope, key=key).delete()
+                return self.handle(request, get_response)
+            if not self.take_over(record, fingerprint, now):
+                return self.replay(record, fingerprint)
+
+        try:
+            response = get_response(request)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500 or getattr(response, 'streaming', False):
+            record.delete()
+            return response
+
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status_code=response.status_code,
+            content_type=response.get('Content-Type', ''),
+            body=response.content,
+        )
+        return response
+
+    @staticmethod
+    def take_over(record, fingerprint, now):
+        """
+        Claim a record left "in progress" for longer than
+        IDEMPOTENCY_LOCK_TIMEOUT: the request that created it died with its
+        worker, so the retry runs the view instead of answering 409.
+        The conditional UPDATE lets only one retry win.
+        """
+        if (record.status_code is not None or record.fingerprint != fingerprint
+                or record.created_at >= now - idempotency_lock_timeout()):
+            return False
+        return IdempotencyKey.objects.filter(
+            pk=record.pk, status_code__isnull=True, created_at=record.created_at,
+        ).update(created_at=now) == 1
+
+    def replay(self, record, fingerprint):
+        if record.fingerprint != fingerprint:
+            return JsonResponse(
+                {"detail": "Idempotency-Key was already used for a different request."}, status=422)
+        if record.status_code is None:
+            return JsonResponse(
+                {"detail": "A request with this Idempotency-Key is still being processed."}, status=409)
+        response = HttpResponse(bytes(record.body), status=record.status_code, content_type=record.content_type)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Read-your-own-writes for the read replica: a successful mutating
+    request pins its client (by credentials) to the primary for
+    REPLICA_STICKY_SECONDS, and pinned requests get
+    ``request.pinned_to_primary = True``, which ReplicaReadMixin honours.
+    The pin lives in the default cache, which must be shared between
+    workers for the pin to follow the client across them.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+        key = pin_key(request)
+        request.pinned_to_primary = bool(cache.get(key))
+        response = self.get_response(request)
+        if self.pins(request, response):
+            cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+        key = pin_key(request)
+        request.pinned_to_primary = bool(await cache.aget(key))
+        response = await self.get_response(request)
+        if self.pins(request, response):
+            await cache.aset(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    @staticmethod
+    def pins(request, response):
+        return request.method in MUTATING_METHODS and response.status_code < 400
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0005_loanschedule_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loan",
+            name="schedule_mode",
+            field=models.CharField(
+                choices=[("stored", "Stored"), ("virtual", "Virtual")],
+                default="stored",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0006_loan_schedule_mode"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loanschedule",
+            index=models.Index(
+                fields=["assigned_to", "due_date", "status"],
+                name="loan_sched_agent_route_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0007_loanschedule_agent_route_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attendance",
+            index=models.Index(
+                fields=["user_id", "login_time"], name="attendance_user_login_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="attendance",
+            index=models.Index(fields=["login_time"], name="attendance_login_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(fields=["phone"], name="customers_phone_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(fields=["created_at"], name="customers_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="dailycollection",
+            index=models.Index(fields=["collection_date"], name="daily_coll_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(fields=["created_at"], name="loans_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loandue",
+            index=models.Index(fields=["due_date"], name="loan_dues_due_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loanschedule",
+            index=models.Index(fields=["due_date"], name="loan_sched_due_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["user_id", "is_read", "created_at"],
+                name="notif_user_unread_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["created_at"], name="notif_created_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="dailycollection",
+            constraint=models.UniqueConstraint(
+                fields=("agent_id", "collection_date"),
+                name="daily_coll_agent_date_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="loandue",
+            constraint=models.UniqueConstraint(
+                fields=("loan", "due_number"), name="loan_dues_loan_due_number_uniq"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="loanschedule",
+            constraint=models.UniqueConstraint(
+                fields=("loan", "installment_no"),
+                name="loan_sched_loan_installment_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:15
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, Min, OuterRef, Sum
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    """
+    Same figures as myapp.utils.loan_summary.refresh_summaries, on the
+    historical models: principal counts as repaid once the installment's
+    due is paid, and a virtual loan's next due date also considers the
+    installments it has not stored yet.
+    """
+    from myapp.utils.amortization import due_dates
+
+    Loan = apps.get_model("myapp", "Loan")
+    LoanDue = apps.get_model("myapp", "LoanDue")
+    LoanSchedule = apps.get_model("myapp", "LoanSchedule")
+    LoanSummary = apps.get_model("myapp", "LoanSummary")
+
+    paid = {
+        row["loan_id"]: row
+        for row in LoanDue.objects.filter(payment_status="paid")
+        .values("loan_id")
+        .annotate(count=Count("due_id"), amount=Sum("paid_amount"))
+        .order_by()
+    }
+    repaid_principal = dict(
+        LoanSchedule.objects.filter(
+            Exists(
+                LoanDue.objects.filter(
+                    loan_id=OuterRef("loan_id"),
+                    due_number=OuterRef("installment_no"),
+                    payment_status="paid",
+                )
+            )
+        )
+        .values("loan_id")
+        .annotate(total=Sum("principal_amount"))
+        .order_by()
+        .values_list("loan_id", "total")
+    )
+    next_due = dict(
+        LoanSchedule.objects.filter(status="pending")
+        .values("loan_id")
+        .annotate(first=Min("due_date"))
+        .order_by()
+        .values_list("loan_id", "first")
+    )
+
+    virtual = list(
+        Loan.objects.filter(schedule_mode="virtual", total_due_count__gt=0).values_list(
+            "loan_id", "created_at", "repayment_mode", "total_due_count"
+        )
+    )
+    if virtual:
+        stored = defaultdict(dict)
+        for loan_id, number, schedule_status in LoanSchedule.objects.filter(
+            loan_id__in=[loan_id for loan_id, _, _, _ in virtual]
+        ).values_list("loan_id", "installment_no", "status"):
+            stored[loan_id][number] = schedule_status
+        dates = iter(
+            due_dates(
+                [created_at.date() for _, created_at, _, _ in virtual],
+                [mode for _, _, mode, _ in virtual],
+                [count for _, _, _, count in virtual],
+            ).astype(object).tolist()
+        )
+        for loan_id, _, _, count in virtual:
+            loan_dates = [next(dates) for _ in range(count)]
+            next_due[loan_id] = next(
+                (
+                    due_date
+                    for number, due_date in enumerate(loan_dates, 1)
+                    if stored[loan_id].get(number, "pending") == "pending"
+                ),
+                None,
+            )
+
+    LoanSummary.objects.bulk_create(
+        [
+            LoanSummary(
+                loan_id=loan_id,
+                paid_installments=paid.get(loan_id, {}).get("count", 0),
+                paid_amount=paid.get(loan_id, {}).get("amount") or 0,
+                outstanding_principal=principal - (repaid_principal.get(loan_id) or 0),
+                next_due_date=next_due.get(loan_id),
+            )
+            for loan_id, principal in Loan.objects.values_list("loan_id", "principal_amount")
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0008_hot_path_indexes_and_constraints"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoanSummary",
+            fields=[
+                (
+                    "loan",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="myapp.loan",
+                    ),
+                ),
+                ("paid_installments", models.IntegerField(default=0)),
+                (
+                    "paid_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "outstanding_principal",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("next_due_date", models.DateField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Loan Summary",
+                "verbose_name_plural": "Loan Summaries",
+                "db_table": "loan_summaries",
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
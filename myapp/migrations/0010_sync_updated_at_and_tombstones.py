@@ -0,0 +1,58 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0009_loansummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncTombstone",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("table", models.CharField(max_length=50)),
+                ("object_id", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "verbose_name": "Sync Tombstone",
+                "verbose_name_plural": "Sync Tombstones",
+                "db_table": "sync_tombstones",
+            },
+        ),
+        migrations.AddField(
+            model_name="loandue",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="loanschedule",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="customer",
+            index=models.Index(fields=["updated_at"], name="customers_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loandue",
+            index=models.Index(fields=["updated_at"], name="loan_dues_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loanschedule",
+            index=models.Index(
+                fields=["assigned_to", "updated_at"], name="loan_sched_agent_sync_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="synctombstone",
+            index=models.Index(
+                fields=["deleted_at", "table"], name="sync_tombstone_deleted_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def backfill_closed_at(apps, schema_editor):
+    # The last change of an already closed loan is the best guess of when it closed.
+    Loan = apps.get_model("myapp", "Loan")
+    Loan.objects.exclude(loan_status="active").update(closed_at=F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0011_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedLoanDue",
+            fields=[
+                ("due_id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("due_number", models.IntegerField()),
+                ("due_date", models.DateField()),
+                ("due_amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "paid_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "payment_method",
+                    models.CharField(
+                        blank=True,
+                        choices=[("cash", "Cash"), ("upi", "UPI"), ("card", "Card")],
+                        max_length=10,
+                        null=True,
+                    ),
+                ),
+                ("collected_by", models.BigIntegerField(blank=True, null=True)),
+                (
+                    "payment_status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("paid", "Paid"),
+                            ("skipped", "Skipped"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("skip_reason", models.TextField(blank=True, null=True)),
+                ("paid_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "Archived Loan Due",
+                "verbose_name_plural": "Archived Loan Dues",
+                "db_table": "loan_dues_archive",
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedLoanSchedule",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("installment_no", models.PositiveIntegerField()),
+                ("due_date", models.DateField()),
+                (
+                    "principal_amount",
+                    models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                (
+                    "interest_amount",
+                    models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                ("total_due", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "remaining_principal",
+                    models.DecimalField(decimal_places=2, max_digits=12),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("pending", "Pending"), ("done", "Done")],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "Archived Loan Schedule",
+                "verbose_name_plural": "Archived Loan Schedules",
+                "db_table": "loan_schedule_archive",
+                "ordering": ["installment_no"],
+            },
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="archived_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="closed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(
+                fields=["loan_status", "closed_at"], name="loans_status_closed_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedloanschedule",
+            name="assigned_to",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedloanschedule",
+            name="loan",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_schedules",
+                to="myapp.loan",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedloandue",
+            name="loan",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="archived_dues",
+                to="myapp.loan",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedloanschedule",
+            index=models.Index(fields=["due_date"], name="loan_sched_arch_due_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="archivedloandue",
+            index=models.Index(fields=["due_date"], name="loan_dues_arch_due_idx"),
+        ),
+        migrations.RunPython(backfill_closed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0012_loan_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedloanschedule",
+            name="is_overdue",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="overdue_since",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="loanschedule",
+            name="is_overdue",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(
+                fields=["loan_status", "overdue_since"], name="loans_status_overdue_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loanschedule",
+            index=models.Index(
+                condition=models.Q(("is_overdue", True)),
+                fields=["loan", "due_date"],
+                name="loan_sched_overdue_idx",
+            ),
+        ),
+    ]
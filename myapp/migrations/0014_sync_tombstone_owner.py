@@ -0,0 +1,49 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:19
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # created_at rather than the migration time, so devices do not
+    # download every existing notification again.
+    Notification = apps.get_model("myapp", "Notification")
+    Notification.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0013_overdue_tracking"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="synctombstone",
+            name="assigned_to_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="synctombstone",
+            name="loan_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["user_id", "updated_at"], name="notif_user_sync_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="synctombstone",
+            index=models.Index(
+                fields=["assigned_to_id", "deleted_at"], name="sync_tombstone_agent_idx"
+            ),
+        ),
+    ]
@@ -40,6 +40,11 @@ class Customer(models.Model):
         db_table = 'customers'
         verbose_name = 'Customer'
         verbose_name_plural = 'Customers'
+        indexes = [
+            models.Index(fields=['phone'], name='customers_phone_idx'),
+            models.Index(fields=['created_at'], name='customers_created_idx'),
+            models.Index(fields=['updated_at'], name='customers_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.customer_code} - {self.full_name}"
@@ -74,6 +79,13 @@ class Loan(models.Model):
         ('defaulted', 'Defaulted'),
     ]
 
+    # 'virtual' loans keep no schedule/due rows up front; installments are
+    # computed from the loan terms and only written once they are touched.
+    SCHEDULE_MODES = [
+        ('stored', 'Stored'),
+        ('virtual', 'Virtual'),
+    ]
+
     loan_id = models.BigAutoField(primary_key=True)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loans')
     loan_type = models.ForeignKey(LoanType, on_delete=models.SET_NULL, null=True)
@@ -83,14 +95,38 @@ class Loan(models.Model):
     interest_percentage = models.DecimalField(max_digits=5, decimal_places=2)
     repayment_mode = models.CharField(max_length=10, choices=REPAYMENT_MODES)
     loan_status = models.CharField(max_length=10, choices=LOAN_STATUS_CHOICES, default='active')
+    schedule_mode = models.CharField(max_length=10, choices=SCHEDULE_MODES, default='stored')
     created_by = models.BigIntegerField()  # admin id
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when loan_status leaves 'active' (see Loan.stamp_closed_at)
+    closed_at = models.DateTimeField(blank=True, null=True)
+    # Set once the schedule and due rows are moved to the archive tables
+    archived_at = models.DateTimeField(blank=True, null=True)
+    # Due date of the oldest pending installment past due; kept by detect_overdue_loans
+    overdue_since = models.DateField(blank=True, null=True)
 
     class Meta:
         db_table = 'loans'
         verbose_name = 'Loan'
         verbose_name_plural = 'Loans'
+        indexes = [
+            models.Index(fields=['created_at'], name='loans_created_idx'),
+            # Archival: closed/defaulted loans past the cutoff, not yet archived
+            models.Index(fields=['loan_status', 'closed_at'], name='loans_status_closed_idx'),
+            # Default detection: active loans overdue since before a cutoff
+            models.Index(fields=['loan_status', 'overdue_since'], name='loans_status_overdue_idx'),
+        ]
+
+    def stamp_closed_at(self, now=None):
+        """
+        Keep closed_at in step with loan_status. save() does this through a
+        pre_save signal; bulk writes must call it (or set closed_at) themselves.
+        """
+        if self.loan_status == 'active':
+            self.closed_at = None
+        elif self.closed_at is None:
+            self.closed_at = now or timezone.now()
 
     def __str__(self):
         return f"Loan #{self.loan_id} ({self.customer.full_name})"
@@ -121,11 +157,19 @@ class LoanDue(models.Model):
     payment_status = models.CharField(max_length=10, choices=PAYMENT_STATUS, default='pending')
     skip_reason = models.TextField(blank=True, null=True)
     paid_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'loan_dues'
         verbose_name = 'Loan Due'
         verbose_name_plural = 'Loan Dues'
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'due_number'], name='loan_dues_loan_due_number_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['due_date'], name='loan_dues_due_date_idx'),
+            models.Index(fields=['updated_at'], name='loan_dues_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Due {self.due_number} - Loan #{self.loan_id}"
@@ -148,6 +192,12 @@ class DailyCollection(models.Model):
         db_table = 'daily_collections'
         verbose_name = 'Daily Collection'
         verbose_name_plural = 'Daily Collections'
+        constraints = [
+            models.UniqueConstraint(fields=['agent_id', 'collection_date'], name='daily_coll_agent_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['collection_date'], name='daily_coll_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.collection_date} - Agent {self.agent_id}"
@@ -164,6 +214,10 @@ class Attendance(models.Model):
         db_table = 'attendance'
         verbose_name = 'Attendance'
         verbose_name_plural = 'Attendance'
+        indexes = [
+            models.Index(fields=['user_id', 'login_time'], name='attendance_user_login_idx'),
+            models.Index(fields=['login_time'], name='attendance_login_idx'),
+        ]
 
     def __str__(self):
         return f"User {self.user_id} - {self.login_time.date()}"
@@ -177,11 +231,18 @@ class Notification(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'notifications'
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
+        indexes = [
+            models.Index(fields=['user_id', 'is_read', 'created_at'], name='notif_user_unread_idx'),
+            models.Index(fields=['created_at'], name='notif_created_idx'),
+            # Delta sync: a user's notifications created or marked read since a token
+            models.Index(fields=['user_id', 'updated_at'], name='notif_user_sync_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for User {self.user_id}"
@@ -191,6 +252,8 @@ class LoanSchedule(models.Model):
         ('pending', 'Pending'),
         ('done', 'Done'),
     ]
+    # Fields the loan's LoanSummary is computed from
+    SUMMARY_FIELDS = ('status', 'due_date', 'principal_amount')
     loan = models.ForeignKey('Loan', on_delete=models.CASCADE, related_name='schedules')
     installment_no = models.PositiveIntegerField()
     due_date = models.DateField()
@@ -199,6 +262,9 @@ class LoanSchedule(models.Model):
     total_due = models.DecimalField(max_digits=12, decimal_places=2)
     remaining_principal = models.DecimalField(max_digits=12, decimal_places=2)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Pending and past its due date; kept by detect_overdue_loans
+    is_overdue = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
     assigned_to = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -213,6 +279,162 @@ class LoanSchedule(models.Model):
     class Meta:
         db_table = 'loan_schedule'
         ordering = ['installment_no']
+        constraints = [
+            models.UniqueConstraint(fields=['loan', 'installment_no'], name='loan_sched_loan_installment_uniq'),
+        ]
+        indexes = [
+            # Agent "today's route": assigned_to = ? AND due_date BETWEEN ? AND ? AND status = ?
+            models.Index(fields=['assigned_to', 'due_date', 'status'], name='loan_sched_agent_route_idx'),
+            models.Index(fields=['due_date'], name='loan_sched_due_date_idx'),
+            # Delta sync: an agent's schedules changed since a token
+            models.Index(fields=['assigned_to', 'updated_at'], name='loan_sched_agent_sync_idx'),
+            # Overdue detection: the flagged rows of a loan, oldest first
+            models.Index(fields=['loan', 'due_date'], condition=models.Q(is_overdue=True),
+                         name='loan_sched_overdue_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The agent as loaded, so a save that reassigns the row can tombstone
+        # it for the previous agent (signals.record_reassignment_tombstone)
+        instance._loaded_assigned_to_id = instance.__dict__.get('assigned_to_id')
+        # and the summary fields as loaded, so a save that changes them
+        # refreshes the loan summary (signals.refresh_schedule_summary)
+        instance._loaded_summary_values = tuple(instance.__dict__.get(name) for name in cls.SUMMARY_FIELDS)
+        return instance
+
+    def __str__(self):
+        return f"Loan {self.loan.loan_id} - Installment {self.installment_no}"
+
+
+# 9. Per-loan aggregates, kept current as payments are collected
+class LoanSummary(models.Model):
+    loan = models.OneToOneField(Loan, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    paid_installments = models.IntegerField(default=0)
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outstanding_principal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    next_due_date = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'loan_summaries'
+        verbose_name = 'Loan Summary'
+        verbose_name_plural = 'Loan Summaries'
+
+    def __str__(self):
+        return f"Summary of Loan #{self.loan_id}"
+
+
+# 10. Deleted rows, so offline devices can drop them on their next sync
+class SyncTombstone(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    table = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    # Whose device holds the row: the agent a schedule was assigned to
+    # (also written when it is reassigned away) and the loan of a due
+    assigned_to_id = models.BigIntegerField(null=True, blank=True)
+    loan_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        verbose_name = 'Sync Tombstone'
+        verbose_name_plural = 'Sync Tombstones'
+        indexes = [
+            models.Index(fields=['deleted_at', 'table'], name='sync_tombstone_deleted_idx'),
+            models.Index(fields=['assigned_to_id', 'deleted_at'], name='sync_tombstone_agent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.table} #{self.object_id} deleted at {self.deleted_at}"
+
+
+# 11. Stored responses for retried mutating requests (Idempotency-Key header)
+class IdempotencyKey(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    # sha256 of the caller's credentials, so keys from different users never collide
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and body; a reused key with another request is rejected
+    fingerprint = models.CharField(max_length=64)
+    # Null while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    body = models.BinaryField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_scope_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key}"
+
+
+# 12. Installments of archived loans, moved out of loan_schedule with their original ids
+class ArchivedLoanSchedule(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='archived_schedules')
+    installment_no = models.PositiveIntegerField()
+    due_date = models.DateField()
+    principal_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    interest_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    total_due = models.DecimalField(max_digits=12, decimal_places=2)
+    remaining_principal = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=10, choices=LoanSchedule.STATUS_CHOICES, default='pending')
+    is_overdue = models.BooleanField(default=False)
+    updated_at = models.DateTimeField()
+    assigned_to = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    class Meta:
+        db_table = 'loan_schedule_archive'
+        ordering = ['installment_no']
+        verbose_name = 'Archived Loan Schedule'
+        verbose_name_plural = 'Archived Loan Schedules'
+        indexes = [
+            models.Index(fields=['due_date'], name='loan_sched_arch_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived loan {self.loan_id} - Installment {self.installment_no}"
+
+
+# 13. Dues of archived loans, moved out of loan_dues with their original ids
+class ArchivedLoanDue(models.Model):
+    due_id = models.BigIntegerField(primary_key=True)
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='archived_dues')
+    due_number = models.IntegerField()
+    due_date = models.DateField()
+    due_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payment_method = models.CharField(max_length=10, choices=LoanDue.PAYMENT_METHODS, blank=True, null=True)
+    collected_by = models.BigIntegerField(blank=True, null=True)  # agent id
+    payment_status = models.CharField(max_length=10, choices=LoanDue.PAYMENT_STATUS, default='pending')
+    skip_reason = models.TextField(blank=True, null=True)
+    paid_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'loan_dues_archive'
+        verbose_name = 'Archived Loan Due'
+        verbose_name_plural = 'Archived Loan Dues'
+        indexes = [
+            models.Index(fields=['due_date'], name='loan_dues_arch_due_idx'),
+        ]
 
     def __str__(self):
-        return f"Loan {self.loan.loan_id} - Installment {self.installment_no}"
\ No newline at end of file
+        return f"Archived due {self.due_number} - Loan #{self.loan_id}"
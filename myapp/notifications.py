@@ -0,0 +1,190 @@
+"""
+Notification outbox.
+
+Request handlers call ``notify()`` / ``notify_many()``, which only put
+events on an in-process queue once the surrounding transaction commits.
+A background thread drains the queue in batches: each batch is written
+with one Notification bulk insert, one row per event, and the rows are
+then handed to the configured senders (SMS, push, ...) grouped per user,
+so a user gets one delivery per batch however many events were queued
+for them. A batch whose write fails is queued again, up to
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS writes, before it is dropped.
+
+Settings:
+    NOTIFICATION_SENDERS          dotted paths of sender classes
+    NOTIFICATION_OUTBOX_ASYNC     False delivers on commit in the calling
+                                  thread (tests, management commands)
+    NOTIFICATION_OUTBOX_BATCH_SIZE
+    NOTIFICATION_OUTBOX_FLUSH_INTERVAL  seconds to wait for a batch to fill
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS
+
+The queue lives in memory: events still queued when the process is
+killed are lost. A normal exit drains it first.
+"""
+import atexit
+import logging
+import queue
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# attempts: failed writes of the event so far
+NotificationEvent = namedtuple('NotificationEvent', ['user_id', 'title', 'message', 'created_at', 'attempts'],
+                               defaults=(0,))
+
+
+class BaseSender(ABC):
+    """External delivery backend. ``send`` gets one user's saved Notification rows."""
+
+    @abstractmethod
+    def send(self, user_id, notifications):
+        ...
+
+
+class LocMemSender(BaseSender):
+    """Keeps what would have been delivered in ``LocMemSender.outbox``, for tests."""
+
+    outbox = []
+
+    def send(self, user_id, notifications):
+        LocMemSender.outbox.append((user_id, [notification.title for notification in notifications]))
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class NotificationOutbox:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        # One batch is written at a time, by the worker or by flush()
+        self._write_lock = threading.Lock()
+        self._worker = None
+
+    # ---- producing ----
+    def enqueue(self, events):
+        """Queue events once the current transaction commits; dropped if it rolls back."""
+        events = list(events)
+        if events:
+            transaction.on_commit(lambda: self._put(events))
+
+    def _put(self, events):
+        if not _setting('NOTIFICATION_OUTBOX_ASYNC', True):
+            self.deliver(events)
+            return
+        for event in events:
+            self.queue.put(event)
+        self._ensure_worker()
+
+    # ---- consuming ----
+    def senders(self):
+        return [import_string(path)() for path in _setting('NOTIFICATION_SENDERS', [])]
+
+    def deliver(self, events):
+        """Write one batch of events and pass them to the senders, per user."""
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=event.user_id, title=event.title, message=event.message,
+                         created_at=event.created_at)
+            for event in events
+        ])
+        by_user = defaultdict(list)
+        for notification in notifications:
+            by_user[notification.user_id].append(notification)
+        for sender in self.senders():
+            for user_id, rows in by_user.items():
+                try:
+                    sender.send(user_id, rows)
+                except Exception:
+                    # The rows are saved; one failed delivery must not stop the others.
+                    logger.exception("%s failed for user %s", type(sender).__name__, user_id)
+        return notifications
+
+    def _next_batch(self, timeout):
+        """Block for the first event, then take whatever arrives within the flush interval."""
+        batch = [self.queue.get(timeout=timeout)]
+        batch_size = _setting('NOTIFICATION_OUTBOX_BATCH_SIZE', 500)
+        interval = _setting('NOTIFICATION_OUTBOX_FLUSH_INTERVAL', 0.5)
+        while len(batch) < batch_size:
+            try:
+                batch.append(self.queue.get(timeout=interval))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                batch = self._next_batch(timeout=None)
+            except queue.Empty:
+                continue
+            self._write(batch)
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            with self._write_lock:
+                self.deliver(batch)
+        except Exception:
+            self._retry(batch)
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def _retry(self, batch):
+        """Queue a batch that failed to write again, dropping events out of attempts."""
+        max_attempts = _setting('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 3)
+        retry = [event._replace(attempts=event.attempts + 1) for event in batch]
+        dropped = [event for event in retry if event.attempts >= max_attempts]
+        retry = [event for event in retry if event.attempts < max_attempts]
+        if dropped:
+            logger.exception("Dropped %d notifications after %d attempts", len(dropped), max_attempts)
+        if retry:
+            logger.warning("Writing %d notifications failed; queued again", len(retry), exc_info=True)
+        for event in retry:
+            self.queue.put(event)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='notification-outbox', daemon=True)
+                self._worker.start()
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        batch_size = _setting('NOTIFICATION_OUTBOX_BATCH_SIZE', 500)
+        while True:
+            batch = []
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._write(batch)
+        # Wait for a batch the worker is already writing.
+        self.queue.join()
+
+
+outbox = NotificationOutbox()
+atexit.register(outbox.flush)
+
+
+def notify(user_id, title, message):
+    notify_many([(user_id, title, message)])
+
+
+def notify_many(notifications):
+    """Queue (user_id, title, message) notifications."""
+    now = timezone.now()
+    outbox.enqueue(NotificationEvent(user_id, title, message, now) for user_id, title, message in notifications)
@@ -0,0 +1,11 @@
+from rest_framework import permissions
+
+
+class IsMasterAdmin(permissions.BasePermission):
+    """
+    Allows access only to users with role='master_admin'.
+    """
+    message = "Only master admins can access this resource."
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.role == 'master_admin')
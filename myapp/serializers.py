@@ -13,7 +13,7 @@ class LoginSerializer(serializers.Serializer):
         raise serializers.ValidationError("Invalid email or password")
 
 
-class ChangePasswordSerializer(serializers.ModelSerializer):
+class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True)
 
@@ -55,9 +55,38 @@ class LoanTypeSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+from decimal import Decimal
+
 from rest_framework import serializers
+from django.db import transaction
 from .models import Loan, LoanSchedule, Customer, LoanType
 from .utils.loan_schedule import create_flat_schedule, create_reducing_schedule  # import your functions
+from .utils import reference_cache
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves ids through a reference_cache
+    lookup returning {pk: instance} instead of querying per request.
+    ``queryset`` is still used for the browsable API's choices.
+    """
+
+    def __init__(self, lookup, **kwargs):
+        self.lookup = lookup
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = self.lookup().get(pk)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
 
 class LoanSerializer(serializers.ModelSerializer):
     customer = CustomerSerializer(read_only=True)
@@ -66,26 +95,83 @@ class LoanSerializer(serializers.ModelSerializer):
     customer_id = serializers.PrimaryKeyRelatedField(
         source='customer', queryset=Customer.objects.all(), write_only=True
     )
-    loan_type_id = serializers.PrimaryKeyRelatedField(
+    loan_type_id = CachedPrimaryKeyRelatedField(
+        lookup=reference_cache.loan_types_by_id,
         source='loan_type', queryset=LoanType.objects.all(), write_only=True
     )
 
     class Meta:
         model = Loan
         fields = '__all__'
+        read_only_fields = ['closed_at', 'archived_at', 'overdue_since']
 
     def create(self, validated_data):
-        # Create the loan instance
-        loan = Loan.objects.create(**validated_data)
-        
-        # Generate repayment schedule automatically
-        # Choose either flat or reducing balance
-        create_flat_schedule(loan)
-        # OR for reducing balance: create_reducing_schedule(loan)
+        with transaction.atomic():
+            # Create the loan instance
+            loan = Loan.objects.create(**validated_data)
+
+            # Generate repayment schedule automatically (bulk insert).
+            # Virtual loans compute theirs on demand instead.
+            # Choose either flat or reducing balance
+            if loan.schedule_mode == 'stored':
+                create_flat_schedule(loan)
+                # OR for reducing balance: create_reducing_schedule(loan)
+            # The summary row is created by signals.maintain_loan_summary
 
         return loan
 
 
+class PortfolioBucketSerializer(serializers.Serializer):
+    """One group of the portfolio summary; ``key`` is null for the overall totals."""
+    key = serializers.CharField(allow_null=True)
+    loans = serializers.IntegerField()
+    total_disbursed = serializers.DecimalField(max_digits=16, decimal_places=2)
+    outstanding_principal = serializers.DecimalField(max_digits=16, decimal_places=2)
+    collected_to_date = serializers.DecimalField(max_digits=16, decimal_places=2)
+    overdue_loans = serializers.IntegerField()
+    overdue_outstanding = serializers.DecimalField(max_digits=16, decimal_places=2)
+
+
+class MaterializeInstallmentSerializer(serializers.Serializer):
+    installment_no = serializers.IntegerField(min_value=1)
+
+
+class LoanQuoteSerializer(serializers.Serializer):
+    principal_amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    total_due_count = serializers.IntegerField(min_value=1, max_value=3650)
+    interest_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    repayment_mode = serializers.ChoiceField(choices=Loan.REPAYMENT_MODES)
+    start_date = serializers.DateField(required=False)
+    method = serializers.ChoiceField(choices=['flat', 'reducing'], default='flat')
+
+
+class LoanImportRowSerializer(serializers.Serializer):
+    """
+    One row of a bulk loan import. Foreign keys are checked against the
+    id sets passed in the context instead of querying per row.
+    """
+    customer_id = serializers.IntegerField()
+    loan_type_id = serializers.IntegerField(required=False, allow_null=True)
+    principal_amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    total_due_count = serializers.IntegerField(min_value=1)
+    due_amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    interest_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    repayment_mode = serializers.ChoiceField(choices=Loan.REPAYMENT_MODES)
+    loan_status = serializers.ChoiceField(choices=Loan.LOAN_STATUS_CHOICES, default='active')
+    schedule_mode = serializers.ChoiceField(choices=Loan.SCHEDULE_MODES, default='stored')
+    created_at = serializers.DateTimeField(required=False)
+
+    def validate_customer_id(self, value):
+        if value not in self.context['customer_ids']:
+            raise serializers.ValidationError("Customer not found.")
+        return value
+
+    def validate_loan_type_id(self, value):
+        if value is not None and value not in self.context['loan_type_ids']:
+            raise serializers.ValidationError("Loan type not found.")
+        return value
+
+
 from rest_framework import serializers
 from .models import LoanDue
 
@@ -101,6 +187,30 @@ class LoanDueSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class PaymentEntrySerializer(serializers.Serializer):
+    """
+    One collected installment, by schedule id or by loan and installment
+    number (which also reaches virtual installments not stored yet);
+    paid_amount defaults to the schedule's total_due.
+    """
+    schedule = serializers.IntegerField(required=False)
+    loan = serializers.IntegerField(required=False)
+    installment_no = serializers.IntegerField(required=False, min_value=1)
+    paid_amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0,
+                                           required=False, allow_null=True)
+    payment_method = serializers.ChoiceField(choices=LoanDue.PAYMENT_METHODS, default='cash')
+    collected_at = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        if 'schedule' not in data and not ('loan' in data and 'installment_no' in data):
+            raise serializers.ValidationError("Provide schedule, or loan and installment_no.")
+        return data
+
+
+class BatchCollectSerializer(serializers.Serializer):
+    payments = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=1000)
+
+
 class DailyCollectionSerializer(serializers.ModelSerializer):
     total_amount = serializers.ReadOnlyField()
 
@@ -124,6 +234,10 @@ from rest_framework import serializers
 from .models import LoanSchedule, Loan
 
 class LoanScheduleSerializer(serializers.ModelSerializer):
+    assigned_to = CachedPrimaryKeyRelatedField(
+        lookup=reference_cache.collection_agents_by_id,
+        queryset=CustomUser.objects.filter(role='collection_agent'), allow_null=True, required=False)
+
     class Meta:
         model = LoanSchedule
         fields = [
@@ -137,15 +251,50 @@ class LoanScheduleSerializer(serializers.ModelSerializer):
             'remaining_principal',
             'assigned_to',
             'status',
+            'is_overdue',
+            'updated_at',
         ]
-        read_only_fields = ['id', 'loan']
+        read_only_fields = ['id', 'loan', 'is_overdue', 'updated_at']
+class AgentRouteSerializer(serializers.Serializer):
+    """
+    One stop on an agent's route; built from a .values() row that already
+    carries the customer columns, so no per-row lookups are made.
+    """
+    id = serializers.IntegerField()
+    loan_id = serializers.IntegerField()
+    installment_no = serializers.IntegerField()
+    due_date = serializers.DateField()
+    total_due = serializers.DecimalField(max_digits=12, decimal_places=2)
+    status = serializers.CharField()
+    customer_id = serializers.IntegerField()
+    customer_name = serializers.CharField()
+    customer_phone = serializers.CharField()
+    customer_address = serializers.CharField(allow_null=True)
+
+
+class AgentRouteQuerySerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if 'date' in data:
+            data['date_from'] = data['date_to'] = data['date']
+        if bool(data.get('date_from')) != bool(data.get('date_to')):
+            raise serializers.ValidationError("date_from and date_to must be given together.")
+        if data.get('date_from') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError("date_from must not be after date_to.")
+        return data
+
 # serializers.py
 
 from rest_framework import serializers
 from .models import LoanSchedule, CustomUser
+from .utils.loan_schedule import materialize_due
 
 class LoanScheduleAssignSerializer(serializers.ModelSerializer):
-    assigned_to_id = serializers.PrimaryKeyRelatedField(
+    assigned_to_id = CachedPrimaryKeyRelatedField(
+        lookup=reference_cache.collection_agents_by_id,
         queryset=CustomUser.objects.filter(role='collection_agent'),
         source='assigned_to',
         write_only=True
@@ -160,6 +309,78 @@ class LoanScheduleAssignSerializer(serializers.ModelSerializer):
         instance.assigned_to = assigned_agent
         instance.save()
         return instance
+class LoanScheduleBulkAssignSerializer(serializers.Serializer):
+    """
+    Selects schedules by ids, loans and/or a due-date window (all given
+    filters must match) and the collection agent to assign them to.
+    """
+    assigned_to = CachedPrimaryKeyRelatedField(
+        lookup=reference_cache.collection_agents_by_id, queryset=CustomUser.objects.filter(role='collection_agent'))
+    schedule_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    loan_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    due_date_from = serializers.DateField(required=False)
+    due_date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if not any(key in data for key in ('schedule_ids', 'loan_ids', 'due_date_from', 'due_date_to')):
+            raise serializers.ValidationError(
+                "Provide schedule_ids, loan_ids or a due_date_from/due_date_to range.")
+        if data.get('due_date_from') and data.get('due_date_to') and data['due_date_from'] > data['due_date_to']:
+            raise serializers.ValidationError("due_date_from must not be after due_date_to.")
+        return data
+
+    def materialize_virtual(self):
+        """
+        Write the not yet stored installments of virtual loans that the
+        loan and due-date filters select, so the assignment covers them.
+        schedule_ids only ever name stored rows.
+        """
+        data = self.validated_data
+        if 'schedule_ids' in data:
+            return 0
+        loans = Loan.objects.all()
+        if 'loan_ids' in data:
+            loans = loans.filter(pk__in=data['loan_ids'])
+        return materialize_due(loans, data.get('due_date_from'), data.get('due_date_to'))
+
+    def get_schedules(self):
+        schedules = LoanSchedule.objects.all()
+        data = self.validated_data
+        if 'schedule_ids' in data:
+            schedules = schedules.filter(id__in=data['schedule_ids'])
+        if 'loan_ids' in data:
+            schedules = schedules.filter(loan_id__in=data['loan_ids'])
+        if 'due_date_from' in data:
+            schedules = schedules.filter(due_date__gte=data['due_date_from'])
+        if 'due_date_to' in data:
+            schedules = schedules.filter(due_date__lte=data['due_date_to'])
+        return schedules
+
+
+class LedgerExportQuerySerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=['csv', 'parquet'], default='csv')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    loan_status = serializers.ChoiceField(choices=Loan.LOAN_STATUS_CHOICES, required=False)
+    loan_type = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError("date_from must not be after date_to.")
+        return data
+
+
+class AutoAssignSerializer(serializers.Serializer):
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError("date_from must not be after date_to.")
+        return data
+
+
 from rest_framework import serializers
 from .models import CustomUser
 
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import Loan, LoanSchedule, LoanDue, LoanType, SyncTombstone
+from .utils import reference_cache
+from .utils.loan_summary import create_summaries, refresh_summaries
+
+
+@receiver(post_delete, sender=LoanSchedule)
+@receiver(post_delete, sender=LoanDue)
+def record_sync_tombstone(sender, instance, **kwargs):
+    """
+    Remember deleted schedule/due rows so the sync feed can tell the
+    devices holding them to drop them.
+    """
+    SyncTombstone.objects.create(
+        table=sender._meta.db_table,
+        object_id=instance.pk,
+        assigned_to_id=getattr(instance, 'assigned_to_id', None),
+        loan_id=instance.loan_id,
+    )
+
+
+@receiver(post_save, sender=LoanSchedule)
+def record_reassignment_tombstone(sender, instance, created, **kwargs):
+    """
+    A schedule moved to another agent (or unassigned) is gone from the
+    previous agent's feed; tombstone it for that agent's device.
+    """
+    previous = getattr(instance, '_loaded_assigned_to_id', None)
+    if not created and previous is not None and previous != instance.assigned_to_id:
+        SyncTombstone.objects.create(
+            table=sender._meta.db_table,
+            object_id=instance.pk,
+            assigned_to_id=previous,
+            loan_id=instance.loan_id,
+        )
+    instance._loaded_assigned_to_id = instance.assigned_to_id
+
+
+@receiver(post_save, sender=LoanSchedule)
+def refresh_schedule_summary(sender, instance, created, **kwargs):
+    """
+    A schedule edited one at a time (PATCH, admin) whose status, due date
+    or principal changed moves its loan's summary; recompute it.
+    Bulk writes go through apply_payments or `rebuild_loan_summaries`.
+    """
+    values = tuple(getattr(instance, name) for name in sender.SUMMARY_FIELDS)
+    previous = getattr(instance, '_loaded_summary_values', None)
+    if not created and previous is not None and previous != values:
+        refresh_summaries([instance.loan])
+    instance._loaded_summary_values = values
+
+
+@receiver(pre_save, sender=Loan)
+def stamp_loan_closed_at(sender, instance, **kwargs):
+    """
+    Keep closed_at in step with loan_status; archive_closed_loans picks
+    loans by how long they have been closed.
+    """
+    instance.stamp_closed_at()
+
+
+@receiver(post_save, sender=Loan)
+def maintain_loan_summary(sender, instance, created, raw=False, **kwargs):
+    """
+    Every loan saved one at a time (API, admin) gets its summary row;
+    an edited loan's summary is recomputed, as its principal may change.
+    """
+    if raw:
+        return
+    if created:
+        create_summaries([instance])
+    else:
+        refresh_summaries([instance])
+
+
+# User fields that decide whether, and as whom, a token authenticates
+TOKEN_USER_FIELDS = {'password', 'is_active', 'role'}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_tokens(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Password, role and is_active changes must apply to the next request,
+    so drop the user's tokens from the authentication cache on saves that
+    may change them; saves of other fields only (e.g. last_login on each
+    login) leave the cache alone.
+    """
+    if created or (update_fields is not None and TOKEN_USER_FIELDS.isdisjoint(update_fields)):
+        return
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """Logout deletes the token; it must stop authenticating at once."""
+    token_cache.invalidate(instance.key, instance.user_id)
+
+
+@receiver(post_save, sender=LoanType)
+@receiver(post_delete, sender=LoanType)
+def invalidate_loan_type_cache(sender, **kwargs):
+    reference_cache.invalidate(reference_cache.LOAN_TYPES)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cache(sender, update_fields=None, **kwargs):
+    # A login only writes last_login, which no cached value shows
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    reference_cache.invalidate(reference_cache.USERS)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Tune each new SQLite connection with the PRAGMAS of its DATABASES
+    entry (see SQLITE_PRAGMAS in settings): mmap, page cache size and
+    busy_timeout, plus WAL and synchronous=NORMAL when SQLITE_WAL is set.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
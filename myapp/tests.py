@@ -1,3 +1,1633 @@
-from django.test import TestCase
+import base64
+import importlib
+import io
+import json
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pyarrow.parquet as pq
+from dateutil.relativedelta import relativedelta
+
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import TokenCache, token_cache
+from .db_router import REPLICA, ReplicaRouter, pin_key, replica_reads
+from .models import (
+    ArchivedLoanDue, ArchivedLoanSchedule, Attendance, CustomUser, Customer, DailyCollection, IdempotencyKey, LoanDue,
+    LoanSummary, LoanType, Loan, LoanSchedule, Notification, SyncTombstone,
+)
+from .notifications import BaseSender, LocMemSender, NotificationEvent, NotificationOutbox
+from .serializers import (
+    AttendanceSerializer, CustomerSerializer, LoanDueSerializer, LoanScheduleSerializer, LoanSerializer,
+    LoanTypeSerializer, NotificationSerializer,
+)
+from .utils.amortization import FLAT, REDUCING, amortize
+from .utils.archive import archive_closed_loans
+from .utils import assignment_planner, reference_cache
+from .utils.assignment_planner import auto_assign, plan_assignments
+from .utils.lean import lean_representation
+from .utils.ledger_export import EXPORT_TABLES, export_chunks, export_queryset, export_rows
+from .utils.loan_import import import_loans
+from .utils.loan_summary import refresh_summaries
+from .utils.loan_schedule import (
+    create_flat_schedule, materialize_due, materialize_installment, materialize_installments, merged_schedule,
+)
+from .utils.overdue import detect_overdue
+from .utils.streaming import encode_json_array
+from .utils.sync import encode_token
+from .views import LoanDueViewSet, LoanScheduleListAPIView
+
+
+class LoanDataMixin:
+    """Small fixture shared by the API tests: two agents, one customer, one loan."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', role='master_admin')
+        self.agent = CustomUser.objects.create_user(
+            username='agent', email='agent@example.com', password='pass', role='collection_agent')
+        self.other_agent = CustomUser.objects.create_user(
+            username='agent2', email='agent2@example.com', password='pass', role='collection_agent')
+        self.customer = Customer.objects.create(
+            customer_code='C001', full_name='Ravi Kumar', phone='9000000001', address='12 Main Road')
+        self.loan_type = LoanType.objects.create(name='Daily')
+        self.loan = Loan.objects.create(
+            customer=self.customer, loan_type=self.loan_type, principal_amount='10000.00',
+            total_due_count=10, due_amount='1100.00', interest_percentage='10.00',
+            repayment_mode='daily', created_by=self.admin.id)
+        self.client = APIClient()
+
+    def add_schedule(self, installment_no, due_date, assigned_to=None, status='pending'):
+        return LoanSchedule.objects.create(
+            loan=self.loan, installment_no=installment_no, due_date=due_date,
+            principal_amount='1000.00', interest_amount='100.00', total_due='1100.00',
+            remaining_principal='0.00', assigned_to=assigned_to, status=status)
+
+
+class AgentRouteTests(LoanDataMixin, TestCase):
+
+    def test_returns_own_pending_installments_with_customer(self):
+        today = date(2025, 1, 10)
+        mine = self.add_schedule(1, today, assigned_to=self.agent)
+        self.add_schedule(2, today, assigned_to=self.agent, status='done')
+        self.add_schedule(3, today, assigned_to=self.other_agent)
+        self.add_schedule(4, today + timedelta(days=1), assigned_to=self.agent)
+
+        self.client.force_authenticate(self.agent)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/agents/route/', {'date': '2025-01-10'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([row['id'] for row in response.data['results']], [mine.id])
+        row = response.data['results'][0]
+        self.assertEqual(row['customer_name'], 'Ravi Kumar')
+        self.assertEqual(row['customer_phone'], '9000000001')
+        self.assertEqual(row['customer_address'], '12 Main Road')
+        self.assertEqual(row['total_due'], '1100.00')
+
+    def test_date_range(self):
+        start = date(2025, 1, 10)
+        for n in range(1, 6):
+            self.add_schedule(n, start + timedelta(days=n - 1), assigned_to=self.agent)
+
+        self.client.force_authenticate(self.agent)
+        response = self.client.get(
+            '/api/auth/agents/route/', {'date_from': '2025-01-11', 'date_to': '2025-01-13'})
+
+        self.assertEqual([row['installment_no'] for row in response.data['results']], [2, 3, 4])
+
+    def test_query_is_served_by_route_index(self):
+        """
+        The route query must be an index range search, so its cost stays
+        flat as loan_schedule grows rather than scanning the table.
+        """
+        plan = (
+            LoanSchedule.objects
+            .filter(assigned_to_id=self.agent.id, due_date__range=(date(2025, 1, 1), date(2025, 1, 7)),
+                    status='pending')
+            .order_by('due_date', 'id')
+            .values('id', 'loan__customer__full_name')
+            .explain()
+        )
+        if connection.vendor == 'sqlite':
+            self.assertIn('loan_sched_agent_route_idx', plan)
+
+
+class QueryPlanTests(LoanDataMixin, TestCase):
+    """
+    Every SELECT issued by the core endpoints must be answered from an
+    index. A bare "SCAN <table>" in SQLite's plan means a full table scan.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for n in range(1, 6):
+            self.add_schedule(n, date(2025, 1, n), assigned_to=self.agent)
+        self.loan.dues.create(due_number=1, due_date=date(2025, 1, 1), due_amount='1100.00')
+        self.client.force_authenticate(self.admin)
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            details = [row[-1] for row in cursor.fetchall()]
+        return [d for d in details if d.startswith('SCAN') and 'USING' not in d and 'CONSTANT ROW' not in d]
+
+    def assert_no_full_scans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, url)
+        for query in queries:
+            if query['sql'].lstrip().upper().startswith('SELECT'):
+                self.assertEqual(self.full_scans(query['sql']), [], f"{url}: {query['sql']}")
+        return response
+
+    def test_core_endpoints_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan check is written against SQLite EXPLAIN QUERY PLAN output')
+        for url in [
+            '/api/auth/loan-schedules/',
+            '/api/auth/loan-dues/',
+            '/api/auth/loans/',
+            '/api/auth/customers/',
+            '/api/auth/notifications/',
+            f'/api/auth/loan-schedules/{self.loan.pk}/',
+            f'/api/auth/loans/{self.loan.pk}/details/',
+        ]:
+            first = self.assert_no_full_scans(url, {'page_size': 2})
+            if isinstance(first.data, dict) and first.data.get('next'):
+                self.assert_no_full_scans(first.data['next'])
+
+        self.client.force_authenticate(self.agent)
+        self.assert_no_full_scans('/api/auth/agents/route/', {'date': '2025-01-02'})
+
+
+class LoanCreationQueryTests(LoanDataMixin, TestCase):
+    """Creating a loan writes its schedule and dues in bulk, not one row per installment."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_authenticate(self.admin)
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_loan(self, installments, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.post('/api/auth/loans/', {
+                'customer_id': self.customer.pk, 'loan_type_id': self.loan_type.pk, 'principal_amount': '12000.00',
+                'total_due_count': installments, 'due_amount': '1100.00', 'interest_percentage': '10.00',
+                'repayment_mode': 'daily', 'created_by': self.admin.id,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        loan_id = response.data['loan_id']
+        self.assertEqual(LoanSchedule.objects.filter(loan_id=loan_id).count(), installments)
+        self.assertEqual(LoanDue.objects.filter(loan_id=loan_id).count(), installments)
+
+    def test_short_tenure_loan(self):
+        # customer and loan type lookups, loan, summary, one INSERT each
+        # for schedules and dues, and two savepoints
+        self.create_loan(12, queries=10)
+
+    def test_long_tenure_loan(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('batch count is written against SQLite\'s 999-parameter limit')
+        # Same statements; SQLite splits each bulk INSERT into 5 batches
+        self.create_loan(365, queries=18)
+
+
+@mock.patch('myapp.middleware.replica_configured', return_value=True)
+@mock.patch('myapp.db_router.replica_configured', return_value=True)
+class ReplicaRoutingTests(LoanDataMixin, TestCase):
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_reads_use_replica_only_when_opted_in(self, *mocks):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Loan))
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Loan), REPLICA)
+            self.assertEqual(router.db_for_write(Loan), 'default')
+        self.assertIsNone(router.db_for_read(Loan))
+
+    def test_successful_write_pins_client_to_primary(self, *mocks):
+        self.client.force_authenticate(self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION='Token abc')
+        response = self.client.post(
+            '/api/auth/notifications/', {'user_id': self.agent.id, 'title': 't', 'message': 'm'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(cache.get(pin_key(response.wsgi_request)))
+
+
+class ReplicaDatabaseTests(LoanDataMixin, TransactionTestCase):
+    """Routing against a real second alias: an empty, separately migrated replica."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Added here rather than in settings, so other runs do not build it.
+        # connections.settings is the settings.DATABASES dict itself.
+        cls.databases = {'default', REPLICA}
+        connections.settings[REPLICA] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+        connections.configure_settings(connections.settings)
+        connections[REPLICA].creation.create_test_db(verbosity=0, autoclobber=True)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].creation.destroy_test_db(':memory:', verbosity=0)
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def setUp(self):
+        super().setUp()
+        self.schedule = self.add_schedule(1, date(2025, 1, 10))
+        self.client.force_authenticate(self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION='Token abc')
+
+    def tearDown(self):
+        cache.clear()
+
+    def schedule_ids(self, **params):
+        response = self.client.get('/api/auth/loan-schedules/', params)
+        if response.streaming:
+            return [row['id'] for row in json.loads(b''.join(response.streaming_content))]
+        return [row['id'] for row in response.data['results']]
+
+    def test_opted_in_views_read_the_replica_until_the_client_writes(self):
+        with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+            self.assertEqual(self.schedule_ids(), [])
+            self.assertEqual(self.schedule_ids(stream='true'), [])
+        self.assertTrue(replica_queries.captured_queries)
+        # Actions that did not opt in stay on the primary
+        response = self.client.get('/api/auth/loans/')
+        self.assertEqual([row['loan_id'] for row in response.data['results']], [self.loan.pk])
+
+        response = self.client.patch(
+            f'/api/auth/loan-schedules/{self.loan.pk}/installments/1/', {'status': 'done'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+            self.assertEqual(self.schedule_ids(), [self.schedule.pk])
+            self.assertEqual(self.schedule_ids(stream='true'), [self.schedule.pk])
+        self.assertEqual(replica_queries.captured_queries, [])
+
+        # Another client has not written, so it still reads the replica
+        self.client.credentials(HTTP_AUTHORIZATION='Token other')
+        self.assertEqual(self.schedule_ids(), [])
+
+
+class LoanImportTests(LoanDataMixin, TestCase):
+    CSV = (
+        "customer_id,loan_type_id,principal_amount,total_due_count,due_amount,interest_percentage,"
+        "repayment_mode,created_at\n"
+        "{customer},{loan_type},1000.00,4,275.00,10.00,daily,2025-01-01T09:00:00Z\n"
+        "999,,500.00,2,300.00,20.00,yearly,\n"
+        "{customer},,1200.00,3,440.00,10.00,monthly,2025-01-31T09:00:00Z\n"
+    )
+
+    def test_csv_import_reports_row_errors_and_writes_schedules_dues_and_summaries(self):
+        data = self.CSV.format(customer=self.customer.pk, loan_type=self.loan_type.pk).encode()
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/auth/loans/import/',
+                                    {'file': SimpleUploadedFile('loans.csv', data, content_type='text/csv')},
+                                    format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rows'], response.data['imported']), (3, 2))
+        [error] = response.data['errors']
+        self.assertEqual(error['row'], 3)
+        self.assertEqual(set(error['errors']), {'customer_id', 'repayment_mode'})
+
+        daily, monthly = Loan.objects.exclude(pk=self.loan.pk).order_by('pk')
+        self.assertEqual(daily.created_by, self.admin.id)
+        for loan, count in ((daily, 4), (monthly, 3)):
+            schedules = list(LoanSchedule.objects.filter(loan=loan).order_by('installment_no'))
+            dues = list(LoanDue.objects.filter(loan=loan).order_by('due_number'))
+            self.assertEqual([schedule.installment_no for schedule in schedules], list(range(1, count + 1)))
+            self.assertEqual([(due.due_number, due.due_date, due.due_amount) for due in dues],
+                             [(s.installment_no, s.due_date, s.total_due) for s in schedules])
+            # Flat interest: the installments add up to principal plus interest
+            interest = loan.principal_amount * loan.interest_percentage / 100
+            self.assertEqual(sum(s.total_due for s in schedules), loan.principal_amount + interest)
+            summary = loan.summary
+            self.assertEqual((summary.paid_installments, summary.outstanding_principal), (0, loan.principal_amount))
+            self.assertEqual(summary.next_due_date, loan.created_at.date())
+        # Stepped a month at a time, as relativedelta does: once clipped to Feb 28 it stays on the 28th
+        self.assertEqual([s.due_date for s in LoanSchedule.objects.filter(loan=monthly).order_by('installment_no')],
+                         [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 28)])
+
+
+class BatchCollectTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.schedules = [self.add_schedule(n, date(2025, 1, 9 + n)) for n in (1, 2, 3)]
+        self.client.force_authenticate(self.agent)
+
+    def collect(self, *payments):
+        return self.client.post('/api/auth/loan-schedules/collect-batch/', {'payments': list(payments)}, format='json')
+
+    def test_partial_failure_is_reported_per_entry(self):
+        first, second, third = self.schedules
+        response = self.collect(
+            {'schedule': first.id, 'collected_at': '2025-01-10T09:00:00Z'},
+            {'schedule': 999999},
+            {'schedule': second.id, 'paid_amount': '500.00', 'payment_method': 'upi',
+             'collected_at': '2025-01-10T10:00:00Z'},
+            {'schedule': first.id},
+            {'paid_amount': '100.00'},
+            {'schedule': third.id, 'payment_method': 'cheque'},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['collected'], response.data['failed']), (2, 4))
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['ok', 'error', 'ok', 'error', 'error', 'error'])
+        self.assertEqual(results[1]['errors'], {'schedule': ["Schedule not found."]})
+        self.assertEqual(results[3]['errors'], {'schedule': ["Duplicate entry for this schedule."]})
+        self.assertIn('payment_method', results[5]['errors'])
+        self.assertEqual(results[2]['loan_due']['paid_amount'], '500.00')
+
+        self.assertEqual(
+            dict(LoanDue.objects.values_list('due_number', 'payment_status')), {1: 'paid', 2: 'paid'})
+        third.refresh_from_db()
+        self.assertEqual(third.status, 'pending')
+        collection = DailyCollection.objects.get(agent_id=self.agent.id, collection_date=date(2025, 1, 10))
+        self.assertEqual((collection.cash_total, collection.upi_total), (Decimal('1100.00'), Decimal('500.00')))
+        summary = LoanSummary.objects.get(loan=self.loan)
+        self.assertEqual(summary.paid_installments, 2)
+        self.assertEqual(summary.paid_amount, Decimal('1600.00'))
+        self.assertEqual(summary.outstanding_principal, Decimal('8000.00'))
+        self.assertEqual(summary.next_due_date, third.due_date)
+
+    def test_recollecting_a_paid_due_moves_its_amount(self):
+        first = self.schedules[0]
+        self.collect({'schedule': first.id, 'collected_at': '2025-01-10T09:00:00Z'})
+        self.client.force_authenticate(self.other_agent)
+        response = self.collect({'schedule': first.id, 'paid_amount': '1000.00', 'payment_method': 'upi',
+                                 'collected_at': '2025-01-11T09:00:00Z'})
+
+        self.assertEqual(response.data['collected'], 1)
+        due = LoanDue.objects.get(loan=self.loan)
+        self.assertEqual((due.collected_by, due.paid_amount, due.payment_method),
+                         (self.other_agent.id, Decimal('1000.00'), 'upi'))
+        totals = {
+            (row.agent_id, row.collection_date): (row.cash_total, row.upi_total)
+            for row in DailyCollection.objects.all()
+        }
+        self.assertEqual(totals, {
+            (self.agent.id, date(2025, 1, 10)): (Decimal('0.00'), Decimal('0.00')),
+            (self.other_agent.id, date(2025, 1, 11)): (Decimal('0.00'), Decimal('1000.00')),
+        })
+        summary = LoanSummary.objects.get(loan=self.loan)
+        self.assertEqual(summary.paid_installments, 1)
+        self.assertEqual(summary.paid_amount, Decimal('1000.00'))
+        self.assertEqual(summary.outstanding_principal, Decimal('9000.00'))
+        self.assertEqual(summary.next_due_date, date(2025, 1, 11))
+
+    def test_rebuild_restores_totals_from_hot_and_archived_dues(self):
+        first, second, _ = self.schedules
+        self.collect(
+            {'schedule': first.id, 'collected_at': '2025-01-10T09:00:00Z'},
+            {'schedule': second.id, 'paid_amount': '500.00', 'payment_method': 'upi',
+             'collected_at': '2025-01-11T09:00:00Z'},
+        )
+        self.loan.loan_status = 'closed'
+        self.loan.save()
+        Loan.objects.filter(pk=self.loan.pk).update(closed_at=timezone.now() - timedelta(days=60))
+        self.assertEqual(archive_closed_loans(30)['dues'], 2)
+
+        other_loan = Loan.objects.create(
+            customer=self.customer, loan_type=self.loan_type, principal_amount='1000.00', total_due_count=1,
+            due_amount='1100.00', interest_percentage='10.00', repayment_mode='daily', created_by=self.admin.id)
+        schedule = LoanSchedule.objects.create(
+            loan=other_loan, installment_no=1, due_date=date(2025, 1, 11), principal_amount='1000.00',
+            interest_amount='100.00', total_due='1100.00', remaining_principal='0.00')
+        self.client.force_authenticate(self.other_agent)
+        self.collect({'schedule': schedule.id, 'payment_method': 'card', 'collected_at': '2025-01-11T10:00:00Z'})
+
+        def totals():
+            return {
+                (row.agent_id, row.collection_date): (row.cash_total, row.upi_total, row.card_total)
+                for row in DailyCollection.objects.all()
+            }
+
+        expected = totals()
+        self.assertEqual(expected, {
+            (self.agent.id, date(2025, 1, 10)): (Decimal('1100.00'), Decimal('0.00'), Decimal('0.00')),
+            (self.agent.id, date(2025, 1, 11)): (Decimal('0.00'), Decimal('500.00'), Decimal('0.00')),
+            (self.other_agent.id, date(2025, 1, 11)): (Decimal('0.00'), Decimal('0.00'), Decimal('1100.00')),
+        })
+        DailyCollection.objects.all().delete()
+
+        call_command('rebuild_daily_collections', '--from', '2025-01-10', '--to', '2025-01-11', stdout=io.StringIO())
+
+        self.assertEqual(totals(), expected)
+
+
+class LoanSummaryMaintenanceTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.schedules = [self.add_schedule(n, date(2025, 1, 9 + n)) for n in (1, 2, 3)]
+        self.client.force_authenticate(self.admin)
+
+    def test_loans_saved_one_at_a_time_get_a_summary(self):
+        summary = LoanSummary.objects.get(loan=self.loan)
+        self.assertEqual(summary.outstanding_principal, Decimal('10000.00'))
+        self.assertEqual(summary.next_due_date, self.loan.created_at.date())
+
+    def test_editing_the_loan_or_a_schedule_refreshes_the_summary(self):
+        self.client.force_authenticate(self.agent)
+        self.client.post('/api/auth/loan-schedules/collect-batch/', {'payments': [
+            {'schedule': self.schedules[0].id}]}, format='json')
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.patch(f'/api/auth/loans/{self.loan.pk}/', {'principal_amount': '12000.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        summary = LoanSummary.objects.get(loan=self.loan)
+        self.assertEqual(summary.outstanding_principal, Decimal('11000.00'))
+        self.assertEqual((summary.paid_installments, summary.paid_amount), (1, Decimal('1100.00')))
+
+        response = self.client.patch(
+            f'/api/auth/loan-schedules/{self.loan.pk}/installments/2/', {'status': 'done'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(LoanSummary.objects.get(loan=self.loan).next_due_date, self.schedules[2].due_date)
+
+    def test_rebuild_command_restores_missing_and_stale_rows(self):
+        LoanSummary.objects.all().delete()
+        LoanDue.objects.create(loan=self.loan, due_number=1, due_date=date(2025, 1, 10), due_amount='1100.00',
+                               paid_amount='1100.00', payment_status='paid', payment_method='cash')
+        LoanSchedule.objects.filter(pk=self.schedules[0].pk).update(status='done')
+
+        call_command('rebuild_loan_summaries', stdout=io.StringIO())
+
+        summary = LoanSummary.objects.get(loan=self.loan)
+        self.assertEqual(summary.paid_installments, 1)
+        self.assertEqual(summary.paid_amount, Decimal('1100.00'))
+        self.assertEqual(summary.outstanding_principal, Decimal('9000.00'))
+        self.assertEqual(summary.next_due_date, date(2025, 1, 11))
+
+
+class PortfolioSummaryTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        paid, _, _ = (self.add_schedule(n, date(2025, 1, n)) for n in (1, 2, 3))
+        # Marked done without a payment: not repaid principal
+        LoanSchedule.objects.filter(loan=self.loan, installment_no=2).update(status='done')
+        self.virtual = Loan.objects.create(
+            customer=self.customer, loan_type=None, principal_amount='1000.00', total_due_count=4,
+            due_amount='275.00', interest_percentage='10.00', repayment_mode='weekly', created_by=self.admin.id,
+            created_at=timezone.now() - timedelta(days=20), schedule_mode='virtual')
+        self.client.force_authenticate(self.agent)
+        response = self.client.post('/api/auth/loan-schedules/collect-batch/', {'payments': [
+            {'schedule': paid.id}, {'loan': self.virtual.pk, 'installment_no': 2, 'paid_amount': '200.00'},
+        ]}, format='json')
+        self.assertEqual(response.data['collected'], 2)
+        # Closed with a pending row left behind: not overdue
+        self.closed = Loan.objects.create(
+            customer=self.customer, loan_type=self.loan_type, principal_amount='500.00', total_due_count=1,
+            due_amount='550.00', interest_percentage='10.00', repayment_mode='daily', created_by=self.admin.id,
+            created_at=timezone.now() - timedelta(days=20), schedule_mode='virtual', loan_status='closed')
+
+    def summary_rows(self):
+        return {
+            summary.loan_id: (summary.paid_installments, summary.paid_amount, summary.outstanding_principal,
+                              summary.next_due_date)
+            for summary in LoanSummary.objects.all()
+        }
+
+    def test_requires_a_master_admin(self):
+        self.assertEqual(self.client.get('/api/auth/loans/summary/').status_code, 403)
+
+    def test_aggregates_match_summaries_refreshed_from_scratch(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/auth/loans/summary/')
+        self.assertEqual(response.status_code, 200)
+
+        LoanSummary.objects.all().delete()
+        refresh_summaries(Loan.objects.all())
+        today = timezone.localdate()
+        totals, by_type = self.empty_bucket(), {}
+        for loan in Loan.objects.select_related('summary', 'loan_type'):
+            key = loan.loan_type.name if loan.loan_type else None
+            for bucket in (totals, by_type.setdefault(key, self.empty_bucket())):
+                summary = loan.summary
+                overdue = (loan.loan_status == 'active'
+                           and summary.next_due_date is not None and summary.next_due_date < today)
+                bucket['loans'] += 1
+                bucket['total_disbursed'] += loan.principal_amount
+                bucket['outstanding_principal'] += summary.outstanding_principal
+                bucket['collected_to_date'] += summary.paid_amount
+                bucket['overdue_loans'] += overdue
+                bucket['overdue_outstanding'] += summary.outstanding_principal if overdue else 0
+
+        self.assertEqual(self.parsed(response.data['totals']), totals)
+        self.assertEqual({bucket['key']: self.parsed(bucket) for bucket in response.data['by_loan_type']}, by_type)
+        self.assertEqual(totals['outstanding_principal'], Decimal('10250.00'))
+        self.assertLess(self.closed.summary.next_due_date, today)
+        self.assertEqual(totals['collected_to_date'], Decimal('1300.00'))
+        self.assertEqual(totals['overdue_loans'], 2)
+
+    @staticmethod
+    def empty_bucket():
+        return {'loans': 0, 'total_disbursed': Decimal('0'), 'outstanding_principal': Decimal('0'),
+                'collected_to_date': Decimal('0'), 'overdue_loans': 0, 'overdue_outstanding': Decimal('0')}
+
+    @staticmethod
+    def parsed(bucket):
+        return {name: value if name in ('loans', 'overdue_loans') else Decimal(value)
+                for name, value in bucket.items() if name != 'key'}
+
+    def test_migration_backfill_matches_a_refresh(self):
+        migration = importlib.import_module('myapp.migrations.0009_loansummary')
+        LoanSummary.objects.all().delete()
+        migration.backfill_summaries(django_apps, None)
+        backfilled = self.summary_rows()
+
+        LoanSummary.objects.all().delete()
+        refresh_summaries(Loan.objects.all())
+        self.assertEqual(backfilled, self.summary_rows())
+        self.assertEqual(backfilled[self.loan.pk][2], Decimal('9000.00'))
+        self.assertEqual(backfilled[self.virtual.pk][3], self.virtual.created_at.date())
+
+
+class AssignmentPlannerTests(LoanDataMixin, TestCase):
+
+    @staticmethod
+    def agent_of(plan):
+        return {schedule_id: agent_id for agent_id, ids in plan.items() for schedule_id in ids}
+
+    def test_balances_amount_and_count_between_agents(self):
+        # 8 customers, one installment each, two of them twice as large
+        installments = [(n, n, 200 if n <= 2 else 100) for n in range(1, 9)]
+        plan = plan_assignments(installments, [1, 2, 3])
+
+        amounts = {agent_id: sum(200 if n <= 2 else 100 for n in ids) for agent_id, ids in plan.items()}
+        counts = {agent_id: len(ids) for agent_id, ids in plan.items()}
+        self.assertEqual(sorted(self.agent_of(plan)), list(range(1, 9)))
+        self.assertLessEqual(max(amounts.values()) - min(amounts.values()), 100)
+        self.assertLessEqual(max(counts.values()) - min(counts.values()), 1)
+        # The two large installments go to different agents
+        self.assertNotEqual(self.agent_of(plan)[1], self.agent_of(plan)[2])
+
+    def test_a_customer_stays_with_one_agent(self):
+        installments = [(n, 'a' if n <= 3 else n, 100) for n in range(1, 8)]
+        agents = self.agent_of(plan_assignments(installments, [1, 2]))
+        self.assertEqual(len({agents[1], agents[2], agents[3]}), 1)
+
+    def test_previous_agent_is_kept_within_capacity(self):
+        installments = [(n, n, 100) for n in range(1, 5)]
+        previous = dict.fromkeys(range(1, 5), 1)
+
+        plan = plan_assignments(installments, [1, 2], previous)
+        # Each customer is half of an agent's share; agent 1 keeps customers
+        # until the next one would take it past 2 * (1 + tolerance)
+        self.assertEqual(len(plan[1]), 2)
+        self.assertEqual(len(plan[2]), 2)
+        self.assertEqual(plan_assignments(installments, [1, 2], previous, tolerance=1.0), {1: [1, 2, 3, 4]})
+        # A previous agent that is no longer active is ignored
+        self.assertEqual(sorted(self.agent_of(plan_assignments(installments, [2, 3], previous)).values()),
+                         [2, 2, 3, 3])
+        self.assertEqual(plan_assignments(installments, []), {})
+
+    def test_auto_assign_writes_the_plan(self):
+        other_customer = Customer.objects.create(customer_code='C002', full_name='Anu', phone='9000000002')
+        other_loan = Loan.objects.create(
+            customer=other_customer, loan_type=self.loan_type, principal_amount='1000.00', total_due_count=2,
+            due_amount='1100.00', interest_percentage='10.00', repayment_mode='daily', created_by=self.admin.id)
+        # The customer's recent installment was collected by other_agent
+        self.add_schedule(1, date(2025, 1, 1), assigned_to=self.other_agent)
+        mine = [self.add_schedule(n, date(2025, 1, n)) for n in (2, 3)]
+        theirs = [
+            LoanSchedule.objects.create(
+                loan=other_loan, installment_no=n, due_date=date(2025, 1, n + 1), principal_amount='1000.00',
+                interest_amount='100.00', total_due='1100.00', remaining_principal='0.00')
+            for n in (1, 2)
+        ]
+
+        summary = auto_assign(date(2025, 1, 2), date(2025, 1, 3))
+
+        assigned = dict(LoanSchedule.objects.filter(
+            pk__in=[row.pk for row in mine + theirs]).values_list('pk', 'assigned_to_id'))
+        self.assertEqual({assigned[row.pk] for row in mine}, {self.other_agent.id})
+        self.assertEqual({assigned[row.pk] for row in theirs}, {self.agent.id})
+        self.assertEqual(summary, {
+            self.other_agent.id: {'installments': 2, 'amount': Decimal('2200.00')},
+            self.agent.id: {'installments': 2, 'amount': Decimal('2200.00')},
+        })
+
+
+class AmortizationKernelTests(SimpleTestCase):
+
+    def by_loan(self, column, columns):
+        return [column[columns.loan_index == index].tolist() for index in range(columns.loan_index.max() + 1)]
+
+    def test_flat_totals_are_exact_with_the_residue_on_the_last_row(self):
+        principals, rates, counts = ['1000.00', '10000.00', '999.99'], ['10', '12.5', '7'], [3, 7, 10]
+        columns = amortize(principals, rates, counts, [date(2025, 1, 1)] * 3, ['daily'] * 3, method=FLAT)
+
+        for index, (principal, rate, count) in enumerate(zip(principals, rates, counts)):
+            rows = columns.loan_index == index
+            paise = int(Decimal(principal) * 100)
+            interest = round(paise * Decimal(rate) / 100)
+            self.assertEqual(int(columns.principal_amount[rows].sum()), paise)
+            self.assertEqual(int(columns.interest_amount[rows].sum()), interest)
+            self.assertEqual(int(columns.total_due[rows].sum()), paise + interest)
+            self.assertEqual(columns.remaining_principal[rows][-1], 0)
+        # 1000.00 in three: 333.33 twice, the extra paisa on the last row
+        self.assertEqual(self.by_loan(columns.principal_amount, columns)[0], [33333, 33333, 33334])
+        self.assertEqual(self.by_loan(columns.interest_amount, columns)[0], [3333, 3333, 3334])
+
+    def test_reducing_totals_are_exact_with_the_residue_on_the_last_row(self):
+        columns = amortize(['10000.00', '2500.50'], ['12', '18'], [12, 5], [date(2025, 1, 1)] * 2,
+                           ['monthly'] * 2, method=REDUCING)
+
+        for index, principal in enumerate([1000000, 250050]):
+            rows = columns.loan_index == index
+            principal_col, interest_col = columns.principal_amount[rows], columns.interest_amount[rows]
+            self.assertEqual(int(principal_col.sum()), principal)
+            self.assertEqual(int(columns.total_due[rows].sum()), principal + int(interest_col.sum()))
+            self.assertEqual(columns.remaining_principal[rows][-1], 0)
+            # Every row but the last pays the same rounded EMI; the last absorbs the residue
+            emi = columns.total_due[rows][:-1]
+            self.assertEqual(len(set(emi.tolist())), 1)
+            self.assertLessEqual(abs(int(columns.total_due[rows][-1]) - int(emi[0])), len(emi))
+        # 10000 at 1% a month for 12 months: EMI 888.49
+        self.assertEqual(int(columns.total_due[0]), 88849)
+
+    def test_zero_rate(self):
+        for method in (FLAT, REDUCING):
+            columns = amortize(['100.00'], ['0'], [3], [date(2025, 1, 1)], ['weekly'], method=method)
+            self.assertEqual(columns.interest_amount.tolist(), [0, 0, 0], method)
+            self.assertEqual(columns.principal_amount.tolist(), [3333, 3333, 3334], method)
+            self.assertEqual(columns.remaining_principal.tolist(), [6667, 3334, 0], method)
+
+    def test_due_dates_match_stepping_with_relativedelta(self):
+        starts = [date(2025, 1, 31), date(2024, 1, 31), date(2025, 1, 15), date(2025, 8, 31)]
+        columns = amortize(['1200'] * 4, ['10'] * 4, [6] * 4, starts, ['monthly'] * 4)
+
+        for index, start in enumerate(starts):
+            expected, current = [], start
+            for _ in range(6):
+                expected.append(current)
+                current += relativedelta(months=1)
+            self.assertEqual(columns.due_date[columns.loan_index == index].astype(object).tolist(), expected)
+        # Jan 31 clips to Feb 28 (Feb 29 in a leap year) and stays clipped
+        self.assertEqual(columns.due_date[1], np.datetime64('2025-02-28'))
+        self.assertEqual(columns.due_date[7], np.datetime64('2024-02-29'))
+
+        columns = amortize(['100'] * 2, ['10'] * 2, [3] * 2, [date(2025, 2, 27)] * 2, ['daily', 'weekly'])
+        self.assertEqual(columns.due_date.astype(str).tolist(),
+                         ['2025-02-27', '2025-02-28', '2025-03-01', '2025-02-27', '2025-03-06', '2025-03-13'])
+
+
+class LoanQuoteTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def quote(self, **overrides):
+        terms = {'principal_amount': '1000.00', 'interest_percentage': '10.00', 'total_due_count': 3,
+                 'repayment_mode': 'daily', 'start_date': '2025-01-01', **overrides}
+        return self.client.post('/api/auth/loans/quote/', terms, format='json')
+
+    def test_flat_quote(self):
+        response = self.quote()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'method': 'flat',
+            'total_principal': '1000.00',
+            'total_interest': '100.00',
+            'total_payable': '1100.00',
+            'schedule': [
+                {'installment_no': 1, 'due_date': '2025-01-01', 'principal_amount': '333.33',
+                 'interest_amount': '33.33', 'total_due': '366.66', 'remaining_principal': '666.67'},
+                {'installment_no': 2, 'due_date': '2025-01-02', 'principal_amount': '333.33',
+                 'interest_amount': '33.33', 'total_due': '366.66', 'remaining_principal': '333.34'},
+                {'installment_no': 3, 'due_date': '2025-01-03', 'principal_amount': '333.34',
+                 'interest_amount': '33.34', 'total_due': '366.68', 'remaining_principal': '0.00'},
+            ],
+        })
+        self.assertEqual(Loan.objects.count(), 1)
+        self.assertFalse(LoanSchedule.objects.exists())
+
+    def test_reducing_quote_totals_match_the_schedule(self):
+        response = self.quote(method='reducing', interest_percentage='12.00', total_due_count=12,
+                              repayment_mode='monthly')
+
+        self.assertEqual(response.status_code, 200)
+        schedule = response.data['schedule']
+        self.assertEqual(len(schedule), 12)
+        self.assertEqual(schedule[-1]['remaining_principal'], '0.00')
+        for total, column in (('total_principal', 'principal_amount'), ('total_interest', 'interest_amount'),
+                              ('total_payable', 'total_due')):
+            self.assertEqual(Decimal(response.data[total]), sum(Decimal(row[column]) for row in schedule))
+        self.assertEqual(response.data['total_principal'], '1000.00')
+
+    def test_invalid_terms_are_rejected(self):
+        for overrides, field in (({'method': 'balloon'}, 'method'), ({'principal_amount': '0.00'}, 'principal_amount'),
+                                 ({'principal_amount': '-100.00'}, 'principal_amount')):
+            with self.subTest(**overrides):
+                response = self.quote(**overrides)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.data), [field])
+
+
+class VirtualScheduleTests(LoanDataMixin, TestCase):
+    SCHEDULE_FIELDS = ('installment_no', 'due_date', 'principal_amount', 'interest_amount', 'total_due',
+                       'remaining_principal')
+
+    def setUp(self):
+        super().setUp()
+        self.virtual = Loan.objects.create(
+            customer=self.customer, loan_type=self.loan_type, principal_amount='10000.00',
+            total_due_count=10, due_amount='1100.00', interest_percentage='10.00',
+            repayment_mode='daily', created_by=self.admin.id, created_at=self.loan.created_at,
+            schedule_mode='virtual')
+        self.client.force_authenticate(self.admin)
+
+    def rows(self, schedules):
+        return [tuple(getattr(schedule, field) for field in self.SCHEDULE_FIELDS) for schedule in schedules]
+
+    def test_merged_schedule_matches_stored_schedule(self):
+        create_flat_schedule(self.loan)
+        stored = LoanSchedule.objects.filter(loan=self.loan).order_by('installment_no')
+        self.assertEqual(self.rows(merged_schedule(self.virtual)), self.rows(stored))
+
+        materialize_installment(self.virtual, 3)
+        merged = merged_schedule(self.virtual)
+        self.assertEqual(self.rows(merged), self.rows(stored))
+        self.assertEqual([schedule.pk is not None for schedule in merged], [n == 3 for n in range(1, 11)])
+
+    def test_materialization_is_idempotent(self):
+        first = materialize_installments([(self.virtual.pk, 3), (self.virtual.pk, 4), (self.virtual.pk, 11)])
+        self.assertEqual(set(first), {(self.virtual.pk, 3), (self.virtual.pk, 4)})
+        self.assertEqual(materialize_installments([(self.virtual.pk, 3), (self.virtual.pk, 4)]), first)
+        schedule, created = materialize_installment(self.virtual, 3)
+        self.assertEqual((schedule.pk, created), (first[(self.virtual.pk, 3)], False))
+
+        self.assertEqual(materialize_due(Loan.objects.all()), 8)
+        self.assertEqual(materialize_due(Loan.objects.all()), 0)
+        self.assertEqual(LoanSchedule.objects.filter(loan=self.virtual).count(), 10)
+        self.assertEqual(LoanDue.objects.filter(loan=self.virtual).count(), 10)
+
+    def test_collect_assign_and_update_by_installment_number(self):
+        response = self.client.post('/api/auth/loan-schedules/collect-batch/', {'payments': [
+            {'loan': self.virtual.pk, 'installment_no': 2},
+            {'loan': self.virtual.pk, 'installment_no': 11},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], ['ok', 'error'])
+        self.assertEqual(LoanDue.objects.get(loan=self.virtual, due_number=2).payment_status, 'paid')
+
+        base = f'/api/auth/loan-schedules/{self.virtual.pk}/installments'
+        response = self.client.post(f'{base}/4/assign/', {'assigned_to': self.agent.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(f'{base}/5/', {'status': 'done'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.patch(f'{base}/11/', {'status': 'done'}, format='json').status_code, 404)
+
+        stored = dict(LoanSchedule.objects.filter(loan=self.virtual).values_list('installment_no', 'assigned_to_id'))
+        self.assertEqual(stored, {2: None, 4: self.agent.id, 5: None})
+
+    def test_set_based_jobs_include_virtual_loans(self):
+        response = self.client.get('/api/auth/exports/loan_schedule/', {'file_format': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1 + 10)
+        self.assertTrue(all(line.startswith(f',{self.virtual.pk},') for line in lines[1:]))
+
+        date_from = self.virtual.created_at.date()
+        date_to = date_from + timedelta(days=3)
+        due = sum(date_from <= row.due_date <= date_to for row in merged_schedule(self.virtual))
+        plan = auto_assign(date_from, date_to, dry_run=True)
+        self.assertEqual(sum(agent['installments'] for agent in plan.values()), due)
+        self.assertFalse(LoanSchedule.objects.filter(loan=self.virtual).exists())
+
+        response = self.client.post('/api/auth/loan-schedules/bulk-assign/',
+                                    {'assigned_to': self.agent.id, 'loan_ids': [self.virtual.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(LoanSchedule.objects.filter(loan=self.virtual, assigned_to=self.agent).count(), 10)
+
+
+class LoanArchiveTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n in range(1, 4):
+            self.add_schedule(n, date(2025, 1, n), assigned_to=self.agent)
+        self.client.force_authenticate(self.admin)
+
+    def close_loan(self, days_ago):
+        self.loan.loan_status = 'closed'
+        self.loan.save()
+        Loan.objects.filter(pk=self.loan.pk).update(closed_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_bulk_imported_closed_loans_get_closed_at(self):
+        rows = [
+            {'customer_id': self.customer.pk, 'principal_amount': '1000', 'total_due_count': 2, 'due_amount': '550',
+             'interest_percentage': '10', 'repayment_mode': 'daily', 'loan_status': status}
+            for status in ('closed', 'active')
+        ]
+        stream = io.BytesIO('\n'.join(json.dumps(row) for row in rows).encode())
+        self.assertEqual(import_loans(stream, 'jsonl', created_by=self.admin.id)['imported'], 2)
+        closed, active = Loan.objects.exclude(pk=self.loan.pk).order_by('pk')
+        self.assertIsNotNone(closed.closed_at)
+        self.assertIsNone(active.closed_at)
+
+    def test_recently_closed_loans_stay_in_hot_tables(self):
+        self.close_loan(days_ago=10)
+        self.assertEqual(archive_closed_loans(30)['loans'], 0)
+        self.assertEqual(LoanSchedule.objects.count(), 3)
+
+    def test_archived_schedule_is_served_to_explicit_requests(self):
+        before = self.client.get(f'/api/auth/loan-schedules/{self.loan.pk}/').data
+        self.close_loan(days_ago=60)
+        token = encode_token(timezone.now())
+
+        totals = archive_closed_loans(30, chunk_size=1)
+
+        self.assertEqual(totals, {'loans': 1, 'schedules': 3, 'dues': 0})
+        self.assertFalse(LoanSchedule.objects.exists())
+        self.assertEqual(ArchivedLoanSchedule.objects.count(), 3)
+        # One loan-level tombstone for the agent, none per row
+        self.assertEqual(list(SyncTombstone.objects.values_list('table', 'object_id', 'assigned_to_id')),
+                         [('loans', self.loan.pk, self.agent.id)])
+        self.client.force_authenticate(self.agent)
+        deleted = self.client.get('/api/auth/sync/', {'token': token}).data['deleted']
+        self.assertEqual(deleted, {'loan_schedules': [], 'loan_dues': [], 'loans': [self.loan.pk]})
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(f'/api/auth/loan-schedules/{self.loan.pk}/').data, before)
+        details = self.client.get(f'/api/auth/loans/{self.loan.pk}/details/').data
+        self.assertEqual(details['schedules'], before)
+        self.assertEqual(self.client.get('/api/auth/loan-schedules/').data['results'], [])
+        self.assertEqual(archive_closed_loans(30)['loans'], 0)
+
+    def test_command_archives_closed_loans(self):
+        LoanSchedule.objects.filter(installment_no=3).update(assigned_to=self.other_agent)
+        LoanDue.objects.create(loan=self.loan, due_number=1, due_date=date(2025, 1, 1), due_amount='1100.00',
+                               paid_amount='1100.00', payment_method='cash', collected_by=self.agent.id,
+                               payment_status='paid', paid_at=timezone.now())
+        recent = Loan.objects.create(
+            customer=self.customer, loan_type=self.loan_type, principal_amount='1000.00', total_due_count=1,
+            due_amount='1100.00', interest_percentage='10.00', repayment_mode='daily', created_by=self.admin.id,
+            loan_status='closed')
+        LoanSchedule.objects.create(
+            loan=recent, installment_no=1, due_date=date(2025, 1, 1), principal_amount='1000.00',
+            interest_amount='100.00', total_due='1100.00', remaining_principal='0.00', assigned_to=self.agent)
+        self.close_loan(days_ago=60)
+        schedules = list(LoanSchedule.objects.filter(loan=self.loan).order_by('pk').values())
+        dues = list(LoanDue.objects.filter(loan=self.loan).order_by('pk').values())
+
+        out = io.StringIO()
+        call_command('archive_closed_loans', '--days', '30', '--dry-run', stdout=out)
+        self.assertIn("Would archive 1 loans (3 schedules, 1 dues)", out.getvalue())
+        self.assertEqual(LoanSchedule.objects.count(), 4)
+        self.assertFalse(ArchivedLoanSchedule.objects.exists())
+
+        out = io.StringIO()
+        call_command('archive_closed_loans', '--days', '30', '--chunk-size', '1', stdout=out)
+
+        self.assertIn("Archived 1 loans (3 schedules, 1 dues)", out.getvalue())
+        self.assertEqual(list(ArchivedLoanSchedule.objects.order_by('pk').values()), schedules)
+        self.assertEqual(list(ArchivedLoanDue.objects.order_by('pk').values()), dues)
+        self.assertEqual(list(LoanSchedule.objects.values_list('loan_id', flat=True)), [recent.pk])
+        self.assertFalse(LoanDue.objects.exists())
+        self.assertEqual(
+            set(SyncTombstone.objects.values_list('table', 'object_id', 'loan_id', 'assigned_to_id')),
+            {('loans', self.loan.pk, self.loan.pk, self.agent.id),
+             ('loans', self.loan.pk, self.loan.pk, self.other_agent.id)})
+        self.loan.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertIsNotNone(self.loan.archived_at)
+        self.assertIsNone(recent.archived_at)
+
+
+class OverdueDetectionTests(LoanDataMixin, TestCase):
+
+    def test_flags_installments_and_defaults_loans(self):
+        as_of = date(2025, 6, 1)
+        late = self.add_schedule(1, date(2025, 5, 20))
+        self.add_schedule(2, date(2025, 5, 27))
+        paid = self.add_schedule(3, date(2025, 5, 10), status='done')
+        upcoming = self.add_schedule(4, date(2025, 6, 3))
+
+        result = detect_overdue(as_of, default_after=30)
+
+        self.assertEqual((result['flagged'], result['loans_updated'], result['defaulted']), (2, 1, 0))
+        self.assertEqual(set(LoanSchedule.objects.filter(is_overdue=True).values_list('installment_no', flat=True)), {1, 2})
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.overdue_since, late.due_date)
+        self.assertEqual(result['buckets']['1-30'], 1)
+        self.assertFalse(LoanSchedule.objects.get(pk=paid.pk).is_overdue)
+        self.assertFalse(LoanSchedule.objects.get(pk=upcoming.pk).is_overdue)
+
+        # A second run with nothing new writes nothing.
+        again = detect_overdue(as_of, default_after=30)
+        self.assertEqual((again['flagged'], again['cleared'], again['loans_updated']), (0, 0, 0))
+
+        result = detect_overdue(date(2025, 6, 25), default_after=30)
+        self.assertEqual(result['defaulted'], 1)
+        self.loan.refresh_from_db()
+        self.assertEqual(self.loan.loan_status, 'defaulted')
+        self.assertIsNotNone(self.loan.closed_at)
+
+    def test_virtual_loans_without_stored_rows_use_summary_next_due_date(self):
+        virtual = Loan.objects.create(
+            customer=self.customer, loan_type=self.loan_type, principal_amount='10000.00',
+            total_due_count=10, due_amount='1100.00', interest_percentage='10.00', repayment_mode='daily',
+            created_by=self.admin.id, created_at=timezone.now() - timedelta(days=20), schedule_mode='virtual')
+        first_due = virtual.summary.next_due_date
+
+        detect_overdue(first_due, default_after=90)
+        virtual.refresh_from_db()
+        self.assertIsNone(virtual.overdue_since)
+
+        result = detect_overdue(first_due + timedelta(days=5), default_after=90)
+        self.assertEqual(result['loans_updated'], 1)
+        virtual.refresh_from_db()
+        self.assertEqual(virtual.overdue_since, first_due)
+        self.assertFalse(LoanSchedule.objects.filter(loan=virtual).exists())
+
+
+@override_settings(NOTIFICATION_OUTBOX_ASYNC=False,
+                   NOTIFICATION_SENDERS=['myapp.notifications.LocMemSender'])
+class NotificationOutboxTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        LocMemSender.outbox = []
+        self.client.force_authenticate(self.admin)
+
+    def test_bulk_assign_notifies_on_commit_coalesced_per_user(self):
+        self.add_schedule(1, date(2025, 1, 1))
+        self.add_schedule(2, date(2025, 1, 2))
+        other = Loan.objects.create(
+            customer=self.customer, loan_type=self.loan_type, principal_amount='1000.00',
+            total_due_count=1, due_amount='1100.00', interest_percentage='10.00',
+            repayment_mode='daily', created_by=self.admin.id)
+        LoanSchedule.objects.create(
+            loan=other, installment_no=1, due_date=date(2025, 1, 1), principal_amount='1000.00',
+            interest_amount='100.00', total_due='1100.00', remaining_principal='0.00')
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post('/api/auth/loan-schedules/bulk-assign/',
+                                        {'assigned_to': self.agent.id, 'loan_ids': [self.loan.pk, other.pk]},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['notifications'], 2)
+        self.assertFalse(Notification.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            set(Notification.objects.filter(user_id=self.agent.id).values_list('message', flat=True)),
+            {f"You have been assigned 2 installment(s) of Loan ID #{self.loan.pk}.",
+             f"You have been assigned 1 installment(s) of Loan ID #{other.pk}."},
+        )
+        # Both rows go out to the sender in one delivery.
+        self.assertEqual(LocMemSender.outbox, [(self.agent.id, ['New Loan Assigned', 'New Loan Assigned'])])
+
+    def test_single_assign_notifies_the_new_agent(self):
+        schedule = self.add_schedule(1, date(2025, 1, 1))
+        url = f'/api/auth/loan-schedules/{schedule.id}/assign/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url, {'assigned_to': self.agent.id}, format='json').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            # Same agent again: nothing new to tell
+            self.assertEqual(self.client.post(url, {'assigned_to': self.agent.id}, format='json').status_code, 200)
+
+        self.assertEqual(list(Notification.objects.values_list('user_id', 'message')), [
+            (self.agent.id, f"You have been assigned Loan ID #{self.loan.pk}, Installment #1."),
+        ])
+
+    def test_auto_assign_reports_and_notifies_only_the_rows_it_assigned(self):
+        first, second, third = (self.add_schedule(n, date(2025, 1, n)) for n in (1, 2, 3))
+        real_plan = assignment_planner.plan_assignments
+
+        def plan_then_race(*args, **kwargs):
+            # Another request assigns one row between the read and the UPDATE
+            LoanSchedule.objects.filter(pk=second.pk).update(assigned_to=self.other_agent)
+            return real_plan(*args, **kwargs)
+
+        with mock.patch.object(assignment_planner, 'plan_assignments', side_effect=plan_then_race):
+            with self.captureOnCommitCallbacks(execute=True):
+                summary = auto_assign(date(2025, 1, 1), date(2025, 1, 3))
+
+        [(agent_id, totals)] = summary.items()
+        self.assertEqual(totals, {'installments': 2, 'amount': Decimal('2200.00')})
+        self.assertEqual(
+            dict(LoanSchedule.objects.values_list('pk', 'assigned_to_id')),
+            {first.pk: agent_id, second.pk: self.other_agent.id, third.pk: agent_id},
+        )
+        self.assertEqual(list(Notification.objects.values_list('user_id', 'message')), [
+            (agent_id, f"You have been assigned 2 installment(s) of Loan ID #{self.loan.pk}."),
+        ])
+
+
+class NotificationRetryTests(TestCase):
+
+    def setUp(self):
+        self.outbox = NotificationOutbox()
+        self.events = [NotificationEvent(1, 'Title', 'Message', timezone.now())]
+        # The test database connection must stay open
+        patcher = mock.patch('myapp.notifications.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, batch):
+        for event in batch:
+            self.outbox.queue.put(event)
+        self.outbox.flush()
+
+    def test_senders_must_implement_send(self):
+        class Silent(BaseSender):
+            pass
+
+        with self.assertRaises(TypeError):
+            Silent()
+
+    def test_failed_batch_is_written_on_retry(self):
+        bulk_create = Notification.objects.bulk_create
+        failures = [DatabaseError('database is locked')]
+
+        def flaky(rows):
+            if failures:
+                raise failures.pop()
+            return bulk_create(rows)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=flaky):
+            self.write(self.events)
+        self.assertEqual(list(Notification.objects.values_list('user_id', 'title')), [(1, 'Title')])
+
+    @override_settings(NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2)
+    def test_batch_is_dropped_after_max_attempts(self):
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=DatabaseError('locked')) as patched:
+            with self.assertLogs('myapp.notifications', 'ERROR'):
+                self.write(self.events)
+        self.assertEqual(patched.call_count, 2)
+        self.assertTrue(self.outbox.queue.empty())
+
+
+class TokenCacheTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.agent)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+        cache.clear()
+
+    def assert_authenticates(self, authenticated=True):
+        status = self.client.get('/api/auth/notifications/').status_code
+        self.assertEqual(status, 200 if authenticated else 401)
+
+    def test_token_stops_working_after_logout(self):
+        self.assert_authenticates()
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assert_authenticates(False)
+
+    def test_token_stops_working_after_password_change(self):
+        self.assert_authenticates()
+        response = self.client.post('/api/auth/change-password/',
+                                    {'old_password': 'pass', 'new_password': 'new-pass-123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_authenticates(False)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        self.assert_authenticates()
+
+    def test_token_stops_working_after_deactivation(self):
+        self.assert_authenticates()
+        self.agent.is_active = False
+        self.agent.save()
+        self.assert_authenticates(False)
+
+    def test_only_saves_of_token_fields_invalidate(self):
+        with mock.patch.object(token_cache, 'invalidate_user') as invalidate_user:
+            update_last_login(None, self.agent)
+            self.agent.save(update_fields=['email'])
+            invalidate_user.assert_not_called()
+            self.agent.save(update_fields=['role'])
+            self.agent.save()
+        self.assertEqual(invalidate_user.call_args_list, [mock.call(self.agent.pk)] * 2)
+
+    def test_invalidation_reaches_other_workers_through_shared_cache(self):
+        # Two caches stand in for two worker processes sharing one cache backend.
+        worker_a = TokenCache(shared_alias='default')
+        worker_b = TokenCache(shared_alias='default')
+        for worker in (worker_a, worker_b):
+            worker.set(self.token.key, (self.agent, self.token))
+        self.assertIsNotNone(worker_b.get(self.token.key))
+
+        worker_a.invalidate_user(self.agent.pk)
+
+        self.assertIsNone(worker_b.get(self.token.key))
+
+    def test_local_entries_expire_quickly_without_shared_cache(self):
+        worker = TokenCache(ttl=300, local_ttl=5)
+        with mock.patch('myapp.authentication.time.monotonic', return_value=1000.0):
+            worker.set(self.token.key, (self.agent, self.token))
+        with mock.patch('myapp.authentication.time.monotonic', return_value=1004.0):
+            self.assertIsNotNone(worker.get(self.token.key))
+        with mock.patch('myapp.authentication.time.monotonic', return_value=1006.0):
+            self.assertIsNone(worker.get(self.token.key))
+
+
+class ReferenceCacheTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_saves_and_deletes_invalidate_cached_values(self):
+        self.assertEqual(set(reference_cache.loan_types_by_id()), {self.loan_type.pk})
+        weekly = LoanType.objects.create(name='Weekly')
+        self.assertEqual(set(reference_cache.loan_types_by_id()), {self.loan_type.pk, weekly.pk})
+        weekly.delete()
+        self.assertEqual(set(reference_cache.loan_types_by_id()), {self.loan_type.pk})
+
+        self.assertIn(self.agent.pk, reference_cache.collection_agents_by_id())
+        self.assertEqual(reference_cache.get_user(self.agent.pk).role, 'collection_agent')
+        self.agent.role = 'master_admin'
+        self.agent.save()
+        self.assertNotIn(self.agent.pk, reference_cache.collection_agents_by_id())
+        self.assertEqual(reference_cache.get_user(self.agent.pk).role, 'master_admin')
+
+    def test_a_login_keeps_the_cached_users(self):
+        reference_cache.collection_agents()
+        reference_cache.get_user(self.agent.pk)
+        self.client.force_login(self.agent)
+        self.agent.refresh_from_db()
+        self.assertIsNotNone(self.agent.last_login)
+
+        with self.assertNumQueries(0):
+            self.assertIn(self.agent.pk, reference_cache.collection_agents_by_id())
+            self.assertEqual(reference_cache.get_user(self.agent.pk), self.agent)
+
+    def rename_elsewhere(self):
+        """A change whose invalidation does not reach this process, as from another worker."""
+        self.assertEqual(reference_cache.loan_types_by_id()[self.loan_type.pk].name, 'Daily')
+        LoanType.objects.filter(pk=self.loan_type.pk).update(name='Weekly')
+
+    def name_after(self, seconds):
+        with mock.patch('time.time', return_value=time.time() + seconds):
+            return reference_cache.loan_types_by_id()[self.loan_type.pk].name
+
+    @override_settings(REFERENCE_CACHE_ALIAS=None, REFERENCE_CACHE_LOCAL_TTL=5)
+    def test_process_local_values_expire_quickly(self):
+        self.rename_elsewhere()
+        self.assertEqual(self.name_after(1), 'Daily')
+        self.assertEqual(self.name_after(6), 'Weekly')
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker'},
+            'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+        },
+        REFERENCE_CACHE_ALIAS='shared', REFERENCE_CACHE_TTL=300,
+    )
+    def test_shared_values_live_for_the_ttl_and_are_invalidated_there(self):
+        self.rename_elsewhere()
+        self.assertEqual(self.name_after(6), 'Daily')
+        self.assertEqual(self.name_after(301), 'Weekly')
+        self.assertIsNotNone(caches['shared'].get(f'ref:{reference_cache.LOAN_TYPES}:version'))
+        self.assertIsNone(caches['default'].get(f'ref:{reference_cache.LOAN_TYPES}:version'))
+
+        self.loan_type.name = 'Monthly'
+        self.loan_type.save()
+        self.assertEqual(reference_cache.loan_types_by_id()[self.loan_type.pk].name, 'Monthly')
+        caches['shared'].clear()
+
+
+class IdempotencyKeyTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def notify(self, key, message='m'):
+        return self.client.post('/api/auth/notifications/', {'user_id': self.agent.id, 'title': 't', 'message': message},
+                                format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_stored_response(self):
+        first = self.notify('k1')
+        retry = self.notify('k1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.notify('k1')
+        self.assertEqual(self.notify('k1', message='other').status_code, 422)
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_in_progress_key_conflicts_until_lock_timeout(self):
+        self.notify('k1')
+        # The first request is still running ...
+        IdempotencyKey.objects.update(status_code=None)
+        self.assertEqual(self.notify('k1').status_code, 409)
+
+        # ... or its worker died: a retry after the lock timeout runs the view.
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        retry = self.notify('k1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertFalse(retry.has_header('Idempotent-Replayed'))
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_anonymous_callers_do_not_share_keys(self):
+        self.client.credentials()
+        admin = self.client.post('/api/auth/login/', {'email': 'admin@example.com', 'password': 'pass'},
+                                 format='json', HTTP_IDEMPOTENCY_KEY='same')
+        agent = self.client.post('/api/auth/login/', {'email': 'agent@example.com', 'password': 'pass'},
+                                 format='json', HTTP_IDEMPOTENCY_KEY='same')
+
+        self.assertEqual((admin.status_code, agent.status_code), (200, 200))
+        self.assertEqual(agent.data['user']['email'], 'agent@example.com')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_keyed_upload_larger_than_memory_limit(self):
+        row = {'customer_id': self.customer.pk, 'loan_type_id': self.loan_type.pk, 'principal_amount': '1000',
+               'total_due_count': 2, 'due_amount': '550', 'interest_percentage': '10',
+               'repayment_mode': 'monthly', 'notes': 'x' * 4096}
+        content = (json.dumps(row) + '\n').encode()
+
+        responses = [
+            self.client.post('/api/auth/loans/import/',
+                             {'file': SimpleUploadedFile('loans.jsonl', content)},
+                             format='multipart', HTTP_IDEMPOTENCY_KEY='upload')
+            for _ in range(2)
+        ]
+
+        self.assertEqual([r.status_code for r in responses], [200, 200])
+        self.assertEqual(responses[0].data['imported'], 1)
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+        self.assertEqual(Loan.objects.count(), 2)
+
+
+class KeysetPaginationTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n in range(1, 6):
+            self.add_schedule(n, date(2025, 1, n))
+        self.client.force_authenticate(self.admin)
+
+    @staticmethod
+    def cursor(values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def test_pages_follow_the_ordering_until_next_is_null(self):
+        first = self.client.get('/api/auth/loan-schedules/', {'page_size': 2})
+        self.assertEqual([row['installment_no'] for row in first.data['results']], [1, 2])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['installment_no'] for row in second.data['results']], [3, 4])
+
+        last = self.client.get(second.data['next'])
+        self.assertEqual([row['installment_no'] for row in last.data['results']], [5])
+        self.assertIsNone(last.data['next'])
+
+    def test_tampered_cursor_is_not_found(self):
+        for url, values in [
+            ('/api/auth/loan-schedules/', ['x', 'y']),
+            ('/api/auth/customers/', [1, 2]),
+            ('/api/auth/customers/', [None, None]),
+            ('/api/auth/loan-schedules/', ['2025-01-01']),
+        ]:
+            response = self.client.get(url, {'cursor': self.cursor(values)})
+            self.assertEqual(response.status_code, 404, (url, values))
+        self.assertEqual(self.client.get('/api/auth/customers/', {'cursor': 'not-base64!'}).status_code, 404)
+
+
+class DeltaSyncTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.token = encode_token(timezone.now())
+
+    def sync(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/auth/sync/', {'token': self.token})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_tombstones_reach_only_the_devices_holding_the_rows(self):
+        mine = self.add_schedule(1, date(2025, 1, 1), assigned_to=self.agent)
+        theirs = self.add_schedule(2, date(2025, 1, 2), assigned_to=self.other_agent)
+        due = LoanDue.objects.create(loan=self.loan, due_number=1, due_date=date(2025, 1, 1), due_amount='1100.00')
+        mine_id, theirs_id, due_id = mine.id, theirs.id, due.due_id
+        mine.delete()
+        theirs.delete()
+        due.delete()
+
+        self.assertEqual(self.sync(self.agent)['deleted'],
+                         {'loan_schedules': [mine_id], 'loan_dues': [due_id], 'loans': []})
+        self.assertEqual(self.sync(self.other_agent)['deleted'],
+                         {'loan_schedules': [theirs_id], 'loan_dues': [due_id], 'loans': []})
+        self.assertEqual(self.sync(self.admin)['deleted'], {'loan_schedules': [], 'loan_dues': [], 'loans': []})
+
+    def test_reassignment_tombstones_the_row_for_the_previous_agent(self):
+        moved = self.add_schedule(1, date(2025, 1, 1), assigned_to=self.agent)
+        bulk_moved = self.add_schedule(2, date(2025, 1, 2), assigned_to=self.agent)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(f'/api/auth/loan-schedules/{moved.id}/assign/',
+                                    {'assigned_to': self.other_agent.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/auth/loan-schedules/bulk-assign/',
+                                    {'assigned_to': self.other_agent.id, 'schedule_ids': [bulk_moved.id]},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+
+        old = self.sync(self.agent)
+        self.assertEqual(sorted(old['deleted']['loan_schedules']), [moved.id, bulk_moved.id])
+        self.assertEqual(old['loan_schedules'], [])
+        new = self.sync(self.other_agent)
+        self.assertEqual(new['deleted']['loan_schedules'], [])
+        self.assertEqual(sorted(row['id'] for row in new['loan_schedules']), [moved.id, bulk_moved.id])
+
+    def test_newly_assigned_schedules_bring_their_dues_and_customer(self):
+        old = timezone.now() - timedelta(days=1)
+        single = self.add_schedule(1, date(2025, 1, 1))
+        bulk = self.add_schedule(2, date(2025, 1, 2))
+        for n in (1, 2):
+            LoanDue.objects.create(loan=self.loan, due_number=n, due_date=date(2025, 1, n), due_amount='1100.00')
+        LoanSchedule.objects.update(updated_at=old)
+        LoanDue.objects.update(updated_at=old)
+        Customer.objects.update(updated_at=old)
+        self.assertEqual(self.sync(self.agent)['loan_dues'], [])
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(f'/api/auth/loan-schedules/{single.id}/assign/',
+                                    {'assigned_to': self.agent.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        delta = self.sync(self.agent)
+        self.assertEqual([row['id'] for row in delta['loan_schedules']], [single.id])
+        self.assertEqual([row['due_number'] for row in delta['loan_dues']], [1, 2])
+        self.assertEqual([row['customer_id'] for row in delta['customers']], [self.customer.pk])
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/auth/loan-schedules/bulk-assign/',
+                                    {'assigned_to': self.other_agent.id, 'schedule_ids': [bulk.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        delta = self.sync(self.other_agent)
+        self.assertEqual([row['id'] for row in delta['loan_schedules']], [bulk.id])
+        self.assertEqual([row['due_number'] for row in delta['loan_dues']], [1, 2])
+        self.assertEqual([row['customer_id'] for row in delta['customers']], [self.customer.pk])
+
+    def test_notifications_marked_read_are_synced(self):
+        old = timezone.now() - timedelta(days=1)
+        notification = Notification.objects.create(user_id=self.agent.id, title='t', message='m', created_at=old)
+        Notification.objects.filter(pk=notification.pk).update(updated_at=old)
+        self.assertEqual(self.sync(self.agent)['notifications'], [])
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.patch(f'/api/auth/notifications/{notification.pk}/', {'is_read': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        rows = self.sync(self.agent)['notifications']
+        self.assertEqual([(row['notification_id'], row['is_read']) for row in rows], [(notification.pk, True)])
+
+
+class LeanListTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Loan.objects.create(
+            customer=self.customer, loan_type=None, principal_amount='999.99', total_due_count=3,
+            due_amount='366.66', interest_percentage='10.00', repayment_mode='weekly', created_by=self.admin.id)
+        self.add_schedule(1, date(2025, 1, 1), assigned_to=self.agent)
+        self.add_schedule(2, date(2025, 1, 2))
+        LoanDue.objects.create(loan=self.loan, due_number=1, due_date=date(2025, 1, 1), due_amount='1100.00',
+                               paid_amount='1100.5', payment_method='upi', collected_by=self.agent.id,
+                               payment_status='paid', paid_at=timezone.now())
+        LoanDue.objects.create(loan=self.loan, due_number=2, due_date=date(2025, 1, 2), due_amount='1100.00')
+        Notification.objects.create(user_id=self.agent.id, title='t', message='m')
+        Attendance.objects.create(user_id=self.agent.id, login_time=timezone.now())
+
+    def test_lean_rows_match_the_serializer(self):
+        for serializer_class in (CustomerSerializer, LoanTypeSerializer, LoanSerializer, LoanDueSerializer,
+                                 AttendanceSerializer, NotificationSerializer, LoanScheduleSerializer):
+            with self.subTest(serializer_class.__name__):
+                lean = lean_representation(serializer_class)
+                self.assertIsNotNone(lean)
+                queryset = serializer_class.Meta.model.objects.order_by('pk')
+                self.assertEqual(lean.render(queryset.values(*lean.columns)),
+                                 serializer_class(queryset, many=True).data)
+
+    def test_list_endpoints_match_the_serializer(self):
+        self.client.force_authenticate(self.admin)
+        for url, queryset, serializer_class in (
+            ('/api/auth/loans/', Loan.objects.order_by('-created_at', '-pk'), LoanSerializer),
+            ('/api/auth/loan-dues/', LoanDue.objects.order_by('due_date', 'pk'), LoanDueSerializer),
+            ('/api/auth/loan-schedules/', LoanSchedule.objects.order_by('due_date', 'pk'), LoanScheduleSerializer),
+        ):
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content)['results'],
+                                 json.loads(json.dumps(serializer_class(queryset, many=True).data)))
+
+
+class StreamingListTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n in range(1, 6):
+            self.add_schedule(n, date(2025, 1, 6 - n), assigned_to=self.agent if n % 2 else None)
+            LoanDue.objects.create(loan=self.loan, due_number=n, due_date=date(2025, 1, 6 - n),
+                                   due_amount='1100.00', paid_amount='1100.00' if n == 1 else '0',
+                                   payment_status='paid' if n == 1 else 'pending',
+                                   paid_at=timezone.now() if n == 1 else None)
+        self.client.force_authenticate(self.admin)
+
+    def stream(self, url):
+        response = self.client.get(url, {'stream': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_streamed_rows_match_the_serializer_across_chunks(self):
+        for url, view, queryset, serializer_class in (
+            ('/api/auth/loan-dues/', LoanDueViewSet, LoanDue.objects.order_by('due_date', 'pk'), LoanDueSerializer),
+            ('/api/auth/loan-schedules/', LoanScheduleListAPIView,
+             LoanSchedule.objects.order_by('due_date', 'pk'), LoanScheduleSerializer),
+        ):
+            expected = json.loads(json.dumps(serializer_class(queryset, many=True).data))
+            for chunk_size in (2, 5, 2000):
+                with self.subTest(url, chunk_size=chunk_size), \
+                        mock.patch.object(view, 'stream_chunk_size', chunk_size):
+                    self.assertEqual(self.stream(url), expected)
+
+    def test_empty_and_paginated_responses(self):
+        self.assertEqual(b''.join(encode_json_array([])), b'[]')
+        self.assertEqual(b''.join(encode_json_array([{'a': 1}, {'a': 2}], chunk_size=1)), b'[{"a":1},{"a":2}]')
+        # Without ?stream the paginated response is unchanged
+        response = self.client.get('/api/auth/loan-dues/', {'page_size': 2})
+        self.assertEqual([row['due_number'] for row in response.data['results']], [5, 4])
+        self.assertEqual([row['due_number'] for row in self.stream('/api/auth/loan-dues/')], [5, 4, 3, 2, 1])
+
+
+class LedgerExportTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n in range(1, 6):
+            LoanDue.objects.create(loan=self.loan, due_number=n, due_date=date(2025, 1, n), due_amount='1100.00',
+                                   paid_amount='1100.00' if n == 1 else '0',
+                                   payment_status='paid' if n == 1 else 'pending',
+                                   paid_at=timezone.now() if n == 1 else None)
+        self.client.force_authenticate(self.admin)
+
+    def test_parquet_export_reads_back_with_its_schema_and_rows(self):
+        response = self.client.get('/api/auth/exports/loan_dues/',
+                                   {'file_format': 'parquet', 'date_from': '2025-01-02'})
+        self.assertEqual(response.status_code, 200)
+        table = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+
+        _, columns = EXPORT_TABLES['loan_dues']
+        self.assertEqual([(field.name, field.type) for field in table.schema],
+                         [(name, arrow_type) for name, _, arrow_type in columns])
+        self.assertEqual(table.num_rows, 4)
+        self.assertEqual(table.column('due_number').to_pylist(), [2, 3, 4, 5])
+        self.assertEqual(table.column('due_amount').to_pylist(), [Decimal('1100.00')] * 4)
+        self.assertEqual(set(table.column('customer_id').to_pylist()), {self.customer.pk})
+
+    def test_parquet_row_groups_follow_the_chunk_size(self):
+        rows = export_rows('loan_dues', export_queryset('loan_dues'))
+        parquet = pq.ParquetFile(io.BytesIO(b''.join(export_chunks('loan_dues', 'parquet', rows, chunk_size=2))))
+        self.assertEqual(parquet.metadata.num_rows, 5)
+        self.assertEqual([parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)], [2, 2, 1])
+        paid_at = parquet.read().column('paid_at').to_pylist()
+        self.assertIsNotNone(paid_at[0])
+        self.assertEqual(paid_at[1:], [None] * 4)
+
+    def test_csv_export_has_the_same_columns_and_rows(self):
+        csv_body = b''.join(self.client.get('/api/auth/exports/loan_dues/', {'file_format': 'csv'}).streaming_content)
+        header, *lines = csv_body.decode().splitlines()
+        self.assertEqual(header.split(','), [name for name, _, _ in EXPORT_TABLES['loan_dues'][1]])
+        self.assertEqual([line.split(',')[2] for line in lines], ['1', '2', '3', '4', '5'])
+
+
+class AsyncViewTests(LoanDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        cache.clear()
+        self.add_schedule(1, date(2025, 1, 1), assigned_to=self.agent)
+        self.add_schedule(2, date(2025, 1, 2))
+        self.virtual = Loan.objects.create(
+            customer=self.customer, loan_type=self.loan_type, principal_amount='1000.00', total_due_count=4,
+            due_amount='275.00', interest_percentage='10.00', repayment_mode='weekly', created_by=self.admin.id,
+            schedule_mode='virtual')
+        materialize_installment(self.virtual, 2)
+        for n in range(3):
+            Notification.objects.create(user_id=self.agent.id, title=f't{n}', message='m')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.admin).key}'}
+
+    def tearDown(self):
+        token_cache.clear()
+        cache.clear()
+
+    def get_both(self, sync_url, async_url, params=None, headers=None):
+        headers = self.headers if headers is None else headers
+        sync_response = self.client.get(sync_url, params, headers=headers)
+
+        async def fetch():
+            return await self.async_client.get(async_url, params, headers=headers)
+        async_response = async_to_sync(fetch)()
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        return json.loads(sync_response.content), json.loads(async_response.content)
+
+    def test_async_endpoints_return_what_the_sync_ones_do(self):
+        for sync_url, async_url, params in (
+            (f'/api/auth/loan-schedules/{self.loan.pk}/', f'/api/auth/async/loan-schedules/{self.loan.pk}/', None),
+            (f'/api/auth/loan-schedules/{self.virtual.pk}/',
+             f'/api/auth/async/loan-schedules/{self.virtual.pk}/', None),
+            (f'/api/auth/loans/{self.virtual.pk}/details/', f'/api/auth/async/loans/{self.virtual.pk}/details/', None),
+            ('/api/auth/loans/999999/details/', '/api/auth/async/loans/999999/details/', None),
+            ('/api/auth/notifications/', '/api/auth/async/notifications/', {'page_size': 2}),
+            ('/api/auth/agents/', '/api/auth/async/agents/', None),
+        ):
+            with self.subTest(async_url):
+                sync_data, async_data = self.get_both(sync_url, async_url, params)
+                if 'next' in sync_data:
+                    # Each links to its own next page
+                    self.assertEqual(async_data.pop('next'), sync_data.pop('next').replace('/auth/', '/auth/async/'))
+                self.assertEqual(async_data, sync_data)
+
+    def test_async_endpoints_reject_missing_or_bad_tokens_like_the_sync_ones(self):
+        for headers in ({}, {'Authorization': 'Token not-a-token'}):
+            with self.subTest(headers=headers):
+                sync_data, async_data = self.get_both('/api/auth/agents/', '/api/auth/async/agents/', headers=headers)
+                self.assertEqual(async_data, sync_data)
+
+
+class SqlitePragmaTests(SimpleTestCase):
+
+    def applied_pragmas(self, pragmas):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = dict(connection.settings_dict, NAME=f'{directory}/pragmas.sqlite3', PRAGMAS=pragmas)
+            wrapper = SQLiteDatabaseWrapper(settings_dict, alias='pragmas')
+            try:
+                with wrapper.cursor() as cursor:
+                    applied = {}
+                    for name in ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'busy_timeout',
+                                 'temp_store'):
+                        cursor.execute(f'PRAGMA {name}')
+                        applied[name] = cursor.fetchone()[0]
+                return applied
+            finally:
+                wrapper.close()
+
+    def test_new_connections_get_the_configured_pragmas(self):
+        tuned = {
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,
+            'busy_timeout': 5000,
+            'temp_store': 2,             # MEMORY
+        }
+        # The persistent journal mode is left alone unless WAL is opted in
+        pragmas = {name: value for name, value in settings.SQLITE_PRAGMAS.items()
+                   if name not in settings.SQLITE_WAL_PRAGMAS}
+        self.assertEqual(self.applied_pragmas(pragmas),
+                         {'journal_mode': 'delete', 'synchronous': 2, **tuned})
+        self.assertEqual(self.applied_pragmas({**pragmas, **settings.SQLITE_WAL_PRAGMAS}),
+                         {'journal_mode': 'wal', 'synchronous': 1, **tuned})
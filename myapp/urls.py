@@ -4,7 +4,9 @@ from .views import (
     SignupView, LoginView, LogoutView, ChangePasswordView,
     CustomerViewSet, LoanTypeViewSet, LoanViewSet,
     LoanDueViewSet, DailyCollectionViewSet,
-    AttendanceViewSet, NotificationViewSet,assign_loan_schedule,list_collection_agents,LoanScheduleUpdateView, LoanScheduleViewSet
+    AttendanceViewSet, NotificationViewSet,assign_loan_schedule,list_collection_agents,LoanScheduleUpdateView, LoanScheduleViewSet,
+    agent_route, SyncFeedView, reference_cache_stats, ledger_export,
+    loan_schedules_by_loan_async, loan_details_async, notifications_async, collection_agents_async
 )
 from .views import LoanScheduleListAPIView, LoanScheduleByLoanAPIView
 # Initialize router
@@ -30,9 +32,23 @@ urlpatterns = [
     path('loan-schedules/<int:loan_id>/', LoanScheduleByLoanAPIView.as_view(), name='loan-schedules-by-loan'), 
     path('loan-schedules/<int:pk>/', LoanScheduleUpdateView.as_view(), name='update-loan-schedule'),
     path('loan-schedules/<int:pk>/assign/', assign_loan_schedule, name='assign-loan-schedule'),
+    # By loan and installment number; materializes installments of virtual loans
+    path('loan-schedules/<int:loan_id>/installments/<int:installment_no>/',
+         LoanScheduleUpdateView.as_view(), name='update-loan-installment'),
+    path('loan-schedules/<int:loan_id>/installments/<int:installment_no>/assign/',
+         assign_loan_schedule, name='assign-loan-installment'),
 
 
      path('agents/', list_collection_agents, name='list_collection_agents'),
+     path('agents/route/', agent_route, name='agent-route'),
+     path('sync/', SyncFeedView.as_view(), name='sync-feed'),
+     path('cache/stats/', reference_cache_stats, name='reference-cache-stats'),
+     path('exports/<str:table>/', ledger_export, name='ledger-export'),
+     # Async versions of the read endpoints, for the ASGI deployment
+     path('async/loan-schedules/<int:loan_id>/', loan_schedules_by_loan_async, name='async-loan-schedules-by-loan'),
+     path('async/loans/<int:pk>/details/', loan_details_async, name='async-loan-details'),
+     path('async/notifications/', notifications_async, name='async-notifications'),
+     path('async/agents/', collection_agents_async, name='async-agents'),
     # API routes
     path('', include(router.urls)),
 ]
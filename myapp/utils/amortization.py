@@ -0,0 +1,136 @@
+"""
+Vectorized amortization kernel.
+
+All money columns are int64 paise so every installment is exact; the
+rounding residue of each column is carried by the last installment of
+each loan. Many loans can be amortized in one call: the output columns
+are flat arrays and ``loan_index`` says which input loan a row belongs to.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+FLAT = 'flat'
+REDUCING = 'reducing'
+
+MODE_CODES = {'daily': 0, 'weekly': 1, 'monthly': 2}
+
+
+class ScheduleColumns(NamedTuple):
+    loan_index: np.ndarray
+    installment_no: np.ndarray
+    due_date: np.ndarray  # datetime64[D]
+    principal_amount: np.ndarray  # paise
+    interest_amount: np.ndarray  # paise
+    total_due: np.ndarray  # paise
+    remaining_principal: np.ndarray  # paise
+
+
+def to_paise(amounts):
+    """Convert rupee amounts (Decimal, float or str) to an int64 paise array."""
+    return np.rint(np.asarray([float(a) for a in amounts], dtype=np.float64) * 100).astype(np.int64)
+
+
+def _segments(counts):
+    """Flat row layout for ragged schedules: (loan_index, 1-based k, is_last)."""
+    loan_index = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    k = np.arange(int(counts.sum()), dtype=np.int64) - np.repeat(starts, counts) + 1
+    return loan_index, k, k == counts[loan_index]
+
+
+def _segment_cumsum(values, counts):
+    """Cumulative sum that restarts at the first row of every loan."""
+    totals = np.cumsum(values)
+    before = np.concatenate(([0], totals))[np.cumsum(counts) - counts]
+    return totals - np.repeat(before, counts)
+
+
+def _spread(amount, counts, loan_index, is_last):
+    """
+    Split each loan's ``amount`` paise into ``counts`` equal installments,
+    rounded to the paisa, with the residue on the last installment.
+    """
+    per = np.rint(amount / counts).astype(np.int64)
+    # Never let rounding up leave the last installment negative.
+    per = np.where(per * (counts - 1) > amount, amount // counts, per)
+    last = amount - per * (counts - 1)
+    return np.where(is_last, last[loan_index], per[loan_index])
+
+
+def due_dates(start_dates, repayment_modes, counts):
+    """
+    Due date of every installment.
+
+    Monthly dates match stepping with relativedelta(months=1) one
+    installment at a time: once the day is clipped to a short month it
+    stays clipped, i.e. the day is the running minimum of the days in
+    each month so far.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    loan_index, k, _ = _segments(counts)
+    start = np.asarray(start_dates, dtype='datetime64[D]')[loan_index]
+    modes = np.asarray([MODE_CODES.get(m, -1) for m in repayment_modes], dtype=np.int64)[loan_index]
+    steps = k - 1
+
+    start_month = start.astype('datetime64[M]')
+    start_day = (start - start_month.astype('datetime64[D]')).astype(np.int64) + 1
+    month = start_month + steps
+    days_in_month = ((month + 1).astype('datetime64[D]') - month.astype('datetime64[D]')).astype(np.int64)
+    # Running minimum per loan: shifting each loan down by 32 days keeps
+    # earlier loans from leaking into a later loan's accumulate.
+    shift = loan_index * 32
+    day = np.minimum.accumulate(np.minimum(start_day, days_in_month) - shift) + shift
+
+    dates = np.where(modes == 0, start + steps, start)
+    dates = np.where(modes == 1, start + 7 * steps, dates)
+    return np.where(modes == 2, month.astype('datetime64[D]') + (day - 1), dates)
+
+
+def amortize(principal_amounts, interest_percentages, counts, start_dates, repayment_modes, method=FLAT):
+    """
+    Compute the schedules of many loans at once.
+
+    Flat: total interest is principal * rate, spread evenly with the
+    principal. Reducing: fixed EMI on the balance at rate / 12 per
+    installment, the same convention as the per-installment loop it
+    replaces. Each loan's last row absorbs the rounding residue so the
+    principal column sums exactly to the principal and the last
+    remaining_principal is 0.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    principal = to_paise(principal_amounts)
+    rate = np.asarray([float(r) for r in interest_percentages], dtype=np.float64) / 100
+    loan_index, k, is_last = _segments(counts)
+
+    if method == FLAT:
+        total_interest = np.rint(principal * rate).astype(np.int64)
+        principal_col = _spread(principal, counts, loan_index, is_last)
+        interest_col = _spread(total_interest, counts, loan_index, is_last)
+    elif method == REDUCING:
+        r = (rate / 12)[loan_index]
+        n = counts[loan_index]
+        p = principal[loan_index].astype(np.float64)
+        safe_r = np.where(r > 0, r, 1.0)
+        growth_n = np.power(1 + r, n)
+        emi = np.where(r > 0, p * r * growth_n / np.where(r > 0, growth_n - 1, 1.0), p / n)
+        growth = np.power(1 + r, k - 1)
+        paid_factor = np.where(r > 0, (growth - 1) / safe_r, k - 1)
+        balance_before = p * growth - emi * paid_factor
+
+        interest_col = np.rint(balance_before * r).astype(np.int64)
+        principal_col = np.rint(emi).astype(np.int64) - interest_col
+        paid_before_last = _segment_cumsum(np.where(is_last, 0, principal_col), counts)
+        principal_col = np.where(is_last, principal[loan_index] - paid_before_last, principal_col)
+    else:
+        raise ValueError(f"Unknown amortization method: {method}")
+
+    return ScheduleColumns(
+        loan_index=loan_index,
+        installment_no=k,
+        due_date=due_dates(start_dates, repayment_modes, counts),
+        principal_amount=principal_col,
+        interest_amount=interest_col,
+        total_due=principal_col + interest_col,
+        remaining_principal=principal[loan_index] - _segment_cumsum(principal_col, counts),
+    )
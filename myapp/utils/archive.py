@@ -0,0 +1,110 @@
+"""
+Archival of long-closed loans out of the hot loan_schedule and loan_dues
+tables into loan_schedule_archive and loan_dues_archive.
+
+Loans are archived a chunk at a time, each chunk in its own transaction:
+its rows are copied with their original ids, deleted from the hot tables
+and the loans are stamped with archived_at. Each agent holding a
+schedule of an archived loan gets one loan-level SyncTombstone, which
+tells the device to drop all of that loan's rows. A run that stops part way
+leaves every chunk either fully archived or untouched, so running it
+again resumes with the next unarchived loan.
+"""
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from myapp.models import ArchivedLoanDue, ArchivedLoanSchedule, Loan, LoanDue, LoanSchedule, SyncTombstone
+
+ARCHIVE_STATUSES = ('closed', 'defaulted')
+ARCHIVE_CHUNK_SIZE = 200
+INSERT_BATCH_SIZE = 1000
+
+# hot model -> archive model
+ARCHIVE_MODELS = (
+    (LoanSchedule, ArchivedLoanSchedule),
+    (LoanDue, ArchivedLoanDue),
+)
+
+
+def archivable_loans(older_than_days):
+    """Closed and defaulted loans, closed for more than the given days, not archived yet."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Loan.objects.filter(
+        loan_status__in=ARCHIVE_STATUSES, closed_at__lt=cutoff, archived_at__isnull=True)
+
+
+def _tombstone_loans(loan_ids, now):
+    """One tombstone per (loan, agent) instead of one per archived row."""
+    holders = (
+        LoanSchedule.objects
+        .filter(loan_id__in=loan_ids, assigned_to__isnull=False)
+        .values_list('loan_id', 'assigned_to_id')
+        .order_by()
+        .distinct()
+    )
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(table=Loan._meta.db_table, object_id=loan_id, loan_id=loan_id,
+                      assigned_to_id=agent_id, deleted_at=now)
+        for loan_id, agent_id in holders
+    ], batch_size=INSERT_BATCH_SIZE)
+
+
+def _delete_rows(model, loan_ids):
+    """
+    Plain DELETE, so the per-row post_delete of QuerySet.delete() does not
+    write row tombstones on top of the loan-level ones.
+    """
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field('loan').column)
+    placeholders = ', '.join(['%s'] * len(loan_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', list(loan_ids))
+
+
+def _move_rows(model, archive_model, loan_ids):
+    fields = [field.attname for field in archive_model._meta.concrete_fields]
+    rows = model.objects.filter(loan_id__in=loan_ids)
+    archived = [archive_model(**row) for row in rows.values(*fields)]
+    archive_model.objects.bulk_create(archived, batch_size=INSERT_BATCH_SIZE)
+    _delete_rows(model, loan_ids)
+    return len(archived)
+
+
+def archive_closed_loans(older_than_days, chunk_size=ARCHIVE_CHUNK_SIZE, max_chunks=None, dry_run=False):
+    """
+    Move the schedules and dues of loans closed for more than
+    ``older_than_days`` into the archive tables, ``chunk_size`` loans per
+    transaction, stopping after ``max_chunks`` chunks if given.
+    Returns {'loans', 'schedules', 'dues'} counts.
+    """
+    totals = {'loans': 0, 'schedules': 0, 'dues': 0}
+    if dry_run:
+        loans = archivable_loans(older_than_days)
+        totals['loans'] = loans.count()
+        totals['schedules'] = LoanSchedule.objects.filter(loan__in=loans).count()
+        totals['dues'] = LoanDue.objects.filter(loan__in=loans).count()
+        return totals
+
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        now = timezone.now()
+        with transaction.atomic():
+            loan_ids = list(
+                archivable_loans(older_than_days)
+                .select_for_update()
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not loan_ids:
+                break
+            _tombstone_loans(loan_ids, now)
+            moved = [_move_rows(model, archive_model, loan_ids) for model, archive_model in ARCHIVE_MODELS]
+            Loan.objects.filter(pk__in=loan_ids).update(archived_at=now, updated_at=now)
+        chunks += 1
+        totals['loans'] += len(loan_ids)
+        totals['schedules'] += moved[0]
+        totals['dues'] += moved[1]
+    return totals
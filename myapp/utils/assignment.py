@@ -0,0 +1,35 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from myapp.notifications import notify_many
+from myapp.utils.sync import tombstone_reassigned
+
+
+def assignment_notifications(agent_id, loan_ids):
+    """
+    (user_id, title, message) notifications telling an agent about new
+    work: one per loan, counting the installments assigned on it.
+    """
+    return [
+        (agent_id, "New Loan Assigned", f"You have been assigned {count} installment(s) of Loan ID #{loan_id}.")
+        for loan_id, count in sorted(Counter(loan_ids).items())
+    ]
+
+
+def bulk_assign(schedules, agent):
+    """
+    Assign every pending schedule in the ``schedules`` queryset to ``agent``
+    with one UPDATE and queue one notification per loan for the agent.
+    Returns (assigned_count, notification_count).
+    """
+    schedules = schedules.filter(status='pending')
+    with transaction.atomic():
+        now = timezone.now()
+        loan_ids = list(schedules.values_list('loan_id', flat=True))
+        tombstone_reassigned(schedules, agent.id, now)
+        assigned = schedules.update(assigned_to=agent, updated_at=now)
+        notifications = assignment_notifications(agent.id, loan_ids)
+        notify_many(notifications)
+    return assigned, len(notifications)
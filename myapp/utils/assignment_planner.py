@@ -0,0 +1,158 @@
+"""
+Workload-balanced assignment of unassigned installments to agents.
+
+Installments are grouped by customer so one agent visits each customer,
+groups are handed out largest first, and each group goes to the agent with
+the lowest load (a heap keyed on load), unless the customer's previous
+agent can take it without going over their fair share. Load is the sum of
+the agent's amount and count, each relative to its per-agent average, so
+both stay balanced. Runs in O(n log n).
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from myapp.models import Loan, LoanSchedule
+from myapp.notifications import notify_many
+from myapp.utils.assignment import assignment_notifications
+from myapp.utils.loan_schedule import materialize_due
+
+UPDATE_CHUNK_SIZE = 500
+
+
+def plan_assignments(installments, agent_ids, previous_agents=None, tolerance=0.1):
+    """
+    installments: iterable of (schedule_id, customer_id, amount).
+    previous_agents: {customer_id: agent_id} for keeping customers with
+    the agent who already serves them.
+    Returns {agent_id: [schedule_id, ...]}.
+    """
+    agent_ids = list(agent_ids)
+    if not agent_ids:
+        return {}
+    previous_agents = previous_agents or {}
+
+    groups = defaultdict(lambda: [0.0, []])
+    for schedule_id, customer_id, amount in installments:
+        group = groups[customer_id]
+        group[0] += float(amount)
+        group[1].append(schedule_id)
+    if not groups:
+        return {}
+
+    total_amount = sum(amount for amount, _ in groups.values())
+    total_count = sum(len(ids) for _, ids in groups.values())
+    amount_share = max(total_amount / len(agent_ids), 1e-9)
+    count_share = max(total_count / len(agent_ids), 1e-9)
+    # An agent carrying exactly its share of both amount and count has load 2.
+    ceiling = 2 * (1 + tolerance)
+
+    load = dict.fromkeys(agent_ids, 0.0)
+    heap = [(0.0, agent_id) for agent_id in agent_ids]
+    heapq.heapify(heap)
+    plan = defaultdict(list)
+
+    for customer_id, (amount, ids) in sorted(groups.items(), key=lambda item: (-item[1][0], item[0])):
+        cost = amount / amount_share + len(ids) / count_share
+        agent_id = previous_agents.get(customer_id)
+        if agent_id not in load or load[agent_id] + cost > ceiling:
+            # Pop stale heap entries until the top matches its agent's load.
+            while heap[0][0] != load[heap[0][1]]:
+                heapq.heappop(heap)
+            agent_id = heap[0][1]
+        load[agent_id] += cost
+        heapq.heappush(heap, (load[agent_id], agent_id))
+        plan[agent_id].extend(ids)
+
+    return dict(plan)
+
+
+def auto_assign(date_from, date_to, dry_run=False, lookback_days=60):
+    """
+    Distribute the unassigned pending installments due between two dates
+    across active collection agents and write the result with one UPDATE
+    per agent and chunk. Returns {agent_id: {'installments', 'amount'}}
+    for the rows the UPDATEs changed (the plan, for a dry run); rows
+    assigned concurrently are left to their new agent and not reported.
+
+    Installments of virtual loans due in the window are materialized
+    first, so they are planned like stored ones; a dry run rolls them back.
+    """
+    with transaction.atomic():
+        materialize_due(Loan.objects.all(), date_from, date_to)
+        summary = _assign(date_from, date_to, dry_run, lookback_days)
+        if dry_run:
+            transaction.set_rollback(True)
+    return summary
+
+
+def _assign(date_from, date_to, dry_run, lookback_days):
+    agent_ids = list(
+        get_user_model().objects
+        .filter(role='collection_agent', is_active=True)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    rows = list(
+        LoanSchedule.objects
+        .filter(assigned_to__isnull=True, status='pending', due_date__range=(date_from, date_to))
+        .values_list('id', 'loan__customer_id', 'total_due', 'loan_id')
+    )
+
+    # Customer -> agent who most recently had one of their installments.
+    recent = (
+        LoanSchedule.objects
+        .filter(assigned_to__in=agent_ids,
+                due_date__range=(date_from - timedelta(days=lookback_days), date_to))
+        .values('loan__customer_id', 'assigned_to_id')
+        .annotate(last_due=Max('due_date'))
+        .order_by('last_due')
+    )
+    previous_agents = {row['loan__customer_id']: row['assigned_to_id'] for row in recent}
+
+    plan = plan_assignments(((sid, cid, amount) for sid, cid, amount, _ in rows), agent_ids, previous_agents)
+
+    by_id = {row[0]: row for row in rows}
+    if dry_run:
+        return _summarize(plan, by_id)
+
+    now = timezone.now()
+    assigned = {}
+    for agent_id, ids in plan.items():
+        assigned[agent_id] = []
+        for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+            chunk = ids[start:start + UPDATE_CHUNK_SIZE]
+            updated = LoanSchedule.objects.filter(
+                id__in=chunk, assigned_to__isnull=True
+            ).update(assigned_to_id=agent_id, updated_at=now)
+            if updated < len(chunk):
+                # Some were assigned by someone else since they were read;
+                # the rows this UPDATE changed carry its timestamp.
+                chunk = list(
+                    LoanSchedule.objects
+                    .filter(id__in=chunk, assigned_to_id=agent_id, updated_at=now)
+                    .values_list('id', flat=True)
+                )
+            assigned[agent_id].extend(chunk)
+
+    notifications = []
+    for agent_id, ids in assigned.items():
+        notifications.extend(assignment_notifications(agent_id, [by_id[sid][3] for sid in ids]))
+    notify_many(notifications)
+    return _summarize(assigned, by_id)
+
+
+def _summarize(assignments, by_id):
+    return {
+        agent_id: {
+            'installments': len(ids),
+            'amount': sum(by_id[sid][2] for sid in ids),
+        }
+        for agent_id, ids in assignments.items()
+        if ids
+    }
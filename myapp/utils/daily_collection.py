@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+from myapp.models import ArchivedLoanDue, DailyCollection, LoanDue
+
+# LoanDue.payment_method -> DailyCollection column
+METHOD_COLUMNS = {
+    'cash': 'cash_total',
+    'upi': 'upi_total',
+    'card': 'card_total',
+}
+
+
+def record_collection(agent_id, collection_date, payment_method, amount):
+    """
+    Add ``amount`` to the agent's total for ``collection_date``.
+
+    The running total is bumped with an UPDATE ... SET col = col + amount,
+    so concurrent payments never lose each other. The row for the day is
+    created on first use; the unique (agent_id, collection_date) constraint
+    settles a race between two first payments.
+    """
+    column = METHOD_COLUMNS.get(payment_method)
+    if column is None or agent_id is None:
+        return
+    amount = Decimal(str(amount))
+    if not amount:
+        return
+
+    rows = DailyCollection.objects.filter(agent_id=agent_id, collection_date=collection_date)
+    if rows.update(**{column: F(column) + amount}):
+        return
+    try:
+        with transaction.atomic():
+            DailyCollection.objects.create(agent_id=agent_id, collection_date=collection_date, **{column: amount})
+    except IntegrityError:
+        # Another payment created the row first; add to it instead.
+        rows.update(**{column: F(column) + amount})
+
+
+def rebuild_daily_collections(date_from, date_to):
+    """
+    Recompute every DailyCollection row between two dates from paid LoanDue
+    rows, and the archived dues of closed loans, with one GROUP BY per
+    table. Returns the number of rows written.
+    """
+    rows = {}
+    for model in (LoanDue, ArchivedLoanDue):
+        totals = (
+            model.objects
+            .filter(payment_status='paid', collected_by__isnull=False,
+                    payment_method__in=METHOD_COLUMNS, paid_at__date__range=(date_from, date_to))
+            .annotate(collection_date=TruncDate('paid_at'))
+            .values('collected_by', 'collection_date', 'payment_method')
+            .annotate(total=Sum('paid_amount'))
+            .order_by()
+        )
+        for total in totals:
+            key = (total['collected_by'], total['collection_date'])
+            row = rows.setdefault(key, DailyCollection(agent_id=key[0], collection_date=key[1]))
+            column = METHOD_COLUMNS[total['payment_method']]
+            setattr(row, column, getattr(row, column) + total['total'])
+
+    with transaction.atomic():
+        DailyCollection.objects.filter(collection_date__range=(date_from, date_to)).delete()
+        DailyCollection.objects.bulk_create(rows.values())
+    return len(rows)
@@ -0,0 +1,185 @@
+"""
+Fast read path for list endpoints.
+
+LeanRepresentation compiles a ModelSerializer once into a flat list of
+``.values()`` columns and a field map of (output key, column, converter),
+then turns value rows into plain dicts without instantiating models or
+going through DRF's per-field get_attribute machinery. The output is the
+same JSON the serializer produces: same keys, same order, same formats.
+Serializers with fields that cannot be read from a column (properties,
+method fields, dotted sources) are not compiled and keep the normal path.
+"""
+import datetime
+import decimal
+from functools import lru_cache
+
+from rest_framework import fields, relations, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _identity(value):
+    return value
+
+
+def _decimal_converter(field):
+    if (field.decimal_places is None or field.normalize_output or field.localize
+            or not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)):
+        return field.to_representation
+    exponent = decimal.Decimal(1).scaleb(-field.decimal_places)
+
+    def convert(value):
+        if isinstance(value, decimal.Decimal):
+            return '{:f}'.format(value.quantize(exponent))
+        return field.to_representation(value)
+    return convert
+
+
+def _date_converter(field):
+    if getattr(field, 'format', api_settings.DATE_FORMAT).lower() != fields.ISO_8601:
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+class _DateTimeConverter:
+    """
+    ISO 8601 datetime output as DRF renders it, with the field's timezone
+    looked up once per render instead of once per value.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        field = self.field
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() != fields.ISO_8601:
+            return field.to_representation
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if not isinstance(value, datetime.datetime) or value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return convert
+
+
+def _converter(field):
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        # values() yields the related pk, which is what the field renders.
+        return _identity
+    if isinstance(field, relations.RelatedField) or isinstance(field, fields.SerializerMethodField):
+        raise Unsupported(field.field_name)
+    if isinstance(field, fields.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, fields.DateTimeField):
+        return _DateTimeConverter(field)
+    if isinstance(field, fields.DateField):
+        return _date_converter(field)
+    if type(field) in (fields.CharField, fields.EmailField, fields.IntegerField, fields.ChoiceField):
+        return _identity
+    if type(field) is fields.ReadOnlyField:
+        raise Unsupported(field.field_name)
+    return field.to_representation
+
+
+class LeanRepresentation:
+
+    def __init__(self, serializer_class):
+        self.columns = []
+        self.field_map = self._compile(serializer_class(), '')
+
+    def _compile(self, serializer, prefix):
+        model = serializer.Meta.model
+        field_map = []
+        for field in serializer._readable_fields:
+            if field.source == '*' or '.' in field.source:
+                raise Unsupported(field.field_name)
+            column = prefix + field.source
+            if isinstance(field, serializers.ListSerializer):
+                raise Unsupported(field.field_name)
+            if isinstance(field, serializers.ModelSerializer):
+                nested_prefix = column + '__'
+                null_column = nested_prefix + field.Meta.model._meta.pk.name
+                self.columns.append(null_column)
+                field_map.append((field.field_name, null_column, self._compile(field, nested_prefix)))
+                continue
+            try:
+                model._meta.get_field(field.source)
+            except Exception:
+                raise Unsupported(field.field_name)
+            self.columns.append(column)
+            field_map.append((field.field_name, column, _converter(field)))
+        return field_map
+
+    def bound_field_map(self, field_map=None):
+        """The field map with per-request converters (datetimes) resolved."""
+        bound = []
+        for key, column, convert in self.field_map if field_map is None else field_map:
+            if isinstance(convert, list):
+                convert = self.bound_field_map(convert)
+            elif isinstance(convert, _DateTimeConverter):
+                convert = convert.bind()
+            bound.append((key, column, convert))
+        return bound
+
+    def render_row(self, row, field_map):
+        data = {}
+        for key, column, convert in field_map:
+            value = row[column]
+            if value is None:
+                data[key] = None
+            elif isinstance(convert, list):
+                data[key] = self.render_row(row, convert)
+            else:
+                data[key] = convert(value)
+        return data
+
+    def render(self, rows):
+        field_map = self.bound_field_map()
+        return [self.render_row(row, field_map) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def lean_representation(serializer_class):
+    """Compiled representation for a serializer class, or None if it cannot be compiled."""
+    try:
+        return LeanRepresentation(serializer_class)
+    except Unsupported:
+        return None
+
+
+class LeanListMixin:
+    """
+    Serves ``list`` from ``.values()`` rows through LeanRepresentation.
+    Works with KeysetPagination, which accepts dict rows; the ordering
+    columns are fetched alongside the serializer's columns.
+    """
+
+    def list(self, request, *args, **kwargs):
+        lean = lean_representation(self.get_serializer_class())
+        if lean is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        model = queryset.model
+        ordering = getattr(self, 'keyset_ordering', None) or ()
+        extra = [
+            model._meta.pk.name if name == 'pk' else name
+            for name in (field.lstrip('-') for field in ordering)
+        ]
+        columns = list(dict.fromkeys(lean.columns + extra))
+        rows = queryset.values(*columns)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(lean.render(page))
+        return Response(lean.render(rows))
@@ -0,0 +1,237 @@
+"""
+Constant-memory export of the loan_dues and loan_schedule tables, and
+their archives, as CSV or Parquet.
+
+Rows are read with ``values_list().iterator(chunk_size=...)`` in the
+due_date index order and handed on one chunk at a time: each chunk is one
+block of CSV text or one Parquet row group, so readers can scan or skip
+row groups by their due_date statistics.
+
+Installments of virtual loans that are not stored yet follow the stored
+rows of loan_dues and loan_schedule, computed VIRTUAL_CHUNK_SIZE loans at
+a time and in due_date order within each chunk, with a null id.
+"""
+import csv
+import io
+from decimal import Decimal
+from itertools import chain, islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from myapp.models import ArchivedLoanDue, ArchivedLoanSchedule, Loan, LoanDue, LoanSchedule
+from myapp.utils.loan_schedule import build_schedules
+
+EXPORT_FORMATS = ('csv', 'parquet')
+EXPORT_CHUNK_SIZE = 50000
+# Virtual loans per kernel call when exporting their computed installments
+VIRTUAL_CHUNK_SIZE = 500
+
+_MONEY = pa.decimal128(12, 2)
+_TIMESTAMP = pa.timestamp('us', tz='UTC')
+_LOAN_COLUMNS = [
+    ('customer_id', 'loan__customer_id', pa.int64()),
+    ('loan_type_id', 'loan__loan_type_id', pa.int64()),
+    ('loan_status', 'loan__loan_status', pa.string()),
+]
+
+# table -> (model, [(column, lookup, arrow type), ...])
+EXPORT_TABLES = {
+    'loan_dues': (LoanDue, [
+        ('due_id', 'due_id', pa.int64()),
+        ('loan_id', 'loan_id', pa.int64()),
+        ('due_number', 'due_number', pa.int32()),
+        ('due_date', 'due_date', pa.date32()),
+        ('due_amount', 'due_amount', _MONEY),
+        ('paid_amount', 'paid_amount', _MONEY),
+        ('payment_method', 'payment_method', pa.string()),
+        ('collected_by', 'collected_by', pa.int64()),
+        ('payment_status', 'payment_status', pa.string()),
+        ('skip_reason', 'skip_reason', pa.string()),
+        ('paid_at', 'paid_at', _TIMESTAMP),
+        ('updated_at', 'updated_at', _TIMESTAMP),
+    ] + _LOAN_COLUMNS),
+    'loan_schedule': (LoanSchedule, [
+        ('id', 'id', pa.int64()),
+        ('loan_id', 'loan_id', pa.int64()),
+        ('installment_no', 'installment_no', pa.int32()),
+        ('due_date', 'due_date', pa.date32()),
+        ('principal_amount', 'principal_amount', _MONEY),
+        ('interest_amount', 'interest_amount', _MONEY),
+        ('total_due', 'total_due', _MONEY),
+        ('remaining_principal', 'remaining_principal', _MONEY),
+        ('status', 'status', pa.string()),
+        ('assigned_to_id', 'assigned_to_id', pa.int64()),
+        ('updated_at', 'updated_at', _TIMESTAMP),
+    ] + _LOAN_COLUMNS),
+}
+# Archived loans keep the same columns in their own tables.
+EXPORT_TABLES['loan_dues_archive'] = (ArchivedLoanDue, EXPORT_TABLES['loan_dues'][1])
+EXPORT_TABLES['loan_schedule_archive'] = (ArchivedLoanSchedule, EXPORT_TABLES['loan_schedule'][1])
+
+
+def export_queryset(table, date_from=None, date_to=None, loan_status=None, loan_type=None):
+    """Rows of ``table`` matching the filters, as value tuples in due_date order."""
+    model, columns = EXPORT_TABLES[table]
+    queryset = model.objects.all()
+    if date_from:
+        queryset = queryset.filter(due_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(due_date__lte=date_to)
+    if loan_status:
+        queryset = queryset.filter(loan__loan_status=loan_status)
+    if loan_type:
+        queryset = queryset.filter(loan__loan_type_id=loan_type)
+    return queryset.order_by('due_date', 'pk').values_list(*[lookup for _, lookup, _ in columns])
+
+
+def _virtual_values(table, loan, row):
+    """Export columns of a computed installment, as stored by materialization."""
+    if table == 'loan_schedule':
+        values = {
+            'id': None, 'installment_no': row.installment_no,
+            'principal_amount': row.principal_amount, 'interest_amount': row.interest_amount,
+            'total_due': row.total_due, 'remaining_principal': row.remaining_principal,
+            'status': 'pending', 'assigned_to_id': None,
+        }
+    else:
+        values = {
+            'due_id': None, 'due_number': row.installment_no, 'due_amount': row.total_due,
+            'paid_amount': Decimal('0.00'), 'payment_method': None, 'collected_by': None,
+            'payment_status': 'pending', 'skip_reason': None, 'paid_at': None,
+        }
+    values.update(
+        loan_id=loan.pk, due_date=row.due_date, updated_at=None,
+        customer_id=loan.customer_id, loan_type_id=loan.loan_type_id, loan_status=loan.loan_status,
+    )
+    return tuple(values[name] for name, _, _ in EXPORT_TABLES[table][1])
+
+
+def virtual_rows(table, using=None, date_from=None, date_to=None, loan_status=None, loan_type=None):
+    """Value tuples of the installments of virtual loans not stored in ``table``."""
+    stored_model = LoanSchedule if table == 'loan_schedule' else LoanDue
+    number = 'installment_no' if table == 'loan_schedule' else 'due_number'
+    loans = Loan.objects.using(using).filter(schedule_mode='virtual', archived_at__isnull=True)
+    if loan_status:
+        loans = loans.filter(loan_status=loan_status)
+    if loan_type:
+        loans = loans.filter(loan_type_id=loan_type)
+    if date_to:
+        loans = loans.filter(created_at__date__lte=date_to)
+    loans = loans.order_by('pk').iterator(chunk_size=VIRTUAL_CHUNK_SIZE)
+    while True:
+        chunk = list(islice(loans, VIRTUAL_CHUNK_SIZE))
+        if not chunk:
+            return
+        by_id = {loan.pk: loan for loan in chunk}
+        stored = set(stored_model.objects.using(using).filter(loan_id__in=by_id).values_list('loan_id', number))
+        rows = [
+            row for row in build_schedules(chunk)
+            if (row.loan_id, row.installment_no) not in stored
+            and (not date_from or row.due_date >= date_from)
+            and (not date_to or row.due_date <= date_to)
+        ]
+        rows.sort(key=lambda row: (row.due_date, row.loan_id, row.installment_no))
+        for row in rows:
+            yield _virtual_values(table, by_id[row.loan_id], row)
+
+
+def export_rows(table, queryset, **filters):
+    """
+    The rows of ``queryset`` (from export_queryset), then for loan_dues and
+    loan_schedule the computed installments of virtual loans matching the
+    same filters, read from the same database.
+    """
+    rows = queryset.iterator(chunk_size=10000)
+    if table not in ('loan_dues', 'loan_schedule'):
+        return rows
+    return chain(rows, virtual_rows(table, using=queryset.db, **filters))
+
+
+def iter_chunks(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(table, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export as UTF-8 CSV, a header and then one block per chunk."""
+    _, columns = EXPORT_TABLES[table]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in columns])
+    for chunk in iter_chunks(rows, chunk_size):
+        writer.writerows([_csv_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _DrainingSink:
+    """
+    Write-only file for ParquetWriter that hands out what was written so
+    far. tell() keeps counting across drains, as Parquet offsets need.
+    """
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_chunks(table, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export as a Parquet file, one row group per chunk."""
+    _, columns = EXPORT_TABLES[table]
+    schema = pa.schema([pa.field(name, arrow_type) for name, _, arrow_type in columns])
+    sink = _DrainingSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='snappy') as writer:
+        for chunk in iter_chunks(rows, chunk_size):
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=len(chunk))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_chunks(table, file_format, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """``rows`` are value tuples in the column order of EXPORT_TABLES, e.g. from export_rows."""
+    if file_format == 'csv':
+        return csv_chunks(table, rows, chunk_size)
+    if file_format == 'parquet':
+        return parquet_chunks(table, rows, chunk_size)
+    raise ValueError(f"Unsupported export format: {file_format}")
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from myapp.models import Customer, LoanType, Loan
+from myapp.utils.amortization import FLAT
+from myapp.utils.loan_schedule import build_schedules, save_schedule
+from myapp.utils.loan_summary import create_summaries
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+def iter_rows(stream, file_format):
+    """
+    Yield (line_number, row, error) for every record of a binary stream,
+    one line at a time, so the file is never loaded whole.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Empty cells mean "not given", same as a missing JSON key.
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in ('', None)}, None
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Each line must be a JSON object."
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+def _flush(chunk, method, report):
+    """Insert one chunk of validated loans with their schedules and dues."""
+    loans = [loan for _, loan in chunk]
+    now = timezone.now()
+    for loan in loans:
+        # bulk_create skips the pre_save signal that stamps closed_at
+        loan.stamp_closed_at(now)
+    try:
+        with transaction.atomic():
+            Loan.objects.bulk_create(loans)
+            save_schedule(build_schedules([loan for loan in loans if loan.schedule_mode == 'stored'], method))
+            create_summaries(loans)
+    except DatabaseError as exc:
+        report['errors'].extend({'row': line, 'errors': {'non_field_errors': [str(exc)]}} for line, _ in chunk)
+        return
+    report['imported'] += len(loans)
+
+
+def import_loans(stream, file_format, created_by, chunk_size=500, method=FLAT):
+    """
+    Stream-import loans from CSV or JSONL.
+
+    Customer and loan type ids are checked against id sets fetched once
+    up front. Valid rows are written chunk by chunk, each chunk in its
+    own transaction, and invalid rows are reported by line number.
+    """
+    from myapp.serializers import LoanImportRowSerializer
+
+    context = {
+        'customer_ids': set(Customer.objects.values_list('pk', flat=True)),
+        'loan_type_ids': set(LoanType.objects.values_list('pk', flat=True)),
+    }
+    report = {'rows': 0, 'imported': 0, 'errors': []}
+    chunk = []
+
+    for line, row, error in iter_rows(stream, file_format):
+        report['rows'] += 1
+        if error:
+            report['errors'].append({'row': line, 'errors': {'non_field_errors': [error]}})
+            continue
+        serializer = LoanImportRowSerializer(data=row, context=context)
+        if not serializer.is_valid():
+            report['errors'].append({'row': line, 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        data.setdefault('created_at', timezone.now())
+        chunk.append((line, Loan(created_by=created_by, **data)))
+        if len(chunk) >= chunk_size:
+            _flush(chunk, method, report)
+            chunk = []
+
+    if chunk:
+        _flush(chunk, method, report)
+    return report
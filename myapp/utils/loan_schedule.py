@@ -1,71 +1,249 @@
-from datetime import timedelta
-from dateutil.relativedelta import relativedelta
-from math import pow
-from myapp.models import LoanSchedule
+from decimal import Decimal
+from itertools import islice
 
-# Flat interest schedule
-def create_flat_schedule(loan):
-    current_date = loan.created_at
-    principal = float(loan.principal_amount)
-    interest_rate = float(loan.interest_percentage) / 100
-    n = loan.total_due_count
+from django.db import transaction
+from myapp.models import ArchivedLoanSchedule, Loan, LoanSchedule, LoanDue
+from myapp.utils.amortization import amortize, FLAT, REDUCING
 
-    total_interest = principal * interest_rate
-    total_payable = principal + total_interest
-    installment_total = round(total_payable / n, 2)
-    principal_per_installment = round(principal / n, 2)
-    interest_per_installment = round(total_interest / n, 2)
 
-    remaining_principal = principal
+def _rupees(paise):
+    return Decimal(paise).scaleb(-2)
 
-    for i in range(1, n+1):
-        LoanSchedule.objects.create(
-            loan=loan,
-            installment_no=i,
-            due_date=current_date.date(),
-            principal_amount=principal_per_installment,
-            interest_amount=interest_per_installment,
-            total_due=installment_total,
-            remaining_principal=round(remaining_principal - principal_per_installment, 2)
+
+def build_schedules(loans, method=FLAT):
+    """
+    Build the schedules of many loans in memory with one kernel call.
+    Returns unsaved LoanSchedule instances, loan by loan.
+    """
+    loans = list(loans)
+    if not loans:
+        return []
+    columns = amortize(
+        [loan.principal_amount for loan in loans],
+        [loan.interest_percentage for loan in loans],
+        [loan.total_due_count for loan in loans],
+        [loan.created_at.date() for loan in loans],
+        [loan.repayment_mode for loan in loans],
+        method=method,
+    )
+    rows = zip(
+        columns.loan_index.tolist(),
+        columns.installment_no.tolist(),
+        columns.due_date.astype(object).tolist(),
+        columns.principal_amount.tolist(),
+        columns.interest_amount.tolist(),
+        columns.total_due.tolist(),
+        columns.remaining_principal.tolist(),
+    )
+    return [
+        LoanSchedule(
+            loan=loans[index],
+            installment_no=installment_no,
+            due_date=due_date,
+            principal_amount=_rupees(principal),
+            interest_amount=_rupees(interest),
+            total_due=_rupees(total),
+            remaining_principal=_rupees(remaining),
         )
+        for index, installment_no, due_date, principal, interest, total, remaining in rows
+    ]
 
-        remaining_principal -= principal_per_installment
 
-        if loan.repayment_mode == 'daily':
-            current_date += timedelta(days=1)
-        elif loan.repayment_mode == 'weekly':
-            current_date += timedelta(weeks=1)
-        elif loan.repayment_mode == 'monthly':
-            current_date += relativedelta(months=1)
+# Flat interest schedule
+def build_flat_schedule(loan):
+    """
+    Build the flat interest schedule for a loan in memory.
+    Returns unsaved LoanSchedule instances.
+    """
+    return build_schedules([loan], FLAT)
+
 
 # Reducing balance schedule
+def build_reducing_schedule(loan):
+    """
+    Build the reducing balance schedule for a loan in memory.
+    Returns unsaved LoanSchedule instances.
+    """
+    return build_schedules([loan], REDUCING)
+
+
+def save_schedule(schedules, ignore_conflicts=False):
+    """
+    Write schedule rows and their matching LoanDue rows with one bulk
+    insert each, inside a single transaction. ``ignore_conflicts`` skips
+    rows another request has written meanwhile (their pks are not set).
+
+    bulk_create() does not send post_save, so the LoanDue rows are built
+    here instead of by the receiver in myapp/loans/signals.py.
+    """
+    dues = [
+        LoanDue(
+            loan_id=schedule.loan_id,
+            due_number=schedule.installment_no,
+            due_date=schedule.due_date,
+            due_amount=schedule.total_due,
+            payment_status='pending',
+        )
+        for schedule in schedules
+    ]
+    with transaction.atomic():
+        LoanSchedule.objects.bulk_create(schedules, ignore_conflicts=ignore_conflicts)
+        LoanDue.objects.bulk_create(dues, ignore_conflicts=ignore_conflicts)
+    return schedules
+
+
+def create_flat_schedule(loan):
+    return save_schedule(build_flat_schedule(loan))
+
+
 def create_reducing_schedule(loan):
-    current_date = loan.created_at
-    principal = float(loan.principal_amount)
-    n = loan.total_due_count
-    r = float(loan.interest_percentage) / 100 / 12  # monthly interest
+    return save_schedule(build_reducing_schedule(loan))
+
+
+def stored_schedules(loan):
+    """
+    The stored schedule rows of a loan in installment order, read from
+    loan_schedule_archive once the loan has been archived.
+    """
+    model = ArchivedLoanSchedule if loan.archived_at else LoanSchedule
+    return model.objects.filter(loan=loan).order_by('installment_no')
 
-    emi = principal * r * pow(1+r, n) / (pow(1+r, n) - 1)
-    remaining_principal = principal
 
-    for i in range(1, n+1):
-        interest_amount = remaining_principal * r
-        principal_amount = emi - interest_amount
-        remaining_principal -= principal_amount
+def merged_schedule(loan):
+    """
+    All installments of a loan in installment order.
 
-        LoanSchedule.objects.create(
+    Stored loans return their rows as-is. Virtual loans return the stored
+    (materialized) rows merged over unsaved rows computed from the loan
+    terms, so callers see the full schedule either way.
+    """
+    stored = list(stored_schedules(loan))
+    if loan.schedule_mode != 'virtual':
+        return stored
+    by_number = {schedule.installment_no: schedule for schedule in stored}
+    return [by_number.get(row.installment_no, row) for row in build_flat_schedule(loan)]
+
+
+async def amerged_schedule(loan):
+    """merged_schedule for async views, reading the stored rows with the async ORM."""
+    stored = [schedule async for schedule in stored_schedules(loan)]
+    if loan.schedule_mode != 'virtual':
+        return stored
+    by_number = {schedule.installment_no: schedule for schedule in stored}
+    return [by_number.get(row.installment_no, row) for row in build_flat_schedule(loan)]
+
+
+def materialize_installment(loan, installment_no):
+    """
+    Write the schedule and due rows of one installment of a virtual loan,
+    so it can be paid, assigned or edited like a stored row.
+    Returns (schedule, created); raises LoanSchedule.DoesNotExist if the
+    installment number is out of range.
+    """
+    existing = LoanSchedule.objects.filter(loan=loan, installment_no=installment_no).first()
+    if existing is not None:
+        return existing, False
+    if not 1 <= installment_no <= loan.total_due_count:
+        raise LoanSchedule.DoesNotExist(f"Loan {loan.pk} has no installment {installment_no}.")
+
+    row = build_flat_schedule(loan)[installment_no - 1]
+    with transaction.atomic():
+        schedule, created = LoanSchedule.objects.get_or_create(
             loan=loan,
-            installment_no=i,
-            due_date=current_date.date(),
-            principal_amount=round(principal_amount, 2),
-            interest_amount=round(interest_amount, 2),
-            total_due=round(emi, 2),
-            remaining_principal=round(remaining_principal, 2)
+            installment_no=installment_no,
+            defaults={
+                'due_date': row.due_date,
+                'principal_amount': row.principal_amount,
+                'interest_amount': row.interest_amount,
+                'total_due': row.total_due,
+                'remaining_principal': row.remaining_principal,
+            }
         )
+        LoanDue.objects.get_or_create(
+            loan=loan,
+            due_number=installment_no,
+            defaults={
+                'due_date': schedule.due_date,
+                'due_amount': schedule.total_due,
+                'payment_status': 'pending',
+            }
+        )
+    return schedule, created
+
+
+# Virtual loans per kernel call when materializing in bulk
+MATERIALIZE_CHUNK_SIZE = 500
+
+
+def materialize_installments(pairs):
+    """
+    Schedule ids of (loan_id, installment_no) pairs, as {pair: id}.
+    Installments of virtual loans that are not stored yet are written
+    first, all of them with one bulk insert. Pairs that name no
+    installment are left out.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+
+    def stored():
+        rows = LoanSchedule.objects.filter(
+            loan_id__in={loan_id for loan_id, _ in pairs},
+            installment_no__in={number for _, number in pairs},
+        ).values_list('loan_id', 'installment_no', 'id')
+        return {(loan_id, number): schedule_id for loan_id, number, schedule_id in rows
+                if (loan_id, number) in pairs}
+
+    found = stored()
+    missing = pairs - found.keys()
+    if not missing:
+        return found
+    loans = Loan.objects.filter(pk__in={loan_id for loan_id, _ in missing}, schedule_mode='virtual')
+    rows = [row for row in build_schedules(loans) if (row.loan_id, row.installment_no) in missing]
+    if not rows:
+        return found
+    save_schedule(rows, ignore_conflicts=True)
+    return stored()
+
+
+def materialize_due(loans, date_from=None, date_to=None):
+    """
+    Write the not yet stored installments of the active virtual loans in
+    ``loans`` (a queryset) due between two dates, so set-based jobs
+    (bulk-assign, auto_assign) see them as ordinary rows. Works through
+    the loans MATERIALIZE_CHUNK_SIZE at a time. Returns the number of
+    installments written.
+    """
+    loans = loans.filter(schedule_mode='virtual', loan_status='active', archived_at__isnull=True)
+    if date_to is not None:
+        # Installments fall due after the loan is created
+        loans = loans.filter(created_at__date__lte=date_to)
+    loans = loans.order_by('pk').iterator(chunk_size=MATERIALIZE_CHUNK_SIZE)
+    written = 0
+    while True:
+        chunk = list(islice(loans, MATERIALIZE_CHUNK_SIZE))
+        if not chunk:
+            return written
+        stored = set(
+            LoanSchedule.objects.filter(loan__in=chunk).values_list('loan_id', 'installment_no')
+        )
+        rows = [
+            row for row in build_schedules(chunk)
+            if (row.loan_id, row.installment_no) not in stored
+            and (date_from is None or row.due_date >= date_from)
+            and (date_to is None or row.due_date <= date_to)
+        ]
+        save_schedule(rows, ignore_conflicts=True)
+        written += len(rows)
+
 
-        if loan.repayment_mode == 'daily':
-            current_date += timedelta(days=1)
-        elif loan.repayment_mode == 'weekly':
-            current_date += timedelta(weeks=1)
-        elif loan.repayment_mode == 'monthly':
-            current_date += relativedelta(months=1)
+def get_schedule(pk=None, loan_id=None, installment_no=None):
+    """
+    A schedule by id, or by loan and installment number, materializing
+    the installment of a virtual loan. Raises LoanSchedule.DoesNotExist.
+    """
+    if pk is None:
+        pk = materialize_installments([(loan_id, installment_no)]).get((loan_id, installment_no))
+        if pk is None:
+            raise LoanSchedule.DoesNotExist(f"Loan {loan_id} has no installment {installment_no}.")
+    return LoanSchedule.objects.get(pk=pk)
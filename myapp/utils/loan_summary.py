@@ -0,0 +1,127 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Exists, Min, OuterRef, Sum
+from django.utils import timezone
+
+from myapp.models import LoanDue, LoanSchedule, LoanSummary
+
+
+def create_summaries(loans):
+    """Write the aggregate row of newly created loans in one bulk insert."""
+    LoanSummary.objects.bulk_create([
+        LoanSummary(
+            loan=loan,
+            outstanding_principal=loan.principal_amount,
+            # The first installment falls due on the day the loan is created
+            next_due_date=loan.created_at.date() if loan.total_due_count else None,
+        )
+        for loan in loans
+    ])
+
+
+def next_due_date(loan):
+    """Due date of the loan's earliest unpaid installment, or None."""
+    if loan.schedule_mode == 'virtual':
+        from myapp.utils.loan_schedule import merged_schedule
+        return next((row.due_date for row in merged_schedule(loan) if row.status == 'pending'), None)
+    return (
+        LoanSchedule.objects
+        .filter(loan_id=loan.pk, status='pending')
+        .aggregate(first=Min('due_date'))['first']
+    )
+
+
+def refresh_summaries(loans):
+    """
+    Recompute the summary rows of ``loans`` from their dues and schedules,
+    creating missing rows. For changes that bypass apply_payments: loan
+    edits, schedule status edits, and loans written before summaries
+    existed (`manage.py rebuild_loan_summaries`). Archived loans are
+    skipped: their dues and schedules have moved to the archive tables.
+    """
+    loans = {loan.pk: loan for loan in loans if not loan.archived_at}
+    if not loans:
+        return
+    paid = {
+        row['loan_id']: row
+        for row in LoanDue.objects
+        .filter(loan_id__in=loans, payment_status='paid')
+        .values('loan_id')
+        .annotate(installments=Count('pk'), amount=Sum('paid_amount'))
+        .order_by()
+    }
+    repaid = dict(
+        LoanSchedule.objects
+        .filter(loan_id__in=loans)
+        .filter(Exists(LoanDue.objects.filter(
+            loan_id=OuterRef('loan_id'), due_number=OuterRef('installment_no'), payment_status='paid')))
+        .values('loan_id')
+        .annotate(principal=Sum('principal_amount'))
+        .order_by()
+        .values_list('loan_id', 'principal')
+    )
+    first_pending = dict(
+        LoanSchedule.objects
+        .filter(loan_id__in=loans, status='pending')
+        .values('loan_id')
+        .annotate(first=Min('due_date'))
+        .order_by()
+        .values_list('loan_id', 'first')
+    )
+
+    summaries = []
+    for loan in loans.values():
+        totals = paid.get(loan.pk, {})
+        summaries.append(LoanSummary(
+            loan=loan,
+            paid_installments=totals.get('installments', 0),
+            paid_amount=totals.get('amount') or Decimal('0'),
+            outstanding_principal=Decimal(loan.principal_amount) - (repaid.get(loan.pk) or Decimal('0')),
+            next_due_date=next_due_date(loan) if loan.schedule_mode == 'virtual' else first_pending.get(loan.pk),
+            updated_at=timezone.now(),
+        ))
+    fields = ['paid_installments', 'paid_amount', 'outstanding_principal', 'next_due_date', 'updated_at']
+    with transaction.atomic():
+        existing = set(LoanSummary.objects.select_for_update().filter(loan_id__in=loans).values_list('pk', flat=True))
+        LoanSummary.objects.bulk_update([summary for summary in summaries if summary.pk in existing], fields)
+        LoanSummary.objects.bulk_create([summary for summary in summaries if summary.pk not in existing])
+
+
+def apply_payments(deltas):
+    """
+    Apply collected payments to the summary rows of their loans.
+
+    ``deltas`` maps loan -> {'installments', 'amount', 'principal'}: newly
+    paid installments, change in paid amount and principal repaid. The
+    rows are locked, adjusted in memory and written back with a single
+    bulk UPDATE. Call inside a transaction, after the schedules are saved.
+    """
+    if not deltas:
+        return
+    loans = {loan.pk: loan for loan in deltas}
+    first_pending = dict(
+        LoanSchedule.objects
+        .filter(loan_id__in=loans, status='pending')
+        .values('loan_id')
+        .annotate(first=Min('due_date'))
+        .order_by()
+        .values_list('loan_id', 'first')
+    )
+    summaries = list(LoanSummary.objects.select_for_update().filter(loan_id__in=loans))
+    now = timezone.now()
+    for summary in summaries:
+        loan = loans[summary.loan_id]
+        delta = deltas[loan]
+        summary.paid_installments += delta['installments']
+        summary.paid_amount += delta['amount']
+        summary.outstanding_principal -= delta['principal']
+        if loan.schedule_mode == 'virtual':
+            summary.next_due_date = next_due_date(loan)
+        else:
+            summary.next_due_date = first_pending.get(loan.pk)
+        summary.updated_at = now
+    LoanSummary.objects.bulk_update(
+        summaries,
+        ['paid_installments', 'paid_amount', 'outstanding_principal', 'next_due_date', 'updated_at'],
+    )
@@ -0,0 +1,116 @@
+"""
+Set-based overdue and default detection.
+
+Every step is one UPDATE over loan_schedule or loans, so the cost is a
+few index range scans however large the book is:
+
+1. flag pending installments whose due date has passed (is_overdue), and
+   clear the flag on installments that were paid or rescheduled;
+2. set Loan.overdue_since to the due date of each active loan's oldest
+   flagged installment, touching only loans whose value changes; for
+   virtual loans, which keep no rows for untouched installments, to
+   LoanSummary.next_due_date (their earliest unpaid installment, stored
+   or not) once it has passed;
+3. move active loans overdue for more than LOAN_DEFAULT_AFTER_DAYS to
+   'defaulted'.
+
+Days past due is ``as_of - overdue_since``.
+"""
+from datetime import date, timedelta
+from time import perf_counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from myapp.models import Loan, LoanSchedule, LoanSummary
+
+# Stand-in for NULL when comparing overdue_since with its new value
+_NO_DATE = date(1, 1, 1)
+
+# (label, first day, last day) of the days-past-due buckets in the report
+DPD_BUCKETS = (
+    ('1-30', 1, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None),
+)
+
+
+def default_after_days():
+    return getattr(settings, 'LOAN_DEFAULT_AFTER_DAYS', 90)
+
+
+def detect_overdue(as_of=None, default_after=None):
+    """
+    Run the three steps for ``as_of`` (default today) in one transaction.
+    Returns {'flagged', 'cleared', 'loans_updated', 'defaulted', 'buckets',
+    'timings'}, where timings maps each step to its seconds.
+    """
+    as_of = as_of or timezone.localdate()
+    default_after = default_after_days() if default_after is None else default_after
+    now = timezone.now()
+    timings = {}
+    result = {'timings': timings}
+
+    with transaction.atomic():
+        started = perf_counter()
+        active = Loan.objects.filter(loan_status='active').values('pk')
+        result['flagged'] = LoanSchedule.objects.filter(
+            status='pending', due_date__lt=as_of, is_overdue=False, loan__in=active,
+        ).update(is_overdue=True, updated_at=now)
+        result['cleared'] = LoanSchedule.objects.filter(is_overdue=True).filter(
+            ~Q(status='pending') | Q(due_date__gte=as_of),
+        ).update(is_overdue=False, updated_at=now)
+        timings['flag_installments'] = perf_counter() - started
+
+        started = perf_counter()
+        oldest = Subquery(
+            LoanSchedule.objects
+            .filter(loan=OuterRef('pk'), is_overdue=True)
+            .order_by('due_date')
+            .values('due_date')[:1]
+        )
+        past_due = Subquery(
+            LoanSummary.objects
+            .filter(loan=OuterRef('pk'), next_due_date__lt=as_of)
+            .values('next_due_date')[:1]
+        )
+        result['loans_updated'] = 0
+        for loans, since in (
+            (Loan.objects.exclude(schedule_mode='virtual'), oldest),
+            (Loan.objects.filter(schedule_mode='virtual'), past_due),
+        ):
+            result['loans_updated'] += (
+                loans
+                .filter(loan_status='active')
+                .annotate(current=Coalesce('overdue_since', Value(_NO_DATE)),
+                          new=Coalesce(since, Value(_NO_DATE)))
+                .exclude(current=F('new'))
+                .update(overdue_since=since, updated_at=now)
+            )
+        timings['overdue_since'] = perf_counter() - started
+
+        started = perf_counter()
+        result['defaulted'] = Loan.objects.filter(
+            loan_status='active', overdue_since__lt=as_of - timedelta(days=default_after),
+        ).update(loan_status='defaulted', closed_at=now, updated_at=now)
+        timings['default_loans'] = perf_counter() - started
+
+    started = perf_counter()
+    result['buckets'] = days_past_due_buckets(as_of)
+    timings['report'] = perf_counter() - started
+    return result
+
+
+def days_past_due_buckets(as_of):
+    """Count of active overdue loans per DPD_BUCKETS label, in one query."""
+    counts = {}
+    for label, first, last in DPD_BUCKETS:
+        since = Q(overdue_since__lte=as_of - timedelta(days=first))
+        if last is not None:
+            since &= Q(overdue_since__gte=as_of - timedelta(days=last))
+        counts[label] = Count('pk', filter=since)
+    return Loan.objects.filter(loan_status='active', overdue_since__isnull=False).aggregate(**counts)
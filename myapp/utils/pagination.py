@@ -0,0 +1,136 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a composite ordering such as ('due_date', 'pk').
+
+    The cursor holds the ordering values of the last row served, and the
+    next page is selected with a row-value comparison on them instead of an
+    OFFSET, so every page costs the same as the first. Views pick their
+    ordering with a ``keyset_ordering`` attribute; every ordering should end
+    in 'pk' (or '-pk') so it is total.
+    """
+    ordering = ('-pk',)
+    page_size = api_settings.PAGE_SIZE or 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request, ordering):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, values):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat')
+            else str(value) if isinstance(value, Decimal)
+            else value
+            for value in values
+        ]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+
+    def keyset_filter(self, ordering, values):
+        """
+        Rows strictly after ``values`` in ``ordering``:
+        (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def position(self, row, ordering):
+        names = [field.lstrip('-') for field in ordering]
+        if isinstance(row, dict):
+            # .values() rows (LeanListMixin) are keyed by field name, not 'pk'.
+            return [row[self.pk_name if name == 'pk' else name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    def page_queryset(self, queryset, request, view=None):
+        """
+        The unevaluated queryset for the requested page (one extra row to
+        detect a next page). Async views iterate it themselves and pass
+        the rows to finish_page.
+        """
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.current_page_size = self.get_page_size(request)
+
+        self.pk_name = queryset.model._meta.pk.name
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, self.ordering)
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(self.keyset_filter(self.ordering, cursor))
+            except (ValidationError, TypeError, ValueError):
+                # Well-formed cursor whose values don't fit the ordering fields
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.current_page_size + 1]
+
+    def finish_page(self, rows):
+        self.has_next = len(rows) > self.current_page_size
+        rows = rows[:self.current_page_size]
+        self.next_cursor = self.encode_cursor(self.position(rows[-1], self.ordering)) if self.has_next else None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request, view)))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from myapp.models import LoanDue, LoanSchedule
+from myapp.utils.daily_collection import record_collection
+from myapp.utils.loan_schedule import materialize_installments
+from myapp.utils.loan_summary import apply_payments
+
+DUE_UPDATE_FIELDS = ['paid_amount', 'payment_method', 'collected_by', 'payment_status', 'paid_at', 'updated_at']
+
+
+def collect_payments(entries, agent_id):
+    """
+    Record collected installments in one transaction.
+
+    ``entries`` are validated dicts with 'schedule' (id), or 'loan' and
+    'installment_no' (virtual installments are materialized first), and
+    optional 'paid_amount', 'payment_method' and 'collected_at'. The affected
+    schedules and dues are locked and written with bulk operations, and
+    the daily collection totals and loan summaries are updated once per
+    key. Returns one result per entry, in order: {'schedule', 'due'} on
+    success or {'schedule', 'error'}.
+    """
+    results = [None] * len(entries)
+    now = timezone.now()
+
+    with transaction.atomic():
+        by_installment = materialize_installments(
+            (entry['loan'], entry['installment_no']) for entry in entries if entry.get('schedule') is None
+        )
+        targets = [
+            entry['schedule'] if entry.get('schedule') is not None
+            else by_installment.get((entry['loan'], entry['installment_no']))
+            for entry in entries
+        ]
+        schedule_ids = {target for target in targets if target is not None}
+        schedules = {
+            schedule.id: schedule
+            for schedule in LoanSchedule.objects.select_for_update().select_related('loan').filter(id__in=schedule_ids)
+        }
+        loan_ids = {schedule.loan_id for schedule in schedules.values()}
+        numbers = {schedule.installment_no for schedule in schedules.values()}
+        dues = {
+            (due.loan_id, due.due_number): due
+            for due in LoanDue.objects.select_for_update().filter(loan_id__in=loan_ids, due_number__in=numbers)
+        }
+
+        new_dues, changed_dues, seen = [], [], set()
+        collections = defaultdict(Decimal)
+        summary_deltas = defaultdict(lambda: {'installments': 0, 'amount': Decimal('0'), 'principal': Decimal('0')})
+
+        for index, (entry, target) in enumerate(zip(entries, targets)):
+            schedule = schedules.get(target)
+            if schedule is None:
+                results[index] = {'schedule': target, 'error': "Schedule not found."}
+                continue
+            if schedule.id in seen:
+                results[index] = {'schedule': schedule.id, 'error': "Duplicate entry for this schedule."}
+                continue
+            seen.add(schedule.id)
+
+            amount = entry.get('paid_amount')
+            amount = schedule.total_due if amount is None else amount
+            method = entry.get('payment_method', 'cash')
+            paid_at = entry.get('collected_at') or now
+
+            due = dues.get((schedule.loan_id, schedule.installment_no))
+            delta = summary_deltas[schedule.loan]
+            if due is None:
+                due = LoanDue(loan=schedule.loan, due_number=schedule.installment_no,
+                              due_date=schedule.due_date, due_amount=schedule.total_due)
+                new_dues.append(due)
+            else:
+                if due.payment_status == 'paid':
+                    # A re-collected due moves out of the old day's totals first
+                    collections[(due.collected_by, timezone.localdate(due.paid_at), due.payment_method)] -= due.paid_amount
+                    delta['amount'] -= due.paid_amount
+                changed_dues.append(due)
+            if due.payment_status != 'paid':
+                delta['installments'] += 1
+                delta['principal'] += schedule.principal_amount
+
+            due.paid_amount = amount
+            due.payment_method = method
+            due.collected_by = agent_id
+            due.payment_status = 'paid'
+            due.paid_at = paid_at
+            due.updated_at = now
+            collections[(agent_id, timezone.localdate(paid_at), method)] += amount
+            delta['amount'] += amount
+
+            schedule.status = 'Paid'
+            schedule.is_overdue = False
+            schedule.updated_at = now
+            results[index] = {'schedule': schedule.id, 'due': due}
+
+        LoanDue.objects.bulk_create(new_dues)
+        LoanDue.objects.bulk_update(changed_dues, DUE_UPDATE_FIELDS)
+        LoanSchedule.objects.bulk_update(
+            [schedules[schedule_id] for schedule_id in seen], ['status', 'is_overdue', 'updated_at'])
+        for (collector, collection_date, method), amount in collections.items():
+            record_collection(collector, collection_date, method, amount)
+        apply_payments(summary_deltas)
+
+    return results
@@ -0,0 +1,145 @@
+"""
+Read-through cache for reference data that rarely changes: loan types
+and users (collection agents, lookups by id).
+
+Values are stored under versioned keys, ``ref:<namespace>:<version>:<name>``,
+in the REFERENCE_CACHE_ALIAS cache. Saving or deleting a LoanType or
+CustomUser bumps its namespace version (see myapp/signals.py), so every
+older key is orphaned at once and expires on its own. Versions start from
+the clock, so an evicted version counter never brings old keys back.
+
+The bump only reaches the processes that share the cache. Without
+REFERENCE_CACHE_ALIAS the process-local default cache is used and values
+live REFERENCE_CACHE_LOCAL_TTL seconds, which bounds how long another
+worker serves a changed role or loan type.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+
+from myapp.models import LoanType
+
+LOAN_TYPES = 'loan_types'
+USERS = 'users'
+
+_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+_MISSING = object()
+
+
+def _shared_alias():
+    return getattr(settings, 'REFERENCE_CACHE_ALIAS', None)
+
+
+def _cache():
+    return caches[_shared_alias() or 'default']
+
+
+def _timeout():
+    if _shared_alias():
+        return getattr(settings, 'REFERENCE_CACHE_TTL', 300)
+    return getattr(settings, 'REFERENCE_CACHE_LOCAL_TTL', 5)
+
+
+def _version(namespace):
+    cache = _cache()
+    key = f'ref:{namespace}:version'
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def cached(namespace, name, loader):
+    """Return the cached value for (namespace, name), calling ``loader`` on a miss."""
+    cache = _cache()
+    key = f'ref:{namespace}:{_version(namespace)}:{name}'
+    value = cache.get(key, _MISSING)
+    with _lock:
+        (_misses if value is _MISSING else _hits)[namespace] += 1
+    if value is _MISSING:
+        value = loader()
+        cache.set(key, value, _timeout())
+    return value
+
+
+async def _aversion(namespace):
+    cache = _cache()
+    key = f'ref:{namespace}:version'
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key, version)
+    return version
+
+
+async def acached(namespace, name, aloader):
+    """cached() for async views; ``aloader`` is a coroutine function."""
+    cache = _cache()
+    key = f'ref:{namespace}:{await _aversion(namespace)}:{name}'
+    value = await cache.aget(key, _MISSING)
+    with _lock:
+        (_misses if value is _MISSING else _hits)[namespace] += 1
+    if value is _MISSING:
+        value = await aloader()
+        await cache.aset(key, value, _timeout())
+    return value
+
+
+def invalidate(namespace):
+    cache = _cache()
+    key = f'ref:{namespace}:version'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def stats():
+    """Hit/miss counters of this process since start (or reset_stats)."""
+    with _lock:
+        return {
+            namespace: {'hits': _hits[namespace], 'misses': _misses[namespace]}
+            for namespace in sorted(set(_hits) | set(_misses))
+        }
+
+
+def reset_stats():
+    with _lock:
+        _hits.clear()
+        _misses.clear()
+
+
+def loan_types_by_id():
+    return cached(LOAN_TYPES, 'by_id', lambda: {loan_type.pk: loan_type for loan_type in LoanType.objects.all()})
+
+
+def collection_agents():
+    return cached(USERS, 'agents', lambda: list(get_user_model().objects.filter(role='collection_agent')))
+
+
+async def acollection_agents():
+    async def load():
+        return [agent async for agent in get_user_model().objects.filter(role='collection_agent')]
+    return await acached(USERS, 'agents', load)
+
+
+def collection_agents_by_id():
+    return {agent.pk: agent for agent in collection_agents()}
+
+
+def get_user(pk):
+    """The user with this id, or None. Misses are cached too."""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    return cached(USERS, f'id:{pk}', lambda: get_user_model().objects.filter(pk=pk).first())
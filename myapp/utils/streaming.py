@@ -0,0 +1,68 @@
+"""
+Streaming JSON for large list responses (``?stream=true``).
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL, fetchmany on SQLite), turned into dicts by the lean
+representation when the serializer compiles, and encoded with orjson one
+chunk at a time. Memory stays bounded by the chunk size and the first
+bytes go out before the query is exhausted. The body is a plain JSON
+array of all matching rows in the view's keyset ordering, unpaginated.
+"""
+from itertools import islice
+
+import orjson
+from django.http import StreamingHttpResponse
+
+from myapp.utils.lean import lean_representation
+
+STREAM_CHUNK_SIZE = 2000
+TRUE_VALUES = {'1', 'true', 'yes'}
+
+
+def encode_json_array(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield a JSON array of ``rows`` as bytes, one piece per chunk of rows."""
+    rows = iter(rows)
+    separator = b'['
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield separator + b','.join(orjson.dumps(row) for row in chunk)
+        separator = b','
+    yield b']' if separator == b',' else b'[]'
+
+
+class StreamingListMixin:
+    """
+    Adds ``?stream=true`` to a list view. Combine before LeanListMixin so
+    the normal, paginated path is unchanged.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = STREAM_CHUNK_SIZE
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.stream_query_param, '').lower() not in TRUE_VALUES:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = getattr(self, 'keyset_ordering', None)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        # Pin the database now; the rows are read after the view has returned.
+        queryset = queryset.using(queryset.db)
+
+        lean = lean_representation(self.get_serializer_class())
+        if lean is not None:
+            field_map = lean.bound_field_map()
+            rows = (
+                lean.render_row(row, field_map)
+                for row in queryset.values(*lean.columns).iterator(chunk_size=self.stream_chunk_size)
+            )
+        else:
+            serializer = self.get_serializer()
+            rows = (
+                serializer.to_representation(obj)
+                for obj in queryset.iterator(chunk_size=self.stream_chunk_size)
+            )
+        return StreamingHttpResponse(
+            encode_json_array(rows, self.stream_chunk_size), content_type='application/json')
@@ -0,0 +1,98 @@
+import base64
+from datetime import datetime, timedelta
+
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from myapp.models import Customer, Loan, LoanDue, LoanSchedule, Notification, SyncTombstone
+
+# Tokens are issued this far in the past so that rows committed by
+# transactions still open when the token was taken are sent again.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(moment):
+    return base64.urlsafe_b64encode((moment - SYNC_OVERLAP).isoformat().encode('ascii')).decode('ascii')
+
+
+def decode_token(token):
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+    except (TypeError, ValueError) as exc:
+        raise InvalidSyncToken(str(exc))
+
+
+def tombstone_reassigned(schedules, agent_id, now=None):
+    """
+    Before a bulk UPDATE moves ``schedules`` to ``agent_id``, tombstone the
+    rows that belonged to another agent so they drop off that agent's
+    device. Single saves are covered by signals.record_reassignment_tombstone.
+    """
+    now = now or timezone.now()
+    moved = (
+        schedules
+        .filter(assigned_to__isnull=False)
+        .exclude(assigned_to_id=agent_id)
+        .values_list('id', 'assigned_to_id', 'loan_id')
+    )
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(table=LoanSchedule._meta.db_table, object_id=schedule_id,
+                      assigned_to_id=previous, loan_id=loan_id, deleted_at=now)
+        for schedule_id, previous, loan_id in moved
+    ], batch_size=500)
+
+
+def changes_for_agent(user, since=None):
+    """
+    Querysets of the rows an agent's device holds that changed since
+    ``since`` (everything when None), plus ids of deleted rows.
+
+    Schedule tombstones are the agent's own (rows deleted or reassigned
+    away while assigned to them). Due tombstones are those of loans the
+    agent still works, or lost a schedule on since ``since``. Loan
+    tombstones (archived loans) mean every row of the loan is gone.
+
+    A schedule that changed since ``since`` (e.g. newly assigned) brings
+    all the dues and the customer of its loan along, as the device may
+    not hold them yet.
+    """
+    loan_ids = LoanSchedule.objects.filter(assigned_to=user).values('loan_id')
+    schedules = LoanSchedule.objects.filter(assigned_to=user)
+    dues = LoanDue.objects.filter(loan_id__in=Subquery(loan_ids))
+    customers = Customer.objects.filter(loans__loan_id__in=Subquery(loan_ids)).distinct()
+    notifications = Notification.objects.filter(user_id=user.id)
+    deleted = {'loan_schedules': [], 'loan_dues': [], 'loans': []}
+
+    if since is not None:
+        schedules = schedules.filter(updated_at__gte=since)
+        changed_loan_ids = schedules.values('loan_id')
+        dues = dues.filter(Q(updated_at__gte=since) | Q(loan_id__in=Subquery(changed_loan_ids)))
+        customers = customers.filter(Q(updated_at__gte=since) | Q(loans__loan_id__in=Subquery(changed_loan_ids)))
+        # updated_at, so notifications marked read elsewhere sync too
+        notifications = notifications.filter(updated_at__gte=since)
+        own = SyncTombstone.objects.filter(deleted_at__gte=since, assigned_to_id=user.id)
+        lost_loan_ids = own.values('loan_id')
+        tombstones = SyncTombstone.objects.filter(deleted_at__gte=since).filter(
+            Q(table__in=[LoanSchedule._meta.db_table, Loan._meta.db_table], assigned_to_id=user.id)
+            | Q(table=LoanDue._meta.db_table, loan_id__in=Subquery(loan_ids))
+            | Q(table=LoanDue._meta.db_table, loan_id__in=Subquery(lost_loan_ids))
+        ).values_list('table', 'object_id')
+        keys = {
+            LoanSchedule._meta.db_table: 'loan_schedules',
+            LoanDue._meta.db_table: 'loan_dues',
+            Loan._meta.db_table: 'loans',
+        }
+        for table, object_id in tombstones:
+            deleted[keys[table]].append(object_id)
+
+    return {
+        'loan_schedules': schedules.order_by('id'),
+        'loan_dues': dues.order_by('due_id'),
+        'customers': customers.order_by('customer_id'),
+        'notifications': notifications.order_by('notification_id'),
+        'deleted': deleted,
+    }
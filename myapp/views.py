@@ -8,6 +8,7 @@ from .models import CustomUser
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
+from django.utils import timezone
 
 # -------------------- LOGIN --------------------
 class LoginView(APIView):
@@ -58,7 +59,11 @@ class ChangePasswordView(APIView):
 
             user.set_password(new_password)
             user.save()
-            return Response({"message": "Password changed successfully"}, status=status.HTTP_200_OK)
+            # Tokens issued before the change stop working; the caller gets a new one.
+            Token.objects.filter(user=user).delete()
+            token = Token.objects.create(user=user)
+            return Response({"message": "Password changed successfully", "token": token.key},
+                            status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -91,31 +96,46 @@ from .models import (
 from .serializers import (
     CustomerSerializer, LoanTypeSerializer, LoanSerializer,
     LoanDueSerializer, DailyCollectionSerializer,
-    AttendanceSerializer, NotificationSerializer
+    AttendanceSerializer, NotificationSerializer, LoanQuoteSerializer,
+    MaterializeInstallmentSerializer, PortfolioBucketSerializer
 )
-
-
-class CustomerViewSet(viewsets.ModelViewSet):
+from .utils.amortization import amortize
+from .utils.loan_import import import_loans, IMPORT_FORMATS
+from .utils.loan_schedule import get_schedule, merged_schedule, materialize_installment, stored_schedules
+from .permissions import IsMasterAdmin
+from .utils.lean import LeanListMixin
+from .utils.streaming import StreamingListMixin
+from .db_router import ReplicaReadMixin, replica_view
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+class CustomerViewSet(LeanListMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all().order_by('-created_at')
     serializer_class = CustomerSerializer
+    keyset_ordering = ('-created_at', '-pk')
 
 
-class LoanTypeViewSet(viewsets.ModelViewSet):
+class LoanTypeViewSet(LeanListMixin, viewsets.ModelViewSet):
     queryset = LoanType.objects.all()
     serializer_class = LoanTypeSerializer
+    keyset_ordering = ('pk',)
 
 
-class LoanViewSet(viewsets.ModelViewSet):
+class LoanViewSet(ReplicaReadMixin, LeanListMixin, viewsets.ModelViewSet):
     queryset = Loan.objects.select_related('customer', 'loan_type').all()
     serializer_class = LoanSerializer
+    keyset_ordering = ('-created_at', '-pk')
+    replica_actions = {'details', 'summary'}
 
     @action(detail=True, methods=["get"], url_path="details")
     def details(self, request, pk=None):
         """
         Returns full loan details including all related schedules.
+        Virtual loans merge computed installments with the stored ones.
         """
         loan = self.get_object()
-        schedules = LoanSchedule.objects.filter(loan=loan)
+        schedules = merged_schedule(loan)
         schedule_serializer = LoanScheduleSerializer(schedules, many=True)
         loan_serializer = self.get_serializer(loan)
         return Response({
@@ -123,41 +143,170 @@ class LoanViewSet(viewsets.ModelViewSet):
             "schedules": schedule_serializer.data
         }, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["post"], url_path="materialize")
+    def materialize(self, request, pk=None):
+        """
+        Writes one installment of a virtual loan so it gets a schedule id
+        that the collect/assign/update endpoints can act on.
+        Example JSON body: {"installment_no": 4}
+        """
+        loan = self.get_object()
+        serializer = MaterializeInstallmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            schedule, created = materialize_installment(loan, serializer.validated_data['installment_no'])
+        except LoanSchedule.DoesNotExist:
+            return Response({"error": "Installment not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(
+            LoanScheduleSerializer(schedule).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=["get"], url_path="summary", permission_classes=[IsMasterAdmin])
+    def summary(self, request):
+        """
+        Portfolio totals overall and by loan status, loan type and repayment mode.
+        Reads the per-loan LoanSummary rows, never the schedules or dues.
+        An active loan is overdue when its earliest unpaid installment is past
+        due; overdue_outstanding is the outstanding principal of those loans.
+        """
+        overdue = Q(loan_status='active', summary__next_due_date__lt=timezone.localdate())
+        zero = Value(0, output_field=Loan._meta.get_field('principal_amount'))
+        metrics = {
+            'loans': Count('loan_id'),
+            'total_disbursed': Coalesce(Sum('principal_amount'), zero),
+            'outstanding_principal': Coalesce(Sum('summary__outstanding_principal'), zero),
+            'collected_to_date': Coalesce(Sum('summary__paid_amount'), zero),
+            'overdue_loans': Count('loan_id', filter=overdue),
+            'overdue_outstanding': Coalesce(Sum('summary__outstanding_principal', filter=overdue), zero),
+        }
+
+        def buckets(field):
+            rows = Loan.objects.values(key=F(field)).annotate(**metrics).order_by('key')
+            return PortfolioBucketSerializer(rows, many=True).data
+
+        totals = Loan.objects.aggregate(**metrics)
+        return Response({
+            "totals": PortfolioBucketSerializer({"key": None, **totals}).data,
+            "by_loan_status": buckets('loan_status'),
+            "by_loan_type": buckets('loan_type__name'),
+            "by_repayment_mode": buckets('repayment_mode'),
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="quote")
+    def quote(self, request):
+        """
+        Returns the repayment schedule for the given terms without saving anything.
+        """
+        serializer = LoanQuoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        terms = serializer.validated_data
+        columns = amortize(
+            [terms['principal_amount']],
+            [terms['interest_percentage']],
+            [terms['total_due_count']],
+            [terms.get('start_date') or timezone.localdate()],
+            [terms['repayment_mode']],
+            method=terms['method'],
+        )
+
+        def rupees(paise):
+            return f"{paise // 100}.{paise % 100:02d}"
 
-class LoanDueViewSet(viewsets.ModelViewSet):
+        schedule = [
+            {
+                "installment_no": installment_no,
+                "due_date": due_date.isoformat(),
+                "principal_amount": rupees(principal),
+                "interest_amount": rupees(interest),
+                "total_due": rupees(total),
+                "remaining_principal": rupees(remaining),
+            }
+            for installment_no, due_date, principal, interest, total, remaining in zip(
+                columns.installment_no.tolist(),
+                columns.due_date.astype(object).tolist(),
+                columns.principal_amount.tolist(),
+                columns.interest_amount.tolist(),
+                columns.total_due.tolist(),
+                columns.remaining_principal.tolist(),
+            )
+        ]
+        return Response({
+            "method": terms['method'],
+            "total_principal": rupees(int(columns.principal_amount.sum())),
+            "total_interest": rupees(int(columns.interest_amount.sum())),
+            "total_payable": rupees(int(columns.total_due.sum())),
+            "schedule": schedule,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        """
+        Imports loans from an uploaded CSV or JSONL file ("file" field).
+        Schedules and dues are created for every imported loan.
+        Returns a per-row error report.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "file field is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('file_format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            return Response(
+                {"error": f"file_format must be one of: {', '.join(IMPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = import_loans(upload.file, file_format, created_by=request.user.id)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class LoanDueViewSet(StreamingListMixin, LeanListMixin, viewsets.ModelViewSet):
     queryset = LoanDue.objects.select_related('loan').all()
     serializer_class = LoanDueSerializer
+    keyset_ordering = ('due_date', 'pk')
 
 
 class DailyCollectionViewSet(viewsets.ModelViewSet):
     queryset = DailyCollection.objects.all().order_by('-collection_date')
     serializer_class = DailyCollectionSerializer
+    keyset_ordering = ('-collection_date', '-pk')
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(LeanListMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all().order_by('-login_time')
     serializer_class = AttendanceSerializer
+    keyset_ordering = ('-login_time', '-pk')
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(LeanListMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all().order_by('-created_at')
     serializer_class = NotificationSerializer
+    keyset_ordering = ('-created_at', '-pk')
 from rest_framework import generics
 from .models import LoanSchedule
 from .serializers import LoanScheduleSerializer
 
 # Fetch schedules for all loans
-class LoanScheduleListAPIView(generics.ListAPIView):
+class LoanScheduleListAPIView(ReplicaReadMixin, StreamingListMixin, LeanListMixin, generics.ListAPIView):
     queryset = LoanSchedule.objects.all()
     serializer_class = LoanScheduleSerializer
+    keyset_ordering = ('due_date', 'pk')
     
 
 # Fetch schedules for a specific loan
 class LoanScheduleByLoanAPIView(generics.ListAPIView):
     serializer_class = LoanScheduleSerializer
+    pagination_class = None  # bounded by the loan's total_due_count
 
     def get_queryset(self):
         loan_id = self.kwargs['loan_id']
+        loan = Loan.objects.filter(pk=loan_id).first()
+        if loan is not None and loan.schedule_mode == 'virtual':
+            return merged_schedule(loan)
+        if loan is not None and loan.archived_at:
+            # Only an explicit request for an archived loan reads the archive
+            return stored_schedules(loan)
         return LoanSchedule.objects.filter(loan_id=loan_id).order_by('installment_no')
 
 # views.py
@@ -165,8 +314,10 @@ class LoanScheduleByLoanAPIView(generics.ListAPIView):
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db.models import F
 from .models import CustomUser
-from .serializers import UserSerializer
+from .serializers import UserSerializer, AgentRouteSerializer, AgentRouteQuerySerializer
+from .utils import reference_cache
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -175,24 +326,79 @@ def list_collection_agents(request):
     API: /api/auth/agents/
     Returns a list of all users with role='collection_agent'
     """
-    agents = CustomUser.objects.filter(role='collection_agent')
+    agents = reference_cache.collection_agents()
     serializer = UserSerializer(agents, many=True)
     return Response(serializer.data)
 
+
+@api_view(['GET'])
+@permission_classes([IsMasterAdmin])
+def reference_cache_stats(request):
+    """
+    API: /api/auth/cache/stats/
+    Hit/miss counters of the reference data cache in this process.
+    """
+    return Response(reference_cache.stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def agent_route(request):
+    """
+    API: /api/auth/agents/route/?date=YYYY-MM-DD
+         /api/auth/agents/route/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+    Returns the calling agent's pending installments for the day (default
+    today) or date range, with the customer's name, phone and address.
+    One query, served by loan_sched_agent_route_idx.
+    """
+    params = AgentRouteQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    today = timezone.localdate()
+    date_from = params.validated_data.get('date_from', today)
+    date_to = params.validated_data.get('date_to', today)
+
+    stops = (
+        LoanSchedule.objects
+        .filter(assigned_to_id=request.user.id, due_date__range=(date_from, date_to), status='pending')
+        .order_by('due_date', 'id')
+        .values(
+            'id', 'loan_id', 'installment_no', 'due_date', 'total_due', 'status',
+            customer_id=F('loan__customer_id'),
+            customer_name=F('loan__customer__full_name'),
+            customer_phone=F('loan__customer__phone'),
+            customer_address=F('loan__customer__address'),
+        )
+    )
+    return Response({
+        "date_from": date_from,
+        "date_to": date_to,
+        "results": AgentRouteSerializer(stops, many=True).data,
+    })
+
 # views.py
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import LoanSchedule, LoanDue, Notification
 from .serializers import LoanScheduleSerializer
+from .utils.payments import collect_payments
+from .utils.assignment import bulk_assign
+from .utils.assignment_planner import auto_assign
+from .utils.sync import changes_for_agent, decode_token, encode_token, InvalidSyncToken
+from .serializers import (
+    LoanScheduleBulkAssignSerializer, AutoAssignSerializer,
+    PaymentEntrySerializer, BatchCollectSerializer
+)
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 User = get_user_model()
 
-class LoanScheduleViewSet(viewsets.ModelViewSet):
+class LoanScheduleViewSet(LeanListMixin, viewsets.ModelViewSet):
     queryset = LoanSchedule.objects.all()
     serializer_class = LoanScheduleSerializer
+    keyset_ordering = ('due_date', 'pk')
+
     @action(detail=True, methods=['post'], url_path='collect')
     def collect_payment(self, request, pk=None):
         """
@@ -203,42 +409,105 @@ class LoanScheduleViewSet(viewsets.ModelViewSet):
         agent_id = request.user.id
 
         # Extract payment info
-        payment_method = request.data.get('payment_method', 'cash')
-        paid_amount = request.data.get('paid_amount', schedule.total_due)
-
-        # Check if a due already exists
-        due, created = LoanDue.objects.get_or_create(
-            loan=schedule.loan,
-            due_number=schedule.installment_no,
-            defaults={
-                'due_date': schedule.due_date,
-                'due_amount': schedule.total_due,
-                'paid_amount': paid_amount,
-                'payment_method': payment_method,
-                'collected_by': agent_id,
-                'payment_status': 'paid',
-                'paid_at': timezone.now(),
-            }
-        )
-
-        if not created:
-            # Update existing record if it already exists
-            due.paid_amount = paid_amount
-            due.payment_method = payment_method
-            due.collected_by = agent_id
-            due.payment_status = 'paid'
-            due.paid_at = timezone.now()
-            due.save()
-
-        # Optionally update LoanSchedule status
-        schedule.status = 'Paid'
-        schedule.save()
+        entry = PaymentEntrySerializer(data={
+            'schedule': schedule.id,
+            'payment_method': request.data.get('payment_method', 'cash'),
+            'paid_amount': request.data.get('paid_amount'),
+        })
+        entry.is_valid(raise_exception=True)
+
+        # Creates or updates the LoanDue, marks the schedule paid and
+        # updates the day's collection totals and the loan summary
+        [result] = collect_payments([entry.validated_data], agent_id)
+        due = result['due']
 
         return Response({
             "message": "✅ Payment collected successfully!",
             "loan_due": LoanDueSerializer(due).data
         }, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['post'], url_path='collect-batch')
+    def collect_batch(self, request):
+        """
+        Agent uploads many collected payments at once (end-of-day sync).
+        Example JSON body:
+        {"payments": [{"schedule": 10, "paid_amount": "250.00", "payment_method": "cash",
+                       "collected_at": "2025-01-10T09:30:00Z"}, ...]}
+        Returns one result per entry, in order.
+        """
+        batch = BatchCollectSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+
+        results, valid = [], []
+        for payment in batch.validated_data['payments']:
+            entry = PaymentEntrySerializer(data=payment)
+            if entry.is_valid():
+                valid.append(entry.validated_data)
+                results.append(None)
+            else:
+                results.append({"schedule": payment.get('schedule'), "status": "error", "errors": entry.errors})
+
+        collected = iter(collect_payments(valid, request.user.id))
+        for index, result in enumerate(results):
+            if result is not None:
+                continue
+            outcome = next(collected)
+            if 'error' in outcome:
+                results[index] = {"schedule": outcome['schedule'], "status": "error",
+                                  "errors": {"schedule": [outcome['error']]}}
+            else:
+                results[index] = {"schedule": outcome['schedule'], "status": "ok",
+                                  "loan_due": LoanDueSerializer(outcome['due']).data}
+
+        return Response({
+            "collected": sum(1 for result in results if result['status'] == 'ok'),
+            "failed": sum(1 for result in results if result['status'] == 'error'),
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk-assign')
+    def bulk_assign(self, request):
+        """
+        Assign many pending schedules to one collection agent at once.
+        Example JSON body:
+        {"assigned_to": 5, "loan_ids": [12, 13], "due_date_from": "2025-01-01", "due_date_to": "2025-01-31"}
+        """
+        serializer = LoanScheduleBulkAssignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        agent = serializer.validated_data['assigned_to']
+        serializer.materialize_virtual()
+        assigned, notified = bulk_assign(serializer.get_schedules(), agent)
+        return Response({
+            "message": f"{assigned} loan schedule(s) assigned to {agent.email}",
+            "assigned": assigned,
+            "notifications": notified,
+            "assigned_to": {
+                "id": agent.id,
+                "email": agent.email,
+                "username": agent.username,
+                "role": agent.role,
+            },
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='auto-assign', permission_classes=[IsMasterAdmin])
+    def auto_assign(self, request):
+        """
+        Spread the unassigned pending installments due in a date window
+        across active collection agents, balanced by count and amount.
+        Example JSON body: {"date_from": "2025-01-01", "date_to": "2025-01-07", "dry_run": true}
+        """
+        serializer = AutoAssignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        plan = auto_assign(**serializer.validated_data)
+        return Response({
+            "dry_run": serializer.validated_data['dry_run'],
+            "assigned": sum(agent['installments'] for agent in plan.values()),
+            "agents": [
+                {"agent_id": agent_id, "installments": agent['installments'], "amount": str(agent['amount'])}
+                for agent_id, agent in sorted(plan.items())
+            ],
+        }, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
         try:
@@ -248,9 +517,8 @@ class LoanScheduleViewSet(viewsets.ModelViewSet):
             if not assigned_to_id:
                 return Response({"error": "assigned_to field is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-            try:
-                assigned_user = User.objects.get(id=assigned_to_id)
-            except User.DoesNotExist:
+            assigned_user = reference_cache.get_user(assigned_to_id)
+            if assigned_user is None:
                 return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
             schedule.assigned_to = assigned_user
@@ -264,81 +532,6 @@ class LoanScheduleViewSet(viewsets.ModelViewSet):
 
         except LoanSchedule.DoesNotExist:
             return Response({"error": "Schedule not found"}, status=status.HTTP_404_NOT_FOUND)
-from rest_framework import status, permissions
-from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
-from django.contrib.auth import get_user_model
-from .models import LoanSchedule
-from .serializers import LoanScheduleAssignSerializer
-
-User = get_user_model()
-
-@api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
-def assign_loan_schedule(request, pk):
-    """
-    Assign a loan schedule to a collection agent.
-    Example JSON body: {"assigned_to": 5}
-    """
-    try:
-        schedule = LoanSchedule.objects.get(pk=pk)
-    except LoanSchedule.DoesNotExist:
-        return Response(
-            {"error": "Loan schedule not found."},
-            status=status.HTTP_404_NOT_FOUND
-        )
-
-    assigned_to_id = request.data.get("assigned_to")
-    if not assigned_to_id:
-        return Response(
-            {"error": "assigned_to field is required."},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # ✅ Validate that the user exists and is a collection agent
-    try:
-        assigned_user = User.objects.get(pk=assigned_to_id)
-        if assigned_user.role != "collection_agent":
-            return Response(
-                {"error": "User must be a collection agent."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-    except User.DoesNotExist:
-        return Response(
-            {"error": "Assigned user not found."},
-            status=status.HTTP_404_NOT_FOUND
-        )
-
-    # ✅ Perform assignment
-    serializer = LoanScheduleAssignSerializer(
-        schedule,
-        data={"assigned_to": assigned_user.id},
-        partial=True
-    )
-
-    if serializer.is_valid():
-        serializer.save()
-        return Response(
-            {
-                "message": f"Loan schedule {pk} assigned successfully.",
-                "loan_schedule_id": schedule.id,
-                "assigned_to": {
-                    "id": assigned_user.id,
-                    "email": assigned_user.email,
-                    "username": assigned_user.username,
-                    "role": assigned_user.role,
-                },
-            },
-            status=status.HTTP_200_OK
-        )
-    Notification.objects.create(
-        user_id=assigned_user.id,
-        title="New Loan Assigned",
-        message=f"You have been assigned Loan ID #{schedule.loan.id}, Installment #{schedule.installment_no}.",
-        created_at=timezone.now(),
-    )
-
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 # views.py
 # views.py
 from rest_framework.views import APIView
@@ -348,9 +541,14 @@ from .models import LoanSchedule
 from .serializers import LoanScheduleSerializer
 
 class LoanScheduleUpdateView(APIView):
-    def patch(self, request, pk):
+    """
+    PATCH a schedule by id, or by loan and installment number
+    (loan-schedules/<loan_id>/installments/<installment_no>/), which
+    materializes an installment of a virtual loan first.
+    """
+    def patch(self, request, pk=None, loan_id=None, installment_no=None):
         try:
-            schedule = LoanSchedule.objects.get(pk=pk)
+            schedule = get_schedule(pk, loan_id, installment_no)
         except LoanSchedule.DoesNotExist:
             return Response({"error": "Loan schedule not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -366,16 +564,19 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .models import LoanSchedule
+from .notifications import notify
 from .serializers import LoanScheduleSerializer
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def assign_loan_schedule(request, pk):
+def assign_loan_schedule(request, pk=None, loan_id=None, installment_no=None):
     """
     Assign a loan schedule to an agent using serializer itself.
+    loan-schedules/<loan_id>/installments/<installment_no>/assign/ picks it
+    by loan and installment number, materializing a virtual installment.
     """
     try:
-        schedule = LoanSchedule.objects.get(pk=pk)
+        schedule = get_schedule(pk, loan_id, installment_no)
     except LoanSchedule.DoesNotExist:
         return Response(
             {"error": "Loan schedule not found."},
@@ -389,7 +590,14 @@ def assign_loan_schedule(request, pk):
     )
 
     if serializer.is_valid():
+        previous = schedule.assigned_to_id
         serializer.save()
+        if schedule.assigned_to_id is not None and schedule.assigned_to_id != previous:
+            notify(
+                schedule.assigned_to_id,
+                "New Loan Assigned",
+                f"You have been assigned Loan ID #{schedule.loan_id}, Installment #{schedule.installment_no}.",
+            )
         return Response(
             {
                 **serializer.data,
@@ -398,3 +606,167 @@ def assign_loan_schedule(request, pk):
             status=status.HTTP_200_OK
         )
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# -------------------- LEDGER EXPORT --------------------
+from django.http import StreamingHttpResponse
+from .serializers import LedgerExportQuerySerializer
+from .utils.ledger_export import EXPORT_TABLES, export_chunks, export_queryset, export_rows
+
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+
+@replica_view
+@api_view(['GET'])
+@permission_classes([IsMasterAdmin])
+def ledger_export(request, table):
+    """
+    API: /api/auth/exports/<loan_dues|loan_schedule>/?file_format=csv|parquet
+         &date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&loan_status=active&loan_type=<id>
+    Streams the whole filtered table (by due date) as CSV or Parquet,
+    followed by the not yet stored installments of virtual loans.
+    """
+    if table not in EXPORT_TABLES:
+        return Response({"error": f"table must be one of: {', '.join(EXPORT_TABLES)}"},
+                        status=status.HTTP_404_NOT_FOUND)
+    params = LedgerExportQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    filters = dict(params.validated_data)
+    file_format = filters.pop('file_format')
+
+    queryset = export_queryset(table, **filters)
+    # Pin the database now; the rows are read after the view has returned.
+    queryset = queryset.using(queryset.db)
+    response = StreamingHttpResponse(
+        export_chunks(table, file_format, export_rows(table, queryset, **filters)),
+        content_type=EXPORT_CONTENT_TYPES[file_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{table}.{file_format}"'
+    return response
+
+
+# -------------------- DELTA SYNC --------------------
+class SyncFeedView(APIView):
+    """
+    API: /api/auth/sync/?token=<sync_token>
+    Returns the calling agent's schedules, dues, customers and notifications
+    changed since the token (all of them without one), the ids of schedules
+    deleted or reassigned away from the agent, of deleted dues and of
+    archived loans (drop all of their rows), and the token to send next time.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        started = timezone.now()
+        token = request.query_params.get('token')
+        try:
+            since = decode_token(token) if token else None
+        except InvalidSyncToken:
+            return Response({"error": "Invalid sync token."}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = changes_for_agent(request.user, since)
+        return Response({
+            "sync_token": encode_token(started),
+            "full": since is None,
+            "loan_schedules": LoanScheduleSerializer(changes['loan_schedules'], many=True).data,
+            "loan_dues": LoanDueSerializer(changes['loan_dues'], many=True).data,
+            "customers": CustomerSerializer(changes['customers'], many=True).data,
+            "notifications": NotificationSerializer(changes['notifications'], many=True).data,
+            "deleted": changes['deleted'],
+        }, status=status.HTTP_200_OK)
+
+
+# -------------------- ASYNC READ VIEWS --------------------
+# Async versions of the read-heavy endpoints for the ASGI deployment
+# (LoanAppBackend/asgi.py). They use the async ORM, so a slow query does not
+# hold a worker thread. Output matches the synchronous endpoints.
+import functools
+
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import aauthenticate
+from .utils.lean import lean_representation
+from .utils.loan_schedule import amerged_schedule
+from .utils.pagination import KeysetPagination
+
+
+def _json(data, status_code=200):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def async_token_required(view):
+    """Token authentication for async views, with DRF's 401 responses."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        user = await aauthenticate(request)
+        if user is None:
+            detail = ("Invalid token." if request.headers.get('Authorization')
+                      else "Authentication credentials were not provided.")
+            response = _json({"detail": detail}, status.HTTP_401_UNAUTHORIZED)
+            response['WWW-Authenticate'] = 'Token'
+            return response
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_token_required
+async def loan_schedules_by_loan_async(request, loan_id):
+    """
+    API: /api/auth/async/loan-schedules/<loan_id>/
+    Async LoanScheduleByLoanAPIView.
+    """
+    loan = await Loan.objects.filter(pk=loan_id).afirst()
+    if loan is not None and loan.schedule_mode == 'virtual':
+        return _json(LoanScheduleSerializer(await amerged_schedule(loan), many=True).data)
+    lean = lean_representation(LoanScheduleSerializer)
+    if loan is not None and loan.archived_at:
+        rows = stored_schedules(loan).values(*lean.columns)
+    else:
+        rows = LoanSchedule.objects.filter(loan_id=loan_id).order_by('installment_no').values(*lean.columns)
+    return _json(lean.render([row async for row in rows]))
+
+
+@async_token_required
+async def loan_details_async(request, pk):
+    """
+    API: /api/auth/async/loans/<pk>/details/
+    Async LoanViewSet.details.
+    """
+    loan = await Loan.objects.select_related('customer', 'loan_type').filter(pk=pk).afirst()
+    if loan is None:
+        return _json({"detail": "No Loan matches the given query."}, status.HTTP_404_NOT_FOUND)
+    schedules = await amerged_schedule(loan)
+    return _json({
+        "loan": LoanSerializer(loan).data,
+        "schedules": LoanScheduleSerializer(schedules, many=True).data,
+    })
+
+
+@async_token_required
+async def notifications_async(request):
+    """
+    API: /api/auth/async/notifications/
+    Async NotificationViewSet list, with the same keyset pagination.
+    """
+    request = Request(request)
+    paginator = KeysetPagination()
+    lean = lean_representation(NotificationSerializer)
+    queryset = Notification.objects.values(*lean.columns)
+    page = paginator.finish_page([
+        row async for row in paginator.page_queryset(queryset, request, NotificationViewSet)
+    ])
+    return _json({"next": paginator.get_next_link(), "results": lean.render(page)})
+
+
+@async_token_required
+async def collection_agents_async(request):
+    """
+    API: /api/auth/async/agents/
+    Async list_collection_agents.
+    """
+    return _json(UserSerializer(await reference_cache.acollection_agents(), many=True).data)